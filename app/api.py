@@ -1,176 +1,617 @@
 # app/api.py
 
 import base64
+import binascii
+import functools
 import os
+import queue
+import threading
 
+import bottle
 import eel
 
-from app.database import GameRepository
-from app.image_utils import delete_screenshot, save_screenshot
+from app.database import GameRepository, db, outside_transaction
+from app.image_utils import (
+    SCREENSHOT_VARIANTS,
+    ScreenshotJob,
+    delete_screenshot,
+    derivative_path,
+    pending_state,
+    read_placeholder,
+    save_screenshot,
+    save_screenshot_file,
+    screenshot_jobs,
+    screenshot_version,
+    validate_image_format,
+)
 from app.logger import get_logger
-from app.updater import perform_update, check_for_updates
-from config import APP_VERSION
+from app.metrics import get_metrics as metrics_snapshot
+from app.metrics import instrument
+from app.uploads import UploadError, is_upload_handle, upload_store
+from app.updater import get_update_info, perform_update
+from app.wire_format import encode_games
+from config import APP_VERSION, PUSH_INTERVAL, UPLOAD_CHUNK_SIZE
 
 logger = get_logger(__name__)
 
 
+class LibrarySnapshot:
+    """
+    Подготовленный список игр в памяти вместе с ревизией библиотеки, на которой он прочитан.
+    Действителен, пока не изменилась library_revision.revision — её поднимают триггеры
+    при любой записи в games, в том числе из другого процесса (cli.py import).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revision = None
+        self._games = []
+        self._encoded = {}  # encoder -> список, закодированный из этого снимка
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, loader):
+        """
+        Возвращает (ревизия, игры) из снимка или перестраивает его через loader(),
+        который возвращает такую же пару, если снимок устарел
+        """
+        # Одно чтение строки library_revision вместо чтения всей таблицы
+        current = GameRepository().get_revision()
+        with self._lock:
+            if self._revision == current:
+                self.hits += 1
+                return self._revision, self._games
+            self.misses += 1
+
+        # loader читает ревизию и игры в одной транзакции: снимок помечен той
+        # ревизией, на которой прочитан, даже если запись пришлась между чтениями
+        revision, games = loader()
+        with self._lock:
+            self._revision = revision
+            self._games = games
+            self._encoded = {}
+        return revision, games
+
+    def get_encoded(self, loader, encoder):
+        """Как get, но список в формате encoder(games) — кодируется один раз на снимок"""
+        revision, games = self.get(loader)
+        with self._lock:
+            if self._games is games and encoder in self._encoded:
+                return revision, self._encoded[encoder]
+
+        encoded = encoder(games)
+        with self._lock:
+            if self._games is games:
+                self._encoded[encoder] = encoded
+        return revision, encoded
+
+    def invalidate(self):
+        """Сбрасывает снимок"""
+        with self._lock:
+            self._revision = None
+            self._games = []
+            self._encoded = {}
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revision": self._revision,
+                "size": len(self._games),
+            }
+
+
+library_snapshot = LibrarySnapshot()
+
+
 @eel.expose
+@instrument
+@outside_transaction
 def log_frontend(level, message):
     """Логирует сообщения с фронтенда"""
     if level == "warning":
-        logger.warning(f"[Frontend] {message}")
+        logger.warning("[Frontend] %s", message)
     elif level == "error":
-        logger.error(f"[Frontend] {message}")
+        logger.error("[Frontend] %s", message)
     elif level == "info":
-        logger.info(f"[Frontend] {message}")
+        logger.info("[Frontend] %s", message)
     else:
-        logger.debug(f"[Frontend] {message}")
+        logger.debug("[Frontend] %s", message)
 
 
 @eel.expose
+@instrument
+@outside_transaction
 def get_version():
     return APP_VERSION
 
 
+_ready_handlers = []
+
+
+def on_window_ready(handler):
+    """handler() вызывается один раз, при первом вызове ready() из окна"""
+    _ready_handlers.append(handler)
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def ready():
+    """Окно загрузило скрипты и подключилось к Eel"""
+    handlers = list(_ready_handlers)
+    _ready_handlers.clear()
+    for handler in handlers:
+        try:
+            handler()
+        except Exception as e:
+            logger.error("Error in window ready handler: %s", e, exc_info=True)
+
+
+def _prepare_game(game):
+    """Готовит строку игры из БД к отправке на фронтенд"""
+    game["rating"] = float(game["rating"]) if game["rating"] else 0.0
+
+    # Отдаём только ссылку на миниатюру, сам файл браузер загрузит по маршруту
+    screenshot_path = game.get("screenshot_path")
+    version = screenshot_version(screenshot_path)
+    if version:
+        thumb_version = screenshot_version(derivative_path(screenshot_path, "thumb"))
+        game["screenshot_url"] = (
+            f"/screenshots/{game['id']}/thumb?v={thumb_version or version}"
+        )
+        game["screenshot_version"] = version
+        game["screenshot_placeholder"] = read_placeholder(screenshot_path)
+    else:
+        game["screenshot_url"] = ""
+        game["screenshot_version"] = ""
+        game["screenshot_placeholder"] = ""
+
+    # pending:<id задания> → pending
+    game["screenshot_state"] = (game.get("screenshot_state") or "").split(":", 1)[0]
+
+    if game["game_link"]:
+        display_text = game["game_link"].replace("https://", "").replace("http://", "")
+        game["display_link"] = (
+            display_text[:27] + "..." if len(display_text) > 30 else display_text
+        )
+    else:
+        game["display_link"] = ""
+
+    return game
+
+
+def _load_library():
+    """
+    Ревизия и все игры, прочитанные в одной транзакции. Файлы скриншотов
+    (_prepare_game) читаются уже после неё, чтобы не держать транзакцию на время I/O.
+    """
+    repo = GameRepository()
+    with db:
+        revision = repo.get_revision()
+        games = repo.get_all_games()
+    return revision, [_prepare_game(game) for game in games]
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def load_games(compact=False):
+    """
+    Загружает все игры из базы.
+    compact=True — в колоночном формате app/wire_format.py (только поля карточки).
+    """
+    try:
+        if compact:
+            return library_snapshot.get_encoded(_load_library, encode_games)[1]
+        return library_snapshot.get(_load_library)[1]
+
+    except Exception as e:
+        logger.error("Unexpected error in load_games: %s", e, exc_info=True)
+        return encode_games([]) if compact else []
+
+
 @eel.expose
-def load_games():
-    """Загружает все игры из базы"""
+@instrument
+@outside_transaction
+def load_games_since(revision=None, compact=False):
+    """
+    Изменения библиотеки после ревизии revision, полученной клиентом ранее.
+    Возвращает {"revision", "full", "games", "deleted"}: при full=True games —
+    вся библиотека (первая загрузка, ревизия клиента неизвестна базе или
+    старше границы ленты изменений),
+    иначе только изменённые игры и id удалённых.
+    compact=True — games в колоночном формате app/wire_format.py.
+    """
     try:
         repo = GameRepository()
-        games = repo.get_all_games()
+        if revision is not None:
+            revision = int(revision)
+            changes = None
+            with db:
+                current = repo.get_revision()
+                if repo.get_change_floor() <= revision <= current:
+                    changes = repo.get_changes_since(revision)
+            if changes is not None:
+                games, deleted = changes
+                games = [_prepare_game(game) for game in games]
+                return {
+                    "revision": current,
+                    "full": False,
+                    "games": encode_games(games) if compact else games,
+                    "deleted": deleted,
+                }
+            logger.warning(
+                "Client revision %s is unknown or older than the change feed, sending full library",
+                revision,
+            )
+
+        if compact:
+            current, games = library_snapshot.get_encoded(_load_library, encode_games)
+        else:
+            current, games = library_snapshot.get(_load_library)
+        return {"revision": current, "full": True, "games": games, "deleted": []}
+
+    except (TypeError, ValueError) as e:
+        logger.warning("Invalid load_games_since revision: %s", e)
+        return None
+    except Exception as e:
+        logger.error("Unexpected error in load_games_since: %s", e, exc_info=True)
+        return None
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def query_games(filter=None, sort=None, cursor=None, limit=None):
+    """
+    Загружает страницу игр с фильтрацией и сортировкой в SQL.
+    filter: {"status": "playing", "search": "текст", "developer": "имя"},
+    sort — значение из списка сортировки UI.
+    Возвращает {"games": [...], "next_cursor": str | None}.
+    """
+    filter = filter or {}
+    try:
+        repo = GameRepository()
+        games, next_cursor = repo.query_games(
+            status=filter.get("status") if filter.get("status") != "all" else None,
+            search=filter.get("search"),
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            developer=filter.get("developer"),
+        )
+        return {
+            "games": encode_games([_prepare_game(game) for game in games]),
+            "next_cursor": next_cursor,
+        }
+
+    except ValueError as e:
+        logger.warning("Invalid query_games arguments: %s", e)
+        return {"games": [], "next_cursor": None}
+    except Exception as e:
+        logger.error("Unexpected error in query_games: %s", e, exc_info=True)
+        return {"games": [], "next_cursor": None}
 
-        for game in games:
-            game["rating"] = float(game["rating"]) if game["rating"] else 0.0
-
-            # Конвертируем скриншот в base64 если файл существует
-            screenshot_path = game.get("screenshot_path")
-            if screenshot_path and os.path.exists(screenshot_path):
-                try:
-                    with open(screenshot_path, "rb") as f:
-                        image_data = base64.b64encode(f.read()).decode("utf-8")
-                        game["screenshot_data"] = (
-                            f"data:image/webp;base64,{image_data}"
-                        )
-                except Exception as e:
-                    logger.warning(f"Error loading screenshot {screenshot_path}: {e}")
-                    game["screenshot_data"] = ""
-            else:
-                game["screenshot_data"] = ""
-
-            if game["game_link"]:
-                display_text = (
-                    game["game_link"].replace("https://", "").replace("http://", "")
-                )
-                game["display_link"] = (
-                    display_text[:27] + "..."
-                    if len(display_text) > 30
-                    else display_text
-                )
-            else:
-                game["display_link"] = ""
 
-        return games
+@eel.expose
+@instrument
+@outside_transaction
+def search_games(query, limit=None):
+    """
+    Полнотекстовый поиск по названию, разработчику и отзыву (с префиксами для ввода по буквам).
+    Возвращает [{"id", "title", "developer", "review"}] по релевантности, совпадения в <mark>.
+    """
+    try:
+        repo = GameRepository()
+        return repo.search_games(query, limit)
 
     except Exception as e:
-        logger.error(f"Unexpected error in load_games: {e}", exc_info=True)
+        logger.error("Unexpected error in search_games: %s", e, exc_info=True)
         return []
 
 
 @eel.expose
+@instrument
+@outside_transaction
+def search_game_ids(query):
+    """
+    id всех игр, найденных полнотекстовым поиском (без лимита), для фильтра списка.
+    Совпадения внутри слов фронтенд добавляет сам поиском подстроки.
+    """
+    try:
+        repo = GameRepository()
+        return repo.search_game_ids(query)
+
+    except Exception as e:
+        logger.error("Unexpected error in search_game_ids: %s", e, exc_info=True)
+        return []
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def find_similar_titles(text, exclude_id=None, limit=None):
+    """
+    Игры с похожим названием для подсказки о дубликате при вводе.
+    Возвращает [{"id", "title", "status", "match"}]: точные совпадения, затем
+    префиксы, совпадения всех слов и подстроки.
+    """
+    try:
+        repo = GameRepository()
+        return repo.find_similar_titles(text, exclude_id, limit)
+
+    except Exception as e:
+        logger.error("Unexpected error in find_similar_titles: %s", e, exc_info=True)
+        return []
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def suggest_developers(prefix, limit=None):
+    """
+    Подсказки разработчиков для поля ввода: [{"developer", "count"}],
+    сначала точное совпадение и имена с этим началом, затем по числу игр.
+    """
+    try:
+        repo = GameRepository()
+        return repo.suggest_developers(prefix, limit)
+
+    except Exception as e:
+        logger.error("Unexpected error in suggest_developers: %s", e, exc_info=True)
+        return []
+
+
+@bottle.route("/screenshots/<game_id:int>")
+@bottle.route("/screenshots/<game_id:int>/<variant>")
+def serve_screenshot(game_id, variant="full"):
+    """Отдаёт файл скриншота игры (или его миниатюру) с заголовками кэширования"""
+    if variant != "full" and variant not in SCREENSHOT_VARIANTS:
+        return bottle.HTTPError(404, "Unknown screenshot variant")
+
+    try:
+        repo = GameRepository()
+        screenshot_path = repo.get_screenshot_path(game_id)
+        if not screenshot_version(screenshot_path):
+            return bottle.HTTPError(404, "Screenshot not found")
+
+        # Для старых скриншотов без производных отдаём полноразмерный файл
+        file_path = derivative_path(screenshot_path, variant)
+        version = screenshot_version(file_path)
+        if not version:
+            file_path = screenshot_path
+            version = screenshot_version(file_path)
+
+        # Ссылка содержит версию файла, поэтому браузер может кэшировать её навсегда
+        return bottle.static_file(
+            os.path.basename(file_path),
+            root=os.path.dirname(os.path.abspath(file_path)),
+            mimetype="image/webp",
+            etag=version,
+            headers={"Cache-Control": "public, max-age=31536000, immutable"},
+        )
+
+    except Exception as e:
+        logger.error("Error serving screenshot (ID: %s): %s", game_id, e, exc_info=True)
+        return bottle.HTTPError(500, "Error loading screenshot")
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def begin_upload():
+    """Начинает загрузку скриншота по частям: {"upload_id", "chunk_size"}"""
+    try:
+        return {"upload_id": upload_store.begin(), "chunk_size": UPLOAD_CHUNK_SIZE}
+    except Exception as e:
+        logger.error("Error starting upload: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def upload_chunk(upload_id, chunk):
+    """Принимает часть файла в base64: {"received": байт всего}"""
+    try:
+        return {"received": upload_store.append(upload_id, base64.b64decode(chunk))}
+    except (UploadError, binascii.Error) as e:
+        logger.warning("Upload chunk rejected: %s", e)
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error("Error receiving upload chunk: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def commit_upload(upload_id, size=None):
+    """Завершает загрузку: {"handle", "format", "size"} — handle передаётся в add_game/update_game"""
+    try:
+        return upload_store.commit(upload_id, size)
+    except UploadError as e:
+        logger.warning("Upload rejected: %s", e)
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error("Error committing upload: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def cancel_upload(upload_id):
+    """Отменяет загрузку и удаляет временный файл"""
+    upload_store.discard(upload_id)
+    return True
+
+
+def _screenshot_job(screenshot_data, game_id, game_title):
+    """
+    Готовит фоновое задание для скриншота из дескриптора загрузки или data URL.
+    Возвращает ScreenshotJob или None, если данные непригодны.
+    """
+    if not is_upload_handle(screenshot_data):
+        if not validate_image_format(screenshot_data):
+            logger.error("Invalid screenshot for game %s: unsupported file type", game_id)
+            return None
+        return ScreenshotJob(
+            game_id, functools.partial(save_screenshot, screenshot_data, game_id, game_title, strict=True)
+        )
+
+    try:
+        source_path = upload_store.path_for(screenshot_data)
+    except UploadError as e:
+        logger.error("Screenshot upload unavailable for game %s: %s", game_id, e)
+        upload_store.discard(screenshot_data)
+        return None
+    return ScreenshotJob(
+        game_id,
+        functools.partial(save_screenshot_file, source_path, game_id, game_title, strict=True),
+        cleanup=functools.partial(upload_store.discard, screenshot_data),
+    )
+
+
+@eel.expose
+@instrument
+@outside_transaction
 def add_game(game_data, screenshot_data=None):
-    """Добавляет новую игру"""
+    """
+    Добавляет новую игру.
+    Скриншот обрабатывается в фоне: игра сразу сохраняется с состоянием "pending".
+    """
     try:
         repo = GameRepository()
-        game_id = repo.add_game(game_data)
+        job = None
 
-        if not game_id:
-            return False
+        with db.transaction(immediate=True):
+            game_id = repo.add_game(game_data)
 
-        # Сохраняем скриншот если есть
-        if screenshot_data:
-            screenshot_path = save_screenshot(
-                screenshot_data, game_id, game_data.get("title", "")
-            )
-            if screenshot_path:
-                repo.update_screenshot_path(game_id, screenshot_path)
+            if not game_id:
+                return False
+
+            if screenshot_data:
+                job = _screenshot_job(screenshot_data, game_id, game_data.get("title", ""))
+                if job:
+                    repo.set_screenshot_state(game_id, pending_state(job.job_id))
+
+        # Задание ставим после коммита: рабочий поток должен видеть запись игры
+        if job:
+            screenshot_jobs.submit(job)
 
-        logger.info(f"Added game (ID: {game_id}): '{game_data.get('title')}'")
+        logger.info("Added game (ID: %s): '%s'", game_id, game_data.get('title'))
         return True
 
     except Exception as e:
-        logger.error(f"Unexpected error in add_game: {e}", exc_info=True)
+        logger.error("Unexpected error in add_game: %s", e, exc_info=True)
         return False
 
 
 @eel.expose
+@instrument
+@outside_transaction
 def update_game(game_id, game_data, screenshot_data=None):
-    """Обновляет данные игры"""
+    """
+    Обновляет данные игры.
+    Новый скриншот обрабатывается в фоне, до готовности остаётся старый.
+    """
     try:
         repo = GameRepository()
+        job = None
+        released = None
 
-        # Получаем старый путь к скриншоту
-        old_screenshot_path = repo.get_screenshot_path(game_id)
+        with db.transaction(immediate=True):
+            # Получаем старый путь к скриншоту
+            old_screenshot_path = repo.get_screenshot_path(game_id)
 
-        # Обрабатываем скриншот
-        new_screenshot_path = old_screenshot_path
-        if screenshot_data == "":  # Удалить скриншот
-            if old_screenshot_path:
-                delete_screenshot(old_screenshot_path, game_id)
+            # Обрабатываем скриншот
+            new_screenshot_path = old_screenshot_path
+            if screenshot_data == "":  # Удалить скриншот
                 new_screenshot_path = ""
-        elif screenshot_data:  # Новый скриншот
-            if old_screenshot_path:
-                delete_screenshot(old_screenshot_path, game_id)
-            new_screenshot_path = save_screenshot(
-                screenshot_data, game_id, game_data.get("title", "")
-            )
+            elif screenshot_data:  # Новый скриншот — заменит старый, когда будет готов
+                job = _screenshot_job(screenshot_data, game_id, game_data.get("title", ""))
+
+            # Обновляем данные игры
+            success = repo.update_game(game_id, game_data, new_screenshot_path)
+
+            # Состояние меняется при любом новом скриншоте или удалении:
+            # незавершённое задание для прежнего скриншота не запишет результат
+            if success and screenshot_data is not None:
+                repo.set_screenshot_state(game_id, pending_state(job.job_id) if job else "")
+
+            if success and old_screenshot_path and old_screenshot_path != new_screenshot_path:
+                released = old_screenshot_path
+
+        # Старый файл освобождаем после коммита: при откате игра ссылалась бы на удалённый файл
+        if released:
+            delete_screenshot(released, game_id)
 
-        # Обновляем данные игры
-        success = repo.update_game(game_id, game_data, new_screenshot_path)
+        if job and success:
+            screenshot_jobs.submit(job)
+        elif job and job.cleanup:
+            job.cleanup()
 
         if success:
-            logger.info(f"Updated game (ID: {game_id}): '{game_data.get('title')}'")
+            logger.info("Updated game (ID: %s): '%s'", game_id, game_data.get('title'))
         return success
 
     except (ValueError, TypeError) as e:
-        logger.error(f"Invalid game data: {e}")
+        logger.error("Invalid game data: %s", e)
         return False
     except Exception as e:
-        logger.error(f"Unexpected error in update_game: {e}", exc_info=True)
+        logger.error("Unexpected error in update_game: %s", e, exc_info=True)
         return False
 
 
 @eel.expose
+@instrument
+@outside_transaction
+def get_screenshot_job(job_id):
+    """Состояние фонового задания скриншота: queued, processing, done, failed, superseded"""
+    return screenshot_jobs.get_job(job_id)
+
+
+@eel.expose
+@instrument
+@outside_transaction
 def delete_game(game_id):
     """Удаляет игру"""
     try:
         repo = GameRepository()
 
-        # Получаем название игры для логов и путь к скриншоту
-        game_info = repo.get_game_by_id(game_id)
+        with db.transaction(immediate=True):
+            # Получаем название игры для логов и путь к скриншоту
+            game_info = repo.get_game_by_id(game_id)
 
-        if not game_info:
-            return False
+            if not game_info:
+                return False
 
-        game_title = game_info["title"]
-        screenshot_path = game_info["screenshot_path"]
+            game_title = game_info["title"]
+            screenshot_path = game_info["screenshot_path"]
 
-        # Удаляем скриншот
-        if screenshot_path:
-            delete_screenshot(screenshot_path, game_id)
+            # Удаляем игру из БД
+            success = repo.delete_game(game_id)
 
-        # Удаляем игру из БД
-        success = repo.delete_game(game_id)
+        # Скриншот удаляем после коммита, если на него больше никто не ссылается
+        if success and screenshot_path:
+            delete_screenshot(screenshot_path, game_id)
 
         if success:
-            logger.info(f"Deleted game (ID: {game_id}): '{game_title}'")
+            logger.info("Deleted game (ID: %s): '%s'", game_id, game_title)
         return success
 
     except Exception as e:
-        logger.error(f"Unexpected error in delete_game: {e}", exc_info=True)
+        logger.error("Unexpected error in delete_game: %s", e, exc_info=True)
         return False
 
 
 @eel.expose
+@instrument
+@outside_transaction
 def get_statistics():
     """Получает статистику по играм"""
     try:
@@ -180,7 +621,7 @@ def get_statistics():
         return stats
 
     except Exception as e:
-        logger.error(f"Error getting statistics: {e}", exc_info=True)
+        logger.error("Error getting statistics: %s", e, exc_info=True)
         return {
             "total_games": 0,
             "completed": 0,
@@ -191,12 +632,246 @@ def get_statistics():
 
 
 @eel.expose
+@instrument
+@outside_transaction
+def export_library(path, fmt=None, include_screenshots=False):
+    """
+    Экспортирует библиотеку в файл (.jsonl, .csv или .zip со скриншотами).
+    Возвращает {"exported", "screenshots", "path"} или {"error"}.
+    """
+    from app import library_io
+
+    try:
+        return library_io.export_library(path, fmt, include_screenshots)
+    except (OSError, ValueError) as e:
+        logger.error("Error exporting library to %s: %s", path, e)
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error("Unexpected error in export_library: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def import_library(path, fmt=None):
+    """
+    Импортирует игры из файла (.jsonl, .csv или .zip со скриншотами).
+    Возвращает {"imported", "skipped", "screenshots"} или {"error"}.
+    """
+    from app import library_io
+
+    try:
+        return library_io.import_library(path, fmt)
+    except (OSError, ValueError) as e:
+        logger.error("Error importing library from %s: %s", path, e)
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error("Unexpected error in import_library: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def create_backup():
+    """
+    Запускает резервную копию базы и скриншотов в фоне.
+    Возвращает состояние копии (как get_backup_status).
+    """
+    from app.backup import backup_job
+
+    try:
+        return backup_job.start()
+    except Exception as e:
+        logger.error("Unexpected error in create_backup: %s", e, exc_info=True)
+        return {"state": "failed", "error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def get_backup_status():
+    """
+    Состояние последней копии за запуск: {"state": "idle" | "running" | "done" | "failed", ...}.
+    Во время копирования — "pages_done"/"pages_total", после — "name" и "stats".
+    """
+    from app.backup import backup_job
+
+    return backup_job.status()
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def list_backups():
+    """
+    Сохранённые резервные копии от новых к старым и копия,
+    запланированная к восстановлению ("pending_restore").
+    """
+    from app import backup
+
+    try:
+        return {"backups": backup.list_backups(), "pending_restore": backup.pending_restore()}
+    except OSError as e:
+        logger.error("Error listing backups: %s", e, exc_info=True)
+        return {"backups": [], "pending_restore": None, "error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def restore_backup(name):
+    """
+    Планирует восстановление копии при следующем запуске (база сейчас открыта).
+    Возвращает {"name", "restart_required"} или {"error"}.
+    """
+    from app.backup import schedule_restore
+
+    try:
+        return schedule_restore(name)
+    except (OSError, ValueError) as e:
+        logger.error("Error scheduling restore of backup %s: %s", name, e)
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error("Unexpected error in restore_backup: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@eel.expose
+@instrument
+@outside_transaction
+def cancel_restore():
+    """Отменяет запланированное восстановление; True, если оно было"""
+    from app import backup
+
+    return backup.cancel_restore()
+
+
+@eel.expose
+@outside_transaction
+def get_metrics():
+    """
+    Метрики вызовов API и медленные запросы с запуска приложения
+    ({"enabled": False}, если метрики выключены)
+    """
+    return metrics_snapshot()
+
+
+@eel.expose
+@instrument
+@outside_transaction
 def check_updates():
-    """Проверяет наличие обновлений"""
-    return check_for_updates()
+    """
+    Сохранённый результат проверки обновлений (без обращения к сети).
+    Проверку выполняет фоновый поток при запуске; пока её первый ответ
+    не получен, в результате "pending": True.
+    """
+    return get_update_info()
 
 
 @eel.expose
+@instrument
+@outside_transaction
 def update_app(update_info):
     """Обновляет приложение"""
     perform_update(update_info)
+
+
+# Уведомления фронтенда.
+# Вызывать eel из чужого потока нельзя: рабочие потоки кладут события в очередь,
+# а гринлет Eel раз в PUSH_INTERVAL передаёт их во все открытые окна.
+# Изменения библиотеки за этот интервал уходят одним событием.
+
+_screenshot_events = queue.Queue()
+screenshot_jobs.add_listener(_screenshot_events.put)
+
+
+class ChangePusher:
+    """
+    Собирает изменения библиотеки с момента прошлого уведомления.
+    Опрашивает library_revision, поэтому замечает и запись из другого процесса.
+    """
+
+    def __init__(self):
+        self.revision = None
+
+    def poll(self):
+        """
+        Событие {"from_revision", "revision", "resync", "games", "deleted", "stats"}
+        или None, если с прошлого вызова ничего не менялось.
+        games — в колоночном формате app/wire_format.py, как у load_games_since.
+        resync=True — изменения после from_revision восстановить нельзя
+        (games и deleted пусты), клиенту нужно перечитать библиотеку.
+        Первый вызов только запоминает текущую ревизию.
+        """
+        repo = GameRepository()
+        previous = self.revision
+        # Пока записей не было, опрос стоит одного чтения строки library_revision
+        current = repo.get_revision()
+        if previous is None or current == previous:
+            self.revision = current
+            return None
+
+        with db:
+            current = repo.get_revision()
+            resync = current < previous or previous < repo.get_change_floor()
+            if resync:
+                # База заменена (например, восстановлена из копии) или надгробия
+                # после previous уже удалены — клиент перечитает всё
+                games, deleted = [], []
+            else:
+                games, deleted = repo.get_changes_since(previous)
+            stats = repo.get_statistics()
+
+        event = {
+            "from_revision": previous,
+            "revision": current,
+            "resync": resync,
+            "games": encode_games([_prepare_game(game) for game in games]),
+            "deleted": deleted,
+            "stats": stats,
+        }
+        # Ревизию запоминаем только после успешной сборки события:
+        # при ошибке следующий вызов повторит попытку, а не будет ждать новой записи
+        self.revision = current
+        return event
+
+
+def _call_js(name, payload):
+    try:
+        getattr(eel, name)(payload)
+    except Exception as e:
+        # Страница ещё не загрузилась или окно закрыто
+        logger.debug("Frontend notification %s dropped: %s", name, e)
+
+
+def _push_events():
+    pusher = ChangePusher()
+    pusher.poll()
+    # Функции фронтенда регистрируются после загрузки окна (main.py):
+    # до этого изменения и готовые скриншоты копятся, а не теряются
+    while not hasattr(eel, "onLibraryChanged"):
+        eel.sleep(PUSH_INTERVAL)
+    while True:
+        try:
+            event = pusher.poll()
+        except Exception as e:
+            logger.error("Error collecting library changes: %s", e, exc_info=True)
+        else:
+            if event:
+                _call_js("onLibraryChanged", event)
+
+        while True:
+            try:
+                status = _screenshot_events.get_nowait()
+            except queue.Empty:
+                break
+            _call_js("onScreenshotProcessed", status)
+
+        eel.sleep(PUSH_INTERVAL)
+
+
+def start_notifier():
+    """Запускает гринлет, передающий фронтенду изменения библиотеки и готовность скриншотов"""
+    eel.spawn(_push_events)
@@ -0,0 +1,555 @@
+# app/backup.py
+
+"""
+Резервные копии базы и скриншотов без остановки приложения.
+
+Копия — папка BACKUP_DIR/<ГГГГММДД-ЧЧММСС> с файлами:
+    app.db         — база, скопированная sqlite3 backup API по BACKUP_PAGES_PER_STEP
+                     страниц за шаг с паузой между шагами: блокировка чтения держится
+                     только на время шага, запись из UI не ждёт всю копию
+    screenshots/   — файлы SCREENSHOTS_DIR
+    manifest.json  — хэш, размер и mtime каждого файла и статистика копии;
+                     пишется последним, копия без него считается незаконченной
+    in-progress    — метка создаваемой копии; её mtime обновляется во время работы.
+                     Копию может создавать и другой процесс (cli.py backup при
+                     запущенном приложении), поэтому незаконченная копия удаляется,
+                     только если метка не обновлялась дольше BACKUP_STALE_AFTER
+
+Скриншоты копируются инкрементально: файл, хэш которого уже есть в предыдущей
+копии, не копируется, а становится жёсткой ссылкой на её файл (или копируется,
+если файловая система ссылки не поддерживает). Хэш не пересчитывается, если
+имя, размер и mtime совпадают с записью предыдущего манифеста.
+
+Восстановить копию в работающем приложении нельзя — база открыта, поэтому
+restore_backup только записывает RESTORE_MARKER, а копию подставляет
+apply_pending_restore при следующем запуске, до открытия базы.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.fsutil import write_file_atomic
+from app.image_utils import file_content_hash
+from app.logger import get_logger
+from config import (
+    APP_VERSION,
+    BACKUP_DIR,
+    BACKUP_INTERVAL,
+    BACKUP_KEEP,
+    BACKUP_MAX_RESTARTS,
+    BACKUP_PAGES_PER_STEP,
+    BACKUP_STALE_AFTER,
+    BACKUP_STEP_PAUSE,
+    DB_FILE,
+    DB_TIMEOUT,
+    RESTORE_MARKER,
+    SCREENSHOTS_DIR,
+)
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+IN_PROGRESS_FILE = "in-progress"
+BACKUP_DB_FILE = "app.db"
+BACKUP_SCREENSHOTS_DIR = "screenshots"
+BACKUP_NAME_FORMAT = "%Y%m%d-%H%M%S"
+PRE_RESTORE_SUFFIX = ".before-restore"  # текущая база перед восстановлением
+
+_creating = set()  # папки копий, которые сейчас создаёт этот процесс
+_creating_lock = threading.Lock()
+
+
+class BackupError(ValueError):
+    """Копию нельзя создать или восстановить"""
+
+
+class _CopyRestarted(Exception):
+    """Пошаговое копирование базы слишком часто начиналось заново"""
+
+
+# ---------------------------------------------------------------------------
+# Список копий
+# ---------------------------------------------------------------------------
+
+def _read_manifest(snapshot_dir: Path) -> Optional[dict]:
+    try:
+        with open(snapshot_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _snapshot_dirs() -> list[Path]:
+    """Папки копий (в том числе незаконченных), от старых к новым"""
+    if not BACKUP_DIR.is_dir():
+        return []
+    return sorted(path for path in BACKUP_DIR.iterdir() if path.is_dir())
+
+
+def list_backups() -> list[dict]:
+    """Законченные копии от новых к старым: имя, время создания и статистика"""
+    backups = []
+    for snapshot_dir in reversed(_snapshot_dirs()):
+        manifest = _read_manifest(snapshot_dir)
+        if manifest is None:
+            continue
+        backups.append(
+            {
+                "name": snapshot_dir.name,
+                "created_at": manifest.get("created_at"),
+                "app_version": manifest.get("app_version"),
+                "schema_version": manifest.get("schema_version"),
+                "files": len(manifest.get("files", {})),
+                "stats": manifest.get("stats", {}),
+            }
+        )
+    return backups
+
+
+def _is_abandoned(snapshot_dir: Path) -> bool:
+    """Незаконченная копия, которую не создаёт ни этот, ни другой процесс"""
+    with _creating_lock:
+        if snapshot_dir.name in _creating:
+            return False
+    try:
+        marked = (snapshot_dir / IN_PROGRESS_FILE).stat().st_mtime
+    except FileNotFoundError:
+        # Метки ещё нет (папку только что создали) или копия упала до её записи
+        try:
+            marked = snapshot_dir.stat().st_mtime
+        except FileNotFoundError:
+            return False
+    return time.time() - marked > BACKUP_STALE_AFTER
+
+
+def _latest_snapshot() -> tuple[Optional[Path], Optional[dict]]:
+    for snapshot_dir in reversed(_snapshot_dirs()):
+        manifest = _read_manifest(snapshot_dir)
+        if manifest is not None:
+            return snapshot_dir, manifest
+    return None, None
+
+
+def _snapshot_dir(name: str) -> Path:
+    """Папка копии по имени из list_backups (без выхода за BACKUP_DIR)"""
+    if not name or os.path.basename(name) != name or name in (".", ".."):
+        raise BackupError(f"Invalid backup name: '{name}'")
+    return BACKUP_DIR / name
+
+
+# ---------------------------------------------------------------------------
+# Создание копии
+# ---------------------------------------------------------------------------
+
+def _heartbeat(snapshot_dir: Path):
+    """
+    Пишет метку создаваемой копии и возвращает функцию, обновляющую её mtime
+    (не чаще раза в четверть BACKUP_STALE_AFTER).
+    """
+    marker = snapshot_dir / IN_PROGRESS_FILE
+    marker.write_text(str(os.getpid()), encoding="utf-8")
+    interval = BACKUP_STALE_AFTER / 4
+    last = time.monotonic()
+
+    def beat():
+        nonlocal last
+        now = time.monotonic()
+        if now - last >= interval:
+            last = now
+            os.utime(marker)
+
+    return beat
+
+
+def _backup_database(target: Path, stats: dict, progress=None, beat=None) -> None:
+    """
+    Онлайн-копия базы по шагам. Если базу меняет другое соединение, SQLite
+    начинает копирование заново; после BACKUP_MAX_RESTARTS перезапусков база
+    копируется одним шагом — в режиме WAL чтение не блокирует запись, так что
+    UI не ждёт и в этом случае, но копия не сдвигается при каждой записи.
+    """
+    started = time.perf_counter()
+    steps = 0
+    restarts = 0
+    last_remaining = None
+
+    def on_step(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _CopyRestarted()
+        last_remaining = remaining
+        stats["db_pages"] = total
+        if beat:
+            beat()
+        if progress:
+            progress(total - remaining, total)
+        if BACKUP_STEP_PAUSE:
+            time.sleep(BACKUP_STEP_PAUSE)
+
+    source = sqlite3.connect(str(DB_FILE), timeout=DB_TIMEOUT)
+    try:
+        destination = sqlite3.connect(str(target))
+        try:
+            try:
+                source.backup(destination, pages=BACKUP_PAGES_PER_STEP, progress=on_step)
+            except _CopyRestarted:
+                logger.info("Backup restarted %s times by writes, copying database in one step", restarts)
+                source.backup(destination)
+                steps += 1
+            stats["schema_version"] = destination.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            destination.close()
+    finally:
+        source.close()
+
+    stats["db_bytes"] = target.stat().st_size
+    stats["db_steps"] = steps
+    stats["db_restarts"] = restarts
+    stats["db_seconds"] = round(time.perf_counter() - started, 3)
+
+
+def _link_or_copy(source: Path, target: Path) -> bool:
+    """Жёсткая ссылка на файл прошлой копии; True, если удалось без копирования"""
+    try:
+        os.link(source, target)
+        return True
+    except OSError:
+        shutil.copy2(source, target)
+        return False
+
+
+def _backup_screenshots(
+    target_dir: Path, previous_dir: Optional[Path], previous: dict, stats: dict, beat=None
+) -> dict:
+    """
+    Копирует файлы скриншотов, пропуская уже сохранённые в прошлой копии.
+    Возвращает манифест файлов {имя: [хэш, размер, mtime_ns]}.
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    previous_files = previous.get("files", {}) if previous_dir else {}
+    # хэш → имя файла в прошлой копии (имя файла могло измениться)
+    previous_by_hash = {entry[0]: name for name, entry in previous_files.items()}
+
+    files = {}
+    if not SCREENSHOTS_DIR.is_dir():
+        return files
+    for source in sorted(SCREENSHOTS_DIR.iterdir()):
+        if not source.is_file() or ".tmp" in source.name:
+            continue
+        if beat:
+            beat()
+        try:
+            info = source.stat()
+            entry = previous_files.get(source.name)
+            if entry and entry[1] == info.st_size and entry[2] == info.st_mtime_ns:
+                digest = entry[0]
+            else:
+                digest = file_content_hash(source)
+                stats["bytes_hashed"] += info.st_size
+
+            target = target_dir / source.name
+            reused = previous_by_hash.get(digest)
+            if reused and (previous_dir / BACKUP_SCREENSHOTS_DIR / reused).is_file():
+                if _link_or_copy(previous_dir / BACKUP_SCREENSHOTS_DIR / reused, target):
+                    stats["files_linked"] += 1
+                    stats["bytes_linked"] += info.st_size
+                else:
+                    stats["files_copied"] += 1
+                    stats["bytes_copied"] += info.st_size
+            else:
+                shutil.copy2(source, target)
+                stats["files_copied"] += 1
+                stats["bytes_copied"] += info.st_size
+            files[source.name] = [digest, info.st_size, info.st_mtime_ns]
+        except FileNotFoundError:
+            # Файл удалили во время копирования — в копию он не попадает
+            continue
+    return files
+
+
+def create_backup(progress=None) -> dict:
+    """
+    Создаёт копию базы и скриншотов и удаляет старые сверх BACKUP_KEEP.
+    progress(pages_done, pages_total) вызывается после каждого шага копирования базы.
+    Возвращает {"name", "stats"}.
+    """
+    started = time.perf_counter()
+    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    previous_dir, previous = _latest_snapshot()
+
+    name = time.strftime(BACKUP_NAME_FORMAT)
+    snapshot_dir = BACKUP_DIR / name
+    suffix = 1
+    while True:
+        # mkdir без exist_ok: папку с тем же именем может создавать другой процесс
+        try:
+            snapshot_dir.mkdir()
+            break
+        except FileExistsError:
+            suffix += 1
+            snapshot_dir = BACKUP_DIR / f"{name}-{suffix}"
+    with _creating_lock:
+        _creating.add(snapshot_dir.name)
+
+    stats = {
+        "files_copied": 0,
+        "files_linked": 0,
+        "bytes_copied": 0,
+        "bytes_linked": 0,
+        "bytes_hashed": 0,
+    }
+    try:
+        beat = _heartbeat(snapshot_dir)
+        _backup_database(snapshot_dir / BACKUP_DB_FILE, stats, progress, beat)
+        files = _backup_screenshots(
+            snapshot_dir / BACKUP_SCREENSHOTS_DIR, previous_dir, previous or {}, stats, beat
+        )
+        stats["files"] = len(files)
+        stats["bytes_written"] = stats["db_bytes"] + stats["bytes_copied"]
+        stats["duration_s"] = round(time.perf_counter() - started, 3)
+
+        manifest = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+            "created_ts": time.time(),
+            "app_version": APP_VERSION,
+            "schema_version": stats.pop("schema_version", None),
+            "previous": previous_dir.name if previous_dir else None,
+            "files": files,
+            "stats": stats,
+        }
+        write_file_atomic(
+            snapshot_dir / MANIFEST_FILE,
+            json.dumps(manifest, ensure_ascii=False).encode("utf-8"),
+        )
+    except (OSError, sqlite3.Error) as e:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        logger.error("Backup failed: %s", e, exc_info=True)
+        raise BackupError(f"Backup failed: {e}") from e
+    finally:
+        with _creating_lock:
+            _creating.discard(snapshot_dir.name)
+    try:
+        # Копия закончена манифестом; оставшаяся метка ей не мешает
+        os.remove(snapshot_dir / IN_PROGRESS_FILE)
+    except OSError:
+        pass
+
+    logger.info(
+        "Backup %s created in %.2f s: db %s bytes in %s steps, "
+        "%s files (%s copied, %s linked), %s bytes written, %s bytes hashed",
+        snapshot_dir.name,
+        stats["duration_s"],
+        stats["db_bytes"],
+        stats["db_steps"],
+        stats["files"],
+        stats["files_copied"],
+        stats["files_linked"],
+        stats["bytes_written"],
+        stats["bytes_hashed"],
+    )
+    prune_backups()
+    return {"name": snapshot_dir.name, "stats": stats}
+
+
+def prune_backups(keep: int = BACKUP_KEEP) -> int:
+    """
+    Удаляет копии старше keep последних и брошенные незаконченные: создаваемые
+    сейчас этим или другим процессом (метка обновлялась недавно) не трогает.
+    Файлы, на которые ссылаются оставшиеся копии, остаются: это жёсткие ссылки.
+    Возвращает число удалённых папок.
+    """
+    complete = []
+    removed = 0
+    for snapshot_dir in _snapshot_dirs():
+        if _read_manifest(snapshot_dir) is not None:
+            complete.append(snapshot_dir)
+        elif _is_abandoned(snapshot_dir):
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            removed += 1
+    for snapshot_dir in complete[: max(0, len(complete) - max(1, keep))]:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        removed += 1
+    if removed:
+        logger.info("Pruned %s old backup(s), keeping %s", removed, min(len(complete), max(1, keep)))
+    return removed
+
+
+class BackupJob:
+    """Фоновое создание копии: не больше одной одновременно, состояние для API"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.running = False
+        self.state = {"state": "idle"}
+
+    def start(self) -> dict:
+        """Запускает копию в фоновом потоке; если она уже идёт — возвращает её состояние"""
+        with self._lock:
+            if self.running:
+                return self.status()
+            self.running = True
+            self.state = {"state": "running", "started_at": time.time(), "pages_done": 0, "pages_total": 0}
+            self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+            self._thread.start()
+            return dict(self.state)
+
+    def _progress(self, done, total):
+        with self._lock:
+            self.state["pages_done"] = done
+            self.state["pages_total"] = total
+
+    def _run(self):
+        try:
+            result = create_backup(self._progress)
+            state = {"state": "done", **result}
+        except Exception as e:
+            logger.error("Background backup failed: %s", e, exc_info=True)
+            state = {"state": "failed", "error": str(e)}
+        with self._lock:
+            self.state = state
+            self.running = False
+
+    def status(self) -> dict:
+        with self._lock:
+            return dict(self.state)
+
+    def join(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+backup_job = BackupJob()
+
+
+def start_scheduled_backup() -> bool:
+    """
+    Запускает копию в фоне, если последняя старше BACKUP_INTERVAL.
+    Вызывается после открытия окна; True, если копия запущена.
+    """
+    if not BACKUP_INTERVAL:
+        return False
+    _, manifest = _latest_snapshot()
+    if manifest:
+        age = time.time() - (manifest.get("created_ts") or 0)
+        if 0 <= age < BACKUP_INTERVAL:
+            return False
+    logger.info("Starting scheduled backup")
+    backup_job.start()
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Восстановление
+# ---------------------------------------------------------------------------
+
+def schedule_restore(name: str) -> dict:
+    """Помечает копию для восстановления при следующем запуске"""
+    snapshot_dir = _snapshot_dir(name)
+    if _read_manifest(snapshot_dir) is None or not (snapshot_dir / BACKUP_DB_FILE).is_file():
+        raise BackupError(f"Backup not found: '{name}'")
+    write_file_atomic(RESTORE_MARKER, json.dumps({"name": name}).encode("utf-8"))
+    logger.info("Restore of backup %s scheduled for the next start", name)
+    return {"name": name, "restart_required": True}
+
+
+def cancel_restore() -> bool:
+    """Отменяет запланированное восстановление"""
+    try:
+        os.remove(RESTORE_MARKER)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def pending_restore() -> Optional[str]:
+    """Имя копии, которая будет восстановлена при следующем запуске"""
+    try:
+        with open(RESTORE_MARKER, "r", encoding="utf-8") as f:
+            return json.load(f).get("name")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _checkpoint(db_file: Path) -> None:
+    """Переносит WAL в файл базы, чтобы её можно было перенести одним файлом"""
+    conn = sqlite3.connect(str(db_file), timeout=DB_TIMEOUT)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def _move_database(source: Path, target: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        src = Path(f"{source}{suffix}")
+        if src.exists():
+            os.replace(src, f"{target}{suffix}")
+
+
+def apply_pending_restore() -> Optional[str]:
+    """
+    Восстанавливает запланированную копию. Вызывается при запуске до открытия базы.
+    Текущая база сохраняется рядом с суффиксом .before-restore, файлы скриншотов
+    из копии дописываются в SCREENSHOTS_DIR (лишние файлы не удаляются).
+    Возвращает имя восстановленной копии или None.
+    """
+    name = pending_restore()
+    if not name:
+        return None
+    cancel_restore()
+
+    try:
+        snapshot_dir = _snapshot_dir(name)
+        manifest = _read_manifest(snapshot_dir)
+        if manifest is None:
+            raise BackupError(f"Backup not found: '{name}'")
+
+        started = time.perf_counter()
+        # Копию базы проверяем до того, как убрать текущую
+        check = sqlite3.connect(f"file:{snapshot_dir / BACKUP_DB_FILE}?mode=ro", uri=True)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            check.close()
+        if result != "ok":
+            raise BackupError(f"Backup database is damaged: {result}")
+
+        if DB_FILE.exists():
+            _checkpoint(DB_FILE)
+            _move_database(DB_FILE, Path(f"{DB_FILE}{PRE_RESTORE_SUFFIX}"))
+        tmp_path = Path(f"{DB_FILE}.tmp{os.getpid()}")
+        shutil.copyfile(snapshot_dir / BACKUP_DB_FILE, tmp_path)
+        os.replace(tmp_path, DB_FILE)
+
+        SCREENSHOTS_DIR.mkdir(parents=True, exist_ok=True)
+        copied = 0
+        for file_name, (_, size, _) in manifest.get("files", {}).items():
+            target = SCREENSHOTS_DIR / file_name
+            if target.is_file() and target.stat().st_size == size:
+                continue
+            write_file_atomic(target, (snapshot_dir / BACKUP_SCREENSHOTS_DIR / file_name).read_bytes())
+            copied += 1
+    except (OSError, sqlite3.Error, BackupError) as e:
+        logger.error("Restore of backup %s failed: %s", name, e, exc_info=True)
+        return None
+
+    logger.info(
+        "Backup %s restored in %.2f s (%s screenshot files copied), previous database kept as %s%s",
+        name,
+        time.perf_counter() - started,
+        copied,
+        DB_FILE.name,
+        PRE_RESTORE_SUFFIX,
+    )
+    return name
@@ -0,0 +1,162 @@
+# app/batch_reencode.py
+
+"""
+Пакетное перекодирование скриншотов под текущие настройки сжатия.
+
+Файлы обрабатываются параллельно в пуле процессов (кодирование WebP упирается
+в CPU, а GIL не дает потокам работать одновременно). Файлы, уже закодированные
+с целевыми настройками (по метаданным <имя>.meta.json), пропускаются, поэтому
+прерванный запуск можно просто повторить.
+
+Перекодирование читает уже сжатый WebP, и каждое повторное сжатие добавляет
+потери. Поэтому файл перекодируется, только если новые настройки строже
+прежних (ниже качество, меньше ширина или байтовый бюджет). Если качество
+поднимается или меняется лишь профиль, файл остаётся как есть (force=True
+перекодирует всё).
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from PIL import Image
+
+from app.image_utils import (
+    build_derivatives,
+    encoding_settings,
+    get_profile,
+    list_screenshot_files,
+    read_metadata,
+    write_derivatives,
+)
+from app.logger import get_logger
+from config import IMAGE_MAX_WIDTH, IMAGE_QUALITY
+
+logger = get_logger(__name__)
+
+
+def is_up_to_date(path, settings: dict) -> bool:
+    """Файл закодирован с settings и не менялся после этого"""
+    metadata = read_metadata(path)
+    if not metadata or metadata.get("settings") != settings:
+        return False
+    try:
+        return os.path.getsize(path) == metadata.get("size")
+    except OSError:
+        return False
+
+
+def can_reduce(path, settings: dict) -> bool:
+    """
+    Перекодирование с settings уменьшит файл, а не только добавит потерь:
+    качество, ширина или байтовый бюджет строже, чем у текущего файла.
+    Файл без метаданных (настройки неизвестны) перекодируется.
+    """
+    metadata = read_metadata(path)
+    current = (metadata or {}).get("settings")
+    if not current:
+        return True
+    budget = settings.get("byte_budget") or 0
+    current_budget = current.get("byte_budget") or 0
+    return (
+        settings["quality"] < current.get("quality", settings["quality"] + 1)
+        or settings["max_width"] < current.get("max_width", settings["max_width"] + 1)
+        or bool(budget and (not current_budget or budget < current_budget))
+    )
+
+
+def _reencode_file(path: str, max_width: int, quality: int, profile: Optional[str]) -> tuple:
+    """
+    Перекодирует один файл (выполняется в дочернем процессе).
+    Возвращает (путь, байт до, байт после).
+    """
+    bytes_before = os.path.getsize(path)
+    with Image.open(path) as image:
+        image.load()
+        derivatives = build_derivatives(image, max_width, quality, profile)
+    write_derivatives(path, derivatives, encoding_settings(max_width, quality, profile))
+    return path, bytes_before, len(derivatives["full"])
+
+
+def reencode_screenshots(
+    max_width: int = IMAGE_MAX_WIDTH,
+    quality: int = IMAGE_QUALITY,
+    profile: Optional[str] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Перекодирует все скриншоты с настройками max_width/quality/profile
+    (profile=None — IMAGE_PROFILE из config.py).
+    progress(result) вызывается после каждого обработанного файла.
+    Без force файлы, которые перекодирование не уменьшит (can_reduce), не трогаются.
+    Возвращает {"processed", "skipped", "kept", "failed", "bytes_before", "bytes_after",
+    "bytes_saved", "elapsed", "images_per_second"}; kept — файлы, оставленные,
+    чтобы не терять качество повторным сжатием.
+    """
+    get_profile(profile)  # неизвестный профиль — ValueError до запуска пула
+    settings = encoding_settings(max_width, quality, profile)
+    result = {
+        "processed": 0,
+        "skipped": 0,
+        "kept": 0,
+        "failed": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "bytes_saved": 0,
+        "elapsed": 0.0,
+        "images_per_second": 0.0,
+    }
+
+    pending = []
+    for filepath in list_screenshot_files():
+        if not force and is_up_to_date(filepath, settings):
+            result["skipped"] += 1
+        elif not force and not can_reduce(filepath, settings):
+            result["kept"] += 1
+        else:
+            pending.append(str(filepath))
+
+    if not pending:
+        return result
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+        futures = {
+            executor.submit(_reencode_file, path, max_width, quality, profile): path
+            for path in pending
+        }
+        for future in as_completed(futures):
+            try:
+                _, bytes_before, bytes_after = future.result()
+            except Exception as e:
+                result["failed"] += 1
+                logger.error("Error re-encoding %s: %s", futures[future], e)
+            else:
+                result["processed"] += 1
+                result["bytes_before"] += bytes_before
+                result["bytes_after"] += bytes_after
+                result["bytes_saved"] = result["bytes_before"] - result["bytes_after"]
+
+            elapsed = time.perf_counter() - started
+            result["elapsed"] = elapsed
+            result["images_per_second"] = result["processed"] / elapsed if elapsed else 0.0
+            if progress:
+                progress(result)
+
+    logger.info(
+        "Screenshots re-encoded: %s processed, %s skipped, %s kept, %s failed, "
+        "%s bytes saved in %.1fs (%.1f images/s)",
+        result["processed"],
+        result["skipped"],
+        result["kept"],
+        result["failed"],
+        result["bytes_saved"],
+        result["elapsed"],
+        result["images_per_second"],
+    )
+    return result
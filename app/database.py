@@ -1,16 +1,104 @@
 # app/database.py
 
+import atexit
+import base64
+import functools
+import json
 import re
 import sqlite3
+import threading
+from contextlib import contextmanager
 from typing import Optional
 
 from app.logger import get_logger
-from app.migrations import run_migrations
-from config import DB_FILE, DB_TIMEOUT
+from app.metrics import connection_factory
+from app.migrations import run_backfills, run_migrations
+from app.text import normalize_title, split_developers
+from config import DB_CACHE_SIZE_KB, DB_FILE, DB_MMAP_SIZE, DB_TIMEOUT, TOMBSTONE_KEEP
 
 logger = get_logger(__name__)
 
 
+# Статусы игр (колонки счётчиков в game_stats)
+GAME_STATUSES = ("completed", "playing", "planned", "dropped")
+
+# Порядок статусов в списке по умолчанию (по убыванию ранга).
+# Выражение должно совпадать с индексом idx_games_status_rank (миграция 3).
+STATUS_RANK_SQL = """CASE status
+                WHEN 'playing' THEN 4
+                WHEN 'completed' THEN 3
+                WHEN 'planned' THEN 2
+                WHEN 'dropped' THEN 1
+                ELSE 0
+            END"""
+
+# Порядки сортировки списка: ключи (SQL-выражения) и направление.
+# Последний ключ всегда id, чтобы позиция keyset-курсора была однозначной.
+SORT_ORDERS = {
+    "status": ((STATUS_RANK_SQL, "created_at", "id"), "DESC"),
+    "added-asc": (("updated_at", "id"), "DESC"),
+    "added-desc": (("created_at", "id"), "DESC"),
+    "title-asc": (("title_norm", "id"), "ASC"),
+    "rating-desc": (("rating", "id"), "DESC"),
+}
+
+QUERY_DEFAULT_LIMIT = 50
+QUERY_MAX_LIMIT = 500
+
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 1000
+# Веса колонок games_fts для bm25: title, developer, review
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+
+SIMILAR_DEFAULT_LIMIT = 10
+SIMILAR_MAX_LIMIT = 100
+SIMILAR_MIN_LENGTH = 2  # короче — похожие названия не ищутся
+SIMILAR_SUBSTRING_MIN_LENGTH = 4  # с этой длины ввода ищутся и подстроки
+# Виды совпадения по убыванию важности
+SIMILAR_MATCHES = ("exact", "prefix", "words", "substring")
+
+DEVELOPER_SUGGEST_DEFAULT_LIMIT = 10
+DEVELOPER_SUGGEST_MAX_LIMIT = 100
+DEVELOPER_SUGGEST_MIN_LENGTH = 2  # короче — подсказки не ищутся
+
+
+def _casefold(text):
+    """Регистронезависимый ключ сравнения (str.lower() не сворачивает ß и подобные)"""
+    return text.casefold() if text else ""
+
+
+def build_fts_query(text: str) -> str:
+    """
+    Превращает пользовательский ввод в запрос FTS5: каждое слово — префикс,
+    все слова обязательны. Кавычки защищают от синтаксиса FTS5 во вводе.
+    """
+    text = (text or "").replace("ё", "е").replace("Ё", "Е")
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _fts_quote(text: str) -> str:
+    """Текст внутри строки FTS5 в двойных кавычках"""
+    return text.replace('"', '""')
+
+
+def encode_cursor(values) -> str:
+    """Упаковывает значения ключей сортировки последней строки в курсор"""
+    raw = json.dumps(list(values), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Распаковывает курсор, ValueError если он повреждён"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor: expected a list")
+    return values
+
+
 def sanitize_text(text: str) -> str:
     """Убирает < и > из текста — простая защита от XSS"""
     if not text:
@@ -18,92 +106,502 @@ def sanitize_text(text: str) -> str:
     return re.sub(r"[<>]", "", str(text))
 
 
+DEVELOPER_VALUE = 6  # позиция developer в _game_values
+
+
+def _game_values(game_data: dict) -> tuple:
+    """
+    Значения колонок (title, version, status, rating, review, game_link, developer,
+    title_norm) с теми же правилами очистки для всех путей записи.
+    Пустой статус становится 'planned', неизвестный — ValueError.
+    """
+    title = sanitize_text(game_data.get("title", ""))
+    status = game_data.get("status") or "planned"
+    if status not in GAME_STATUSES:
+        raise ValueError(f"Unknown game status: '{status}'")
+    return (
+        title,
+        sanitize_text(game_data.get("version", "")),
+        status,
+        float(game_data.get("rating", 0)),
+        sanitize_text(game_data.get("review", "")),
+        game_data.get("game_link", ""),
+        sanitize_text(game_data.get("developer", "")),
+        normalize_title(title),
+    )
+
+
+def sync_game_developers(conn: sqlite3.Connection, game_id: int, developer: str) -> None:
+    """
+    Приводит связи игры в game_developers к строке developer.
+    Меняются только добавленные и убранные разработчики; счётчики game_count
+    и удаление разработчиков без игр выполняют триггеры.
+    """
+    names = split_developers(developer)
+    current = {
+        row[0]: row[1]
+        for row in conn.execute(
+            "SELECT d.name_fold, d.id FROM game_developers gd "
+            "JOIN developers d ON d.id = gd.developer_id WHERE gd.game_id = ?",
+            (game_id,),
+        )
+    }
+    removed = [
+        (game_id, developer_id) for fold, developer_id in current.items() if fold not in names
+    ]
+    if removed:
+        conn.executemany(
+            "DELETE FROM game_developers WHERE game_id = ? AND developer_id = ?", removed
+        )
+    for fold, name in names.items():
+        if fold in current:
+            continue
+        conn.execute(
+            "INSERT OR IGNORE INTO developers (name, name_fold) VALUES (?, ?)", (name, fold)
+        )
+        conn.execute(
+            "INSERT INTO game_developers (developer_id, game_id) "
+            "SELECT id, ? FROM developers WHERE name_fold = ?",
+            (game_id, fold),
+        )
+
+
 class GameRepository:
     """Репозиторий для работы с таблицей games"""
 
     def __init__(self):
-        self.db = DatabaseConnection()
+        self.db = db
 
     def get_all_games(self) -> list[dict]:
         """Получает все игры с сортировкой по статусу и дате"""
         with self.db as conn:
             cursor = conn.cursor()
             cursor.execute(
-                """
+                f"""
                 SELECT * FROM games
-                ORDER BY
-                    CASE status
-                        WHEN 'playing' THEN 1
-                        WHEN 'completed' THEN 2
-                        WHEN 'planned' THEN 3
-                        WHEN 'dropped' THEN 4
-                        ELSE 5
-                    END,
-                    created_at DESC
+                ORDER BY {STATUS_RANK_SQL} DESC, created_at DESC, id DESC
             """
             )
             return [dict(row) for row in cursor.fetchall()]
 
+    def get_revision(self) -> int:
+        """Текущая ревизия библиотеки: растёт при каждом добавлении, изменении и удалении"""
+        with self.db as conn:
+            row = conn.execute("SELECT revision FROM library_revision WHERE id = 1").fetchone()
+            return row[0] if row else 0
+
+    def get_change_floor(self) -> int:
+        """Самая старая ревизия, изменения после которой ещё полностью есть в ленте"""
+        with self.db as conn:
+            row = conn.execute(
+                "SELECT tombstone_floor FROM library_revision WHERE id = 1"
+            ).fetchone()
+            return row[0] if row else 0
+
+    def prune_tombstones(self, keep: int = TOMBSTONE_KEEP) -> int:
+        """
+        Удаляет надгробия сверх keep последних и поднимает границу ленты до
+        ревизии последнего удалённого. Возвращает число удалённых надгробий.
+        """
+        with self.db as conn:
+            row = conn.execute(
+                "SELECT revision FROM game_tombstones ORDER BY revision DESC LIMIT 1 OFFSET ?",
+                (max(0, keep),),
+            ).fetchone()
+            if row is None:
+                return 0
+            removed = conn.execute(
+                "DELETE FROM game_tombstones WHERE revision <= ?", (row[0],)
+            ).rowcount
+            conn.execute(
+                "UPDATE library_revision SET tombstone_floor = max(tombstone_floor, ?) WHERE id = 1",
+                (row[0],),
+            )
+            return removed
+
+    def get_changes_since(self, revision: int) -> tuple[list[dict], list[int]]:
+        """Игры, изменённые после ревизии revision, и id игр, удалённых после неё"""
+        with self.db as conn:
+            games = [
+                dict(row)
+                for row in conn.execute(
+                    "SELECT * FROM games WHERE revision > ? ORDER BY revision", (revision,)
+                )
+            ]
+            deleted = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT game_id FROM game_tombstones WHERE revision > ? ORDER BY revision",
+                    (revision,),
+                )
+            ]
+            return games, deleted
+
+    def query_games(
+        self,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        sort: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = QUERY_DEFAULT_LIMIT,
+        developer: Optional[str] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        Возвращает страницу игр с фильтрацией и сортировкой на стороне SQL.
+        developer — имя одного разработчика (без учёта регистра), ищется по game_developers.
+        Пагинация keyset по (ключ сортировки, id): глубокие страницы стоят как первая.
+        Возвращает (игры, курсор следующей страницы или None).
+        """
+        if sort not in SORT_ORDERS:
+            sort = "status"
+        keys, direction = SORT_ORDERS[sort]
+        if status and sort == "status":
+            # Внутри одного статуса ранг постоянен — сортируем по индексу (status, created_at, id)
+            keys = keys[1:]
+
+        limit = max(1, min(int(limit or QUERY_DEFAULT_LIMIT), QUERY_MAX_LIMIT))
+
+        where = []
+        params = []
+
+        if status:
+            where.append("status = ?")
+            params.append(status)
+
+        developer_fold = normalize_title(developer)
+        if developer_fold:
+            # Поиск по уникальному индексу name_fold и первичному ключу связей
+            where.append(
+                "id IN (SELECT gd.game_id FROM developers d "
+                "JOIN game_developers gd ON gd.developer_id = d.id WHERE d.name_fold = ?)"
+            )
+            params.append(developer_fold)
+
+        match = build_fts_query(search)
+        if match:
+            # Слова запроса — префиксы в названии, разработчике или отзыве (индекс games_fts)
+            where.append("id IN (SELECT rowid FROM games_fts WHERE games_fts MATCH ?)")
+            params.append(match)
+
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(keys):
+                raise ValueError("Invalid cursor: sort order mismatch")
+            operator = "<" if direction == "DESC" else ">"
+            # Отдельное условие на первый ключ даёт планировщику поиск по индексу:
+            # сравнение строк-кортежей с выражениями он сам не использует
+            where.append(f"{keys[0]} {operator}= ?")
+            where.append(f"({', '.join(keys)}) {operator} ({', '.join('?' * len(keys))})")
+            params.append(values[0])
+            params.extend(values)
+
+        select_keys = ", ".join(f"{key} AS sort_key_{i}" for i, key in enumerate(keys))
+        order_by = ", ".join(f"{key} {direction}" for key in keys)
+        sql = f"SELECT *, {select_keys} FROM games"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order_by} LIMIT ?"
+        params.append(limit + 1)
+
+        with self.db as conn:
+            rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[f"sort_key_{i}"] for i in range(len(keys)))
+
+        for row in rows:
+            for i in range(len(keys)):
+                del row[f"sort_key_{i}"]
+
+        return rows, next_cursor
+
+    def search_games(self, query: str, limit: int = SEARCH_DEFAULT_LIMIT) -> list[dict]:
+        """
+        Полнотекстовый поиск по названию, разработчику и отзыву.
+        Возвращает id по релевантности с подсвеченными (<mark>) фрагментами.
+        """
+        match = build_fts_query(query)
+        if not match:
+            return []
+
+        limit = max(1, min(int(limit or SEARCH_DEFAULT_LIMIT), SEARCH_MAX_LIMIT))
+        with self.db as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT
+                    rowid AS id,
+                    highlight(games_fts, 0, '<mark>', '</mark>') AS title,
+                    highlight(games_fts, 1, '<mark>', '</mark>') AS developer,
+                    snippet(games_fts, 2, '<mark>', '</mark>', '…', 12) AS review
+                FROM games_fts
+                WHERE games_fts MATCH ?
+                ORDER BY bm25(games_fts, ?, ?, ?)
+                LIMIT ?
+            """,
+                (match, *SEARCH_WEIGHTS, limit),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def search_game_ids(self, query: str) -> list[int]:
+        """
+        id всех игр, найденных полнотекстовым поиском, без ранжирования и лимита —
+        для фильтрации списка (search_games отдаёт только лучшие совпадения)
+        """
+        match = build_fts_query(query)
+        if not match:
+            return []
+        with self.db as conn:
+            return [
+                row[0]
+                for row in conn.execute("SELECT rowid FROM games_fts WHERE games_fts MATCH ?", (match,))
+            ]
+
+    def find_similar_titles(
+        self, text: str, exclude_id: Optional[int] = None, limit: int = SIMILAR_DEFAULT_LIMIT
+    ) -> list[dict]:
+        """
+        Игры с похожим названием (проверка дубликатов при вводе).
+        Порядок: точное совпадение > префикс > все слова ввода есть среди слов
+        названия > подстрока (ввод или каждое его слово), внутри — по названию.
+        Каждый вид ищется по индексу: title_norm (B-tree), games_fts (слова)
+        и games_title_trgm (триграммы).
+        Возвращает [{"id", "title", "status", "match"}].
+        """
+        term = normalize_title(text)
+        if len(term) < SIMILAR_MIN_LENGTH:
+            return []
+        limit = max(1, min(int(limit or SIMILAR_DEFAULT_LIMIT), SIMILAR_MAX_LIMIT))
+        words = [word for word in term.split() if len(word) > 1]
+        exclude_id = int(exclude_id) if exclude_id else 0
+
+        found = {}  # id -> вид совпадения (в порядке SIMILAR_MATCHES)
+        candidates = {}  # id -> строка
+
+        def collect(match, rows, accept=lambda norm: True):
+            for row in rows:
+                if row["id"] in found or row["id"] == exclude_id:
+                    continue
+                if accept(row["title_norm"]):
+                    found[row["id"]] = match
+                    candidates[row["id"]] = row
+
+        with self.db as conn:
+            collect(
+                "exact",
+                conn.execute(
+                    "SELECT id, title, status, title_norm FROM games WHERE title_norm = ?", (term,)
+                ),
+            )
+            # Префикс — диапазон индекса: всё, что сортируется между term и term + максимальный символ
+            collect(
+                "prefix",
+                conn.execute(
+                    "SELECT id, title, status, title_norm FROM games "
+                    "WHERE title_norm > ? AND title_norm < ?",
+                    (term, term + "\U0010ffff"),
+                ),
+            )
+
+            # Слова: FTS5 находит игры со всеми словами (токены unicode61 мельче слов
+            # через пробел, поэтому кандидаты проверяются сравнением слов)
+            if words and len(found) < limit:
+                match = " AND ".join(f'title : "{_fts_quote(word)}"' for word in words)
+                collect(
+                    "words",
+                    conn.execute(
+                        """
+                        SELECT g.id, g.title, g.status, g.title_norm
+                        FROM games_fts JOIN games g ON g.id = games_fts.rowid
+                        WHERE games_fts MATCH ?
+                    """,
+                        (match,),
+                    ),
+                    lambda norm: set(words) <= set(norm.split()),
+                )
+
+            # Подстроки: фраза триграммного индекса совпадает с любой подстрокой от 3 символов
+            if len(term) >= SIMILAR_SUBSTRING_MIN_LENGTH and len(found) < limit:
+                indexed = [word for word in words if len(word) >= 3]
+                match = f'"{_fts_quote(term)}"'
+                if indexed:
+                    match += " OR (" + " AND ".join(f'"{_fts_quote(word)}"' for word in indexed) + ")"
+                collect(
+                    "substring",
+                    conn.execute(
+                        """
+                        SELECT g.id, g.title, g.status, g.title_norm
+                        FROM games_title_trgm JOIN games g ON g.id = games_title_trgm.rowid
+                        WHERE games_title_trgm MATCH ?
+                    """,
+                        (match,),
+                    ),
+                    lambda norm: term in norm or (bool(words) and all(word in norm for word in words)),
+                )
+                # Слова короче триграммы индекс не найдёт — только для такого ввода просмотр таблицы
+                if words and not indexed and len(found) < limit:
+                    collect(
+                        "substring",
+                        conn.execute(
+                            "SELECT id, title, status, title_norm FROM games WHERE "
+                            + " AND ".join("instr(title_norm, ?) > 0" for _ in words),
+                            words,
+                        ),
+                    )
+
+        rank = {match: index for index, match in enumerate(SIMILAR_MATCHES)}
+        ordered = sorted(
+            found, key=lambda game_id: (rank[found[game_id]], _casefold(candidates[game_id]["title"]))
+        )
+        return [
+            {
+                "id": game_id,
+                "title": candidates[game_id]["title"],
+                "status": candidates[game_id]["status"],
+                "match": found[game_id],
+            }
+            for game_id in ordered[:limit]
+        ]
+
+    def suggest_developers(
+        self, prefix: str, limit: int = DEVELOPER_SUGGEST_DEFAULT_LIMIT
+    ) -> list[dict]:
+        """
+        Подсказки разработчиков для ввода: точное совпадение, затем имена с этим
+        началом (по индексу name_fold), затем содержащие ввод; внутри — по числу игр.
+        Ищется последнее имя после запятой; короче DEVELOPER_SUGGEST_MIN_LENGTH —
+        пустой список. Возвращает [{"developer", "count"}].
+        """
+        fold = normalize_title((prefix or "").rsplit(",", 1)[-1])
+        if len(fold) < DEVELOPER_SUGGEST_MIN_LENGTH:
+            return []
+        limit = max(
+            1, min(int(limit or DEVELOPER_SUGGEST_DEFAULT_LIMIT), DEVELOPER_SUGGEST_MAX_LIMIT)
+        )
+
+        with self.db as conn:
+            rows = conn.execute(
+                """
+                SELECT name, game_count, name_fold = ? AS exact FROM developers
+                WHERE name_fold >= ? AND name_fold < ?
+                ORDER BY exact DESC, game_count DESC, name_fold
+                LIMIT ?
+            """,
+                (fold, fold, fold + "\U0010ffff", limit),
+            ).fetchall()
+            if len(rows) < limit:
+                # Совпадения в середине имени: таблица разработчиков много меньше таблицы игр
+                rows += conn.execute(
+                    """
+                    SELECT name, game_count, 0 AS exact FROM developers
+                    WHERE instr(name_fold, ?) > 1
+                    ORDER BY game_count DESC, name_fold
+                    LIMIT ?
+                """,
+                    (fold, limit - len(rows)),
+                ).fetchall()
+        return [{"developer": row["name"], "count": row["game_count"]} for row in rows]
+
     def add_game(self, game_data: dict) -> Optional[int]:
         """Добавляет новую игру, возвращает ID или None при ошибке"""
         try:
+            values = _game_values(game_data)
             with self.db as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     """
-                    INSERT INTO games (title, version, status, rating, review, game_link, developer)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO games (
+                        title, version, status, rating, review, game_link, developer, title_norm
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                    (
-                        sanitize_text(game_data.get("title", "")),
-                        sanitize_text(game_data.get("version", "")),
-                        game_data.get("status", "planned"),
-                        float(game_data.get("rating", 0)),
-                        sanitize_text(game_data.get("review", "")),
-                        game_data.get("game_link", ""),
-                        sanitize_text(game_data.get("developer", "")),
-                    ),
+                    values,
                 )
-                conn.commit()
-                return cursor.lastrowid
+                game_id = cursor.lastrowid
+                sync_game_developers(conn, game_id, values[DEVELOPER_VALUE])
+                return game_id
         except sqlite3.IntegrityError as e:
-            logger.warning(f"Integrity error when adding game: {e}")
+            logger.warning("Integrity error when adding game: %s", e)
             return None
         except (ValueError, TypeError) as e:
-            logger.error(f"Invalid game data: {e}")
+            logger.error("Invalid game data: %s", e)
             return None
 
+    def add_games(self, games: list[dict]) -> list[int]:
+        """
+        Добавляет пачку игр в одной транзакции.
+        Даты created_at/updated_at берутся из данных, если указаны.
+        Возвращает ID новых строк в порядке входных данных.
+        """
+        rows = [
+            (*_game_values(game), game.get("created_at") or None, game.get("updated_at") or None)
+            for game in games
+        ]
+        with self.db.transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            game_ids = []
+            # По строке: id берём из lastrowid, а не вычисляем заранее
+            # (подготовленный запрос кэшируется, так что это не медленнее executemany)
+            for row in rows:
+                cursor.execute(
+                    """
+                    INSERT INTO games (
+                        title, version, status, rating, review, game_link, developer, title_norm,
+                        created_at, updated_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?,
+                            COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+                """,
+                    row,
+                )
+                game_ids.append(cursor.lastrowid)
+                sync_game_developers(conn, cursor.lastrowid, row[DEVELOPER_VALUE])
+            return game_ids
+
+    def iter_games(self, batch_size: int = 500):
+        """Генератор всех игр по id, пачками — память не зависит от размера библиотеки"""
+        last_id = 0
+        while True:
+            with self.db as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT * FROM games WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                )
+                rows = [dict(row) for row in cursor.fetchall()]
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]["id"]
+
     def update_game(
         self, game_id: int, game_data: dict, screenshot_path: Optional[str] = None
     ) -> bool:
         """Обновляет данные игры"""
         try:
+            values = _game_values(game_data)
             with self.db as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     """
                     UPDATE games
                     SET title = ?, version = ?, status = ?, rating = ?,
-                        review = ?, game_link = ?, developer = ?, screenshot_path = ?,
+                        review = ?, game_link = ?, developer = ?, title_norm = ?,
+                        screenshot_path = ?,
                         updated_at = CURRENT_TIMESTAMP
                     WHERE id = ?
                 """,
-                    (
-                        sanitize_text(game_data.get("title", "")),
-                        sanitize_text(game_data.get("version", "")),
-                        game_data.get("status", "planned"),
-                        float(game_data.get("rating", 0)),
-                        sanitize_text(game_data.get("review", "")),
-                        game_data.get("game_link", ""),
-                        sanitize_text(game_data.get("developer", "")),
-                        screenshot_path,
-                        game_id,
-                    ),
+                    (*values, screenshot_path, game_id),
                 )
-                conn.commit()
-                return cursor.rowcount > 0
+                if cursor.rowcount == 0:
+                    return False
+                sync_game_developers(conn, game_id, values[DEVELOPER_VALUE])
+                return True
         except (ValueError, TypeError) as e:
-            logger.error(f"Invalid game data: {e}")
+            logger.error("Invalid game data: %s", e)
             return False
 
     def delete_game(self, game_id: int) -> bool:
@@ -111,7 +609,6 @@ class GameRepository:
         with self.db as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM games WHERE id = ?", (game_id,))
-            conn.commit()
             return cursor.rowcount > 0
 
     def get_game_by_id(self, game_id: int) -> Optional[dict]:
@@ -142,62 +639,328 @@ class GameRepository:
                 "UPDATE games SET screenshot_path = ? WHERE id = ?",
                 (screenshot_path, game_id),
             )
-            conn.commit()
             return cursor.rowcount > 0
 
+    def set_screenshot_state(self, game_id: int, state: str) -> bool:
+        """Записывает состояние обработки скриншота игры"""
+        with self.db as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE games SET screenshot_state = ? WHERE id = ?", (state, game_id)
+            )
+            return cursor.rowcount > 0
+
+    def finish_screenshot(self, game_id: int, expected_state: str, screenshot_path: Optional[str]) -> bool:
+        """
+        Завершает обработку скриншота: записывает путь (или помечает ошибку, если
+        путь None), только если состояние всё ещё expected_state — иначе игру
+        удалили или скриншот уже заменили.
+        """
+        with self.db as conn:
+            cursor = conn.cursor()
+            if screenshot_path is None:
+                cursor.execute(
+                    "UPDATE games SET screenshot_state = 'failed' "
+                    "WHERE id = ? AND screenshot_state = ?",
+                    (game_id, expected_state),
+                )
+            else:
+                cursor.execute(
+                    "UPDATE games SET screenshot_path = ?, screenshot_state = '' "
+                    "WHERE id = ? AND screenshot_state = ?",
+                    (screenshot_path, game_id, expected_state),
+                )
+            return cursor.rowcount > 0
+
+    def fail_pending_screenshots(self) -> int:
+        """Помечает ошибкой скриншоты, обработка которых прервалась с прошлым запуском"""
+        with self.db as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE games SET screenshot_state = 'failed' WHERE screenshot_state LIKE 'pending%'"
+            )
+            return cursor.rowcount
+
+    def find_screenshot(self, content_hash: str) -> Optional[str]:
+        """Путь к сохранённому скриншоту с данным хэшем содержимого или None"""
+        with self.db as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT path FROM screenshots WHERE hash = ?", (content_hash,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def register_screenshot(self, content_hash: str, screenshot_path: str) -> None:
+        """Заносит файл в таблицу скриншотов (ссылки считают триггеры на games)"""
+        with self.db as conn:
+            conn.execute(
+                """
+                INSERT INTO screenshots (hash, path, ref_count)
+                VALUES (?, ?, (SELECT COUNT(*) FROM games WHERE screenshot_path = ?))
+                ON CONFLICT(hash) DO UPDATE SET path = excluded.path, ref_count = excluded.ref_count
+            """,
+                (content_hash, screenshot_path, screenshot_path),
+            )
+
+    def get_screenshot_refs(self, screenshot_path: str) -> Optional[int]:
+        """Число игр, ссылающихся на файл; None если файл не из таблицы скриншотов"""
+        with self.db as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT ref_count FROM screenshots WHERE path = ?", (screenshot_path,)
+            )
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def forget_screenshot(self, screenshot_path: str) -> None:
+        """Удаляет файл из таблицы скриншотов"""
+        with self.db as conn:
+            conn.execute("DELETE FROM screenshots WHERE path = ?", (screenshot_path,))
+
     def get_statistics(self) -> dict:
-        """Получает статистику по играм"""
+        """Получает статистику по играм из счётчиков game_stats (одна строка)"""
         with self.db as conn:
             cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT total_games, {', '.join(GAME_STATUSES)} FROM game_stats WHERE id = 1"
+            )
+            row = cursor.fetchone()
+            if row:
+                return dict(row)
+
+            logger.warning("game_stats counters are missing, counting games directly")
+            return self.count_statistics()
 
-            cursor.execute("SELECT COUNT(*) FROM games")
-            total_games = cursor.fetchone()[0]
+    def count_statistics(self) -> dict:
+        """Считает статистику по таблице games одним GROUP BY (без счётчиков)"""
+        with self.db as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM games GROUP BY status")
+            counts = dict(cursor.fetchall())
 
-            status_counts = {}
-            for status in ["completed", "playing", "planned", "dropped"]:
-                cursor.execute("SELECT COUNT(*) FROM games WHERE status = ?", (status,))
-                status_counts[status] = cursor.fetchone()[0]
+        stats = {"total_games": sum(counts.values())}
+        stats.update({status: counts.get(status, 0) for status in GAME_STATUSES})
+        return stats
 
-            return {"total_games": total_games, **status_counts}
+    def verify_statistics(self) -> bool:
+        """
+        Сверяет счётчики game_stats с реальными данными и перестраивает их при расхождении.
+        Возвращает True, если счётчики были верны.
+        """
+        with self.db.transaction(immediate=True) as conn:
+            actual = self.count_statistics()
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT total_games, {', '.join(GAME_STATUSES)} FROM game_stats WHERE id = 1"
+            )
+            row = cursor.fetchone()
+            if row and dict(row) == actual:
+                return True
+
+            logger.warning(
+                "game_stats counters drifted (%s), rebuilding: %s", dict(row) if row else None, actual
+            )
+            columns = ["total_games", *GAME_STATUSES]
+            cursor.execute(
+                f"INSERT OR REPLACE INTO game_stats (id, {', '.join(columns)}) "
+                f"VALUES (1, {', '.join('?' * len(columns))})",
+                [actual[column] for column in columns],
+            )
+            return False
 
 
 def init_db():
     """Инициализирует базу данных через систему миграций."""
     try:
-        conn = get_db_connection()
-        try:
-            run_migrations(conn)
-            logger.info("Database initialized successfully")
-        finally:
-            conn.close()
+        run_migrations(db.connection())
+        repo = GameRepository()
+        repo.verify_statistics()
+        pruned = repo.prune_tombstones()
+        if pruned:
+            logger.info("Pruned %s old tombstone(s) from the change feed", pruned)
+        interrupted = repo.fail_pending_screenshots()
+        if interrupted:
+            logger.warning(
+                "%s screenshot job(s) were interrupted by the last shutdown", interrupted
+            )
+        logger.info("Database initialized successfully")
     except sqlite3.Error as e:
-        logger.critical(f"Failed to initialize database: {e}", exc_info=True)
+        logger.critical("Failed to initialize database: %s", e, exc_info=True)
         raise RuntimeError(f"Database initialization failed: {e}")
 
 
-def get_db_connection():
-    """Создает соединение с БД"""
+_backfill_thread = None
+_backfill_stop = threading.Event()
+
+
+def _run_deferred_backfills():
     try:
-        return sqlite3.connect(str(DB_FILE), timeout=DB_TIMEOUT)
-    except sqlite3.Error as e:
-        logger.critical(f"Failed to connect to database: {e}", exc_info=True)
-        raise RuntimeError(f"Cannot connect to database: {e}")
+        finished = run_backfills(db.connection(), should_stop=_backfill_stop.is_set)
+        if finished:
+            logger.info("%s deferred backfill(s) finished", finished)
+    except Exception as e:
+        logger.error("Deferred backfill failed: %s", e, exc_info=True)
 
 
-class DatabaseConnection:
-    """Контекстный менеджер для работы с БД"""
+def start_backfills() -> threading.Thread:
+    """
+    Запускает отложенные заполнения данных миграций в фоновом потоке
+    (после открытия окна). Каждая часть — короткая транзакция, поэтому
+    запись из UI ждёт не дольше одной части.
+    """
+    global _backfill_thread
+    if _backfill_thread is None:
+        _backfill_thread = threading.Thread(
+            target=_run_deferred_backfills, name="backfill", daemon=True
+        )
+        _backfill_thread.start()
+    return _backfill_thread
 
-    def __init__(self):
-        self.conn = None
+
+def stop_backfills(timeout: float = 5.0) -> None:
+    """Останавливает заполнение после текущей части; оно продолжится при следующем запуске"""
+    _backfill_stop.set()
+    if _backfill_thread is not None:
+        _backfill_thread.join(timeout)
+
+
+class ConnectionManager:
+    """
+    Долгоживущие соединения с БД: одно на поток, с настроенными PRAGMA.
+
+    Используется как контекстный менеджер транзакции. Вложенные блоки
+    работают в одной транзакции (вложенные — через SAVEPOINT), поэтому
+    все запросы одного вызова API делят соединение и коммит.
+
+    Вызовы Eel идут в гринлетах одного потока и поэтому делят одно соединение
+    и одну глубину вложенности. Внутри транзакции нельзя уступать управление
+    (eel.sleep, ожидание gevent): другой вызов попал бы в чужую транзакцию.
+    sqlite3, PIL и файловый ввод-вывод управление не уступают; функции API
+    помечены @outside_transaction, который проверяет это при каждом вызове.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает и настраивает новое соединение"""
+        try:
+            # isolation_level=None: транзакциями управляем сами через BEGIN/COMMIT
+            conn = sqlite3.connect(
+                str(self.db_file),
+                timeout=DB_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+                factory=connection_factory(),
+            )
+        except sqlite3.Error as e:
+            logger.critical("Failed to connect to database: %s", e, exc_info=True)
+            raise RuntimeError(f"Cannot connect to database: {e}")
+
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока, открывая его при первом обращении"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @property
+    def depth(self) -> int:
+        """Глубина открытых транзакций текущего потока (0 — транзакции нет)"""
+        return getattr(self._local, "depth", 0)
+
+    def _begin(self, immediate: bool = False) -> sqlite3.Connection:
+        conn = self.connection()
+        state = self._local
+        if state.depth == 0:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        else:
+            conn.execute(f"SAVEPOINT sp_{state.depth}")
+        state.depth += 1
+        return conn
+
+    def _end(self, exc_type, exc_val) -> None:
+        conn = self._local.conn
+        state = self._local
+        state.depth -= 1
+
+        if state.depth > 0:
+            if exc_type is not None:
+                conn.execute(f"ROLLBACK TO sp_{state.depth}")
+            conn.execute(f"RELEASE sp_{state.depth}")
+            return
+
+        if exc_type is None:
+            conn.commit()
+        else:
+            conn.rollback()
+            logger.error("Database error: %s", exc_val, exc_info=True)
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """
+        Транзакция на соединении текущего потока.
+        immediate=True сразу берёт блокировку записи.
+        """
+        conn = self._begin(immediate)
+        try:
+            yield conn
+        except BaseException as e:
+            self._end(type(e), e)
+            raise
+        else:
+            self._end(None, None)
 
     def __enter__(self):
-        self.conn = get_db_connection()
-        self.conn.row_factory = sqlite3.Row
-        return self.conn
+        return self._begin()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            self.conn.close()
-        if exc_type is not None:
-            logger.error(f"Database error: {exc_val}", exc_info=True)
+        self._end(exc_type, exc_val)
         return False
+
+    def close_all(self) -> None:
+        """Закрывает все открытые соединения (при завершении приложения)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning("Error closing database connection: %s", e)
+        self._local = threading.local()
+
+
+db = ConnectionManager()
+
+
+def outside_transaction(func):
+    """
+    Декоратор функции API: вызов должен начинаться вне транзакции. Иначе другой
+    гринлет уступил управление внутри своей транзакции (см. ConnectionManager),
+    и этот вызов выполнился бы в ней — это ошибка программы, RuntimeError.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if db.depth:
+            raise RuntimeError(f"{func.__name__} started inside an open transaction")
+        return func(*args, **kwargs)
+
+    return wrapper
+atexit.register(db.close_all)
+# atexit вызывает в обратном порядке: заполнение останавливается до закрытия соединений
+atexit.register(stop_backfills)
@@ -0,0 +1,18 @@
+# app/fsutil.py
+
+"""Работа с файлами без зависимостей от остального приложения."""
+
+import os
+
+
+def write_file_atomic(path, data):
+    """Пишет файл через временный рядом и os.replace — читатели не увидят половину файла"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
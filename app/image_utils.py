@@ -1,22 +1,61 @@
 # app/image_utils.py
 
 import base64
+import hashlib
 import io
+import json
 import os
+import queue
 import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
 
-from PIL import Image
-
-from app.database import GameRepository
+from app.database import GameRepository, db
+from app.fsutil import write_file_atomic
 from app.logger import get_logger
-from config import DATA_DIR, IMAGE_MAX_WIDTH, IMAGE_QUALITY, SCREENSHOTS_DIR
+from config import (
+    DATA_DIR,
+    IMAGE_BYTE_BUDGET,
+    IMAGE_MAX_WIDTH,
+    IMAGE_MIN_QUALITY,
+    IMAGE_PLACEHOLDER_QUALITY,
+    IMAGE_PLACEHOLDER_WIDTH,
+    IMAGE_PROFILE,
+    IMAGE_QUALITY,
+    IMAGE_THUMB_QUALITY,
+    IMAGE_THUMB_WIDTH,
+    SCREENSHOT_JOB_RETRIES,
+    SCREENSHOT_QUEUE_SIZE,
+    SCREENSHOT_WORKERS,
+    SCREENSHOTS_DIR,
+    UPLOADS_DIR,
+)
 
 logger = get_logger(__name__)
 
+# PIL импортируется внутри функций обработки: до первого скриншота он не нужен,
+# а его импорт заметно задерживает открытие окна
+
 # Допустимые форматы изображений
 ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
 ALLOWED_IMAGE_MIME_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/gif'}
 
+# Производные размеры скриншота: суффикс файла, ширина и качество
+SCREENSHOT_VARIANTS = {
+    "thumb": (".thumb", IMAGE_THUMB_WIDTH, IMAGE_THUMB_QUALITY),
+    "placeholder": (".placeholder", IMAGE_PLACEHOLDER_WIDTH, IMAGE_PLACEHOLDER_QUALITY),
+}
+
+# Профили кодирования WebP: method (0 — быстрее, 6 — плотнее) и поправка к качеству
+ENCODING_PROFILES = {
+    "fast": {"method": 1, "quality_delta": 0},
+    "balanced": {"method": 4, "quality_delta": 0},
+    "max-compression": {"method": 6, "quality_delta": -5},
+}
+
 
 def normalize_filename(name):
     """Нормализует имя файла для безопасности"""
@@ -26,6 +65,26 @@ def normalize_filename(name):
     return re.sub(r"_+", "_", name.replace(" ", "_"))[:100].strip("_")
 
 
+def detect_image_format(header_bytes):
+    """
+    Определяет формат изображения по сигнатуре (достаточно первых 12 байт).
+    Возвращает "jpeg", "png", "gif", "webp" или None.
+    """
+    # JPEG: FF D8 FF
+    # PNG: 89 50 4E 47
+    # GIF: 47 49 46 38
+    # WebP: RIFF....WEBP
+    if header_bytes[:3] == b'\xff\xd8\xff':
+        return "jpeg"
+    if header_bytes[:4] == b'\x89PNG':
+        return "png"
+    if header_bytes[:4] == b'GIF8':
+        return "gif"
+    if header_bytes[:4] == b'RIFF' and header_bytes[8:12] == b'WEBP':
+        return "webp"
+    return None
+
+
 def validate_image_format(image_data):
     """
     Проверяет формат изображения.
@@ -41,38 +100,141 @@ def validate_image_format(image_data):
                 if mime_match:
                     mime_type = f"image/{mime_match.group(1)}"
                     if mime_type not in ALLOWED_IMAGE_MIME_TYPES:
-                        logger.warning(f"Unsupported MIME type: {mime_type}")
+                        logger.warning("Unsupported MIME type: %s", mime_type)
                         return False
         
-        # Декодируем и проверяем байты
+        # Для сигнатуры достаточно первых 16 символов base64 (12 байт)
         data_part = image_data.split(",", 1)[1] if "," in image_data else image_data
-        image_bytes = base64.b64decode(data_part)
-        
-        # Проверяю по сигнатуре файла
-        # JPEG: FF D8 FF
-        # PNG: 89 50 4E 47
-        # GIF: 47 49 46 38
-        # WebP: RIFF....WEBP
-        
-        if image_bytes[:3] == b'\xff\xd8\xff':
-            return True  # JPEG
-        elif image_bytes[:4] == b'\x89PNG':
-            return True  # PNG
-        elif image_bytes[:4] == b'GIF8':
-            return True  # GIF
-        elif image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
-            return True  # WebP
-        else:
-            logger.warning("Unknown image signature")
-            return False
+        header_bytes = base64.b64decode(data_part[:16])
+
+        if detect_image_format(header_bytes):
+            return True
+
+        logger.warning("Unknown image signature")
+        return False
             
     except Exception as e:
-        logger.error(f"Error validating image format: {e}")
+        logger.error("Error validating image format: %s", e)
         return False
 
 
+def get_profile(name=None):
+    """Возвращает профиль кодирования по имени (по умолчанию IMAGE_PROFILE)"""
+    name = name or IMAGE_PROFILE
+    if name not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile: '{name}'")
+    return ENCODING_PROFILES[name]
+
+
+def _resize_to_width(image, width):
+    """
+    Уменьшает изображение до заданной ширины с сохранением пропорций.
+    Большие изображения сначала сжимаются в целое число раз через Image.reduce
+    (усреднение блоков, дёшево), до размера не меньше двух целевых, а LANCZOS
+    работает уже с небольшим изображением.
+    """
+    from PIL import Image
+
+    if image.width <= width:
+        return image
+
+    factor = image.width // (width * 2)
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    ratio = width / image.width
+    return image.resize(
+        (width, max(1, int(image.height * ratio))), Image.Resampling.LANCZOS
+    )
+
+
+def _draft_jpeg(image, width):
+    """
+    Для ещё не декодированного JPEG включает draft-режим: декодер сразу
+    масштабирует DCT в 2/4/8 раз, не распаковывая полный размер.
+    """
+    if image.format != "JPEG" or image.width < width * 2:
+        return image
+    # draft выбирает наибольший масштаб, при котором размер не меньше запрошенного
+    image.draft("RGB", (width, max(1, int(image.height * width / image.width))))
+    return image
+
+
+def _encode_webp(image, quality, method=4):
+    """Кодирует изображение в байты WebP"""
+    output = io.BytesIO()
+    image.save(output, format="WEBP", quality=quality, method=method)
+    return output.getvalue()
+
+
+def _encode_webp_within(image, quality, method, byte_budget):
+    """
+    Кодирует изображение с максимальным качеством (не выше quality),
+    при котором результат укладывается в byte_budget байт.
+    Качество подбирается двоичным поиском от IMAGE_MIN_QUALITY.
+    """
+    data = _encode_webp(image, quality, method)
+    if not byte_budget or len(data) <= byte_budget:
+        return data
+
+    low, high = IMAGE_MIN_QUALITY, quality - 1
+    best = None
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = _encode_webp(image, middle, method)
+        if len(candidate) <= byte_budget:
+            best = candidate
+            low = middle + 1
+        else:
+            high = middle - 1
+
+    # Даже минимальное качество не укладывается — берём самый маленький вариант
+    return best if best is not None else _encode_webp(image, IMAGE_MIN_QUALITY, method)
+
+
+def build_derivatives(
+    image,
+    max_width=IMAGE_MAX_WIDTH,
+    quality=IMAGE_QUALITY,
+    profile=None,
+    byte_budget=IMAGE_BYTE_BUDGET,
+    full=True,
+):
+    """
+    Строит набор WebP из одного декодированного изображения:
+    полноразмерное, миниатюра для карточки и крошечная заглушка.
+    Каждый следующий размер получается из предыдущего, без повторного декодирования.
+    byte_budget ограничивает размер полноразмерного файла (0 — без ограничения).
+    full=False — без полноразмерного файла (вызывающий сохранит исходник как есть).
+    """
+    settings = get_profile(profile)
+    method = settings["method"]
+    delta = settings["quality_delta"]
+
+    image = _draft_jpeg(image, max_width)
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.mode or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    image = _resize_to_width(image, max_width)
+    derivatives = {}
+    if full:
+        derivatives["full"] = _encode_webp_within(image, quality + delta, method, byte_budget)
+
+    for variant, (_, width, variant_quality) in SCREENSHOT_VARIANTS.items():
+        image = _resize_to_width(image, width)
+        derivatives[variant] = _encode_webp(image, variant_quality + delta, method)
+
+    return derivatives
+
+
 def optimize_screenshot(image_data, max_width=IMAGE_MAX_WIDTH, quality=IMAGE_QUALITY):
-    """Оптимизирует изображение в WebP"""
+    """
+    Оптимизирует изображение в WebP.
+    Возвращает словарь {"full", "thumb", "placeholder"} с байтами WebP или None.
+    """
+    from PIL import Image
+
     try:
         # Проверяем формат перед обработкой
         if not validate_image_format(image_data):
@@ -86,24 +248,147 @@ def optimize_screenshot(image_data, max_width=IMAGE_MAX_WIDTH, quality=IMAGE_QUA
 
         image = Image.open(io.BytesIO(image_bytes))
 
-        # Ресайз если нужно
         original_size = (image.width, image.height)
-        if image.width > max_width:
-            ratio = max_width / image.width
-            image = image.resize(
-                (max_width, int(image.height * ratio)), Image.Resampling.LANCZOS
-            )
-
-        output = io.BytesIO()
-        image.save(output, format="WEBP", quality=quality, optimize=True)
+        derivatives = build_derivatives(image, max_width, quality)
 
         logger.info(
-            f"Image optimized: {original_size[0]}x{original_size[1]} → {image.width}x{image.height}"
+            "Image optimized: %sx%s, %s → %s bytes (thumb %s, placeholder %s)",
+            original_size[0],
+            original_size[1],
+            len(image_bytes),
+            len(derivatives["full"]),
+            len(derivatives["thumb"]),
+            len(derivatives["placeholder"]),
         )
-        return base64.b64encode(output.getvalue()).decode("utf-8")
+        return derivatives
     except Exception as e:
-        logger.error(f"Error optimizing image: {e}", exc_info=True)
-        return image_data
+        logger.error("Error optimizing image: %s", e, exc_info=True)
+        return None
+
+
+def derivative_path(screenshot_path, variant):
+    """Возвращает путь к производному файлу скриншота ("full" — сам файл)"""
+    if variant == "full" or variant not in SCREENSHOT_VARIANTS:
+        return str(screenshot_path)
+    root, ext = os.path.splitext(str(screenshot_path))
+    return f"{root}{SCREENSHOT_VARIANTS[variant][0]}{ext}"
+
+
+def _is_derivative_file(path):
+    """Проверяет, является ли файл производным (миниатюра или заглушка)"""
+    stem = os.path.splitext(str(path))[0]
+    return any(stem.endswith(suffix) for suffix, _, _ in SCREENSHOT_VARIANTS.values())
+
+
+def list_screenshot_files():
+    """Полноразмерные файлы скриншотов в SCREENSHOTS_DIR (без производных)"""
+    return [
+        filepath
+        for filepath in sorted(SCREENSHOTS_DIR.glob("*.webp"))
+        if not _is_derivative_file(filepath)
+    ]
+
+
+def encoding_settings(
+    max_width=IMAGE_MAX_WIDTH,
+    quality=IMAGE_QUALITY,
+    profile=None,
+    byte_budget=IMAGE_BYTE_BUDGET,
+):
+    """Настройки кодирования, с которыми сохраняется скриншот и его производные"""
+    return {
+        "max_width": max_width,
+        "quality": quality,
+        "profile": profile or IMAGE_PROFILE,
+        "byte_budget": byte_budget,
+        "variants": {
+            variant: [width, variant_quality]
+            for variant, (_, width, variant_quality) in SCREENSHOT_VARIANTS.items()
+        },
+    }
+
+
+def metadata_path(screenshot_path):
+    """Путь к файлу метаданных скриншота (настройки, с которыми он закодирован)"""
+    return f"{os.path.splitext(str(screenshot_path))[0]}.meta.json"
+
+
+def read_metadata(screenshot_path):
+    """Читает метаданные скриншота или возвращает None"""
+    try:
+        with open(metadata_path(screenshot_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_derivatives(filepath, derivatives, settings=None):
+    """
+    Записывает полноразмерный файл и все производные рядом с ним.
+    settings — настройки кодирования полноразмерного файла, сохраняются в метаданные.
+    """
+    for variant, data in derivatives.items():
+        write_file_atomic(derivative_path(filepath, variant), data)
+
+    if settings is not None and "full" in derivatives:
+        metadata = {
+            "settings": settings,
+            "size": len(derivatives["full"]),
+            "encoded_at": int(time.time()),
+        }
+        write_file_atomic(metadata_path(filepath), json.dumps(metadata).encode("utf-8"))
+
+
+def read_placeholder(screenshot_path):
+    """Возвращает заглушку скриншота как data URL или пустую строку"""
+    if not screenshot_path:
+        return ""
+    try:
+        with open(derivative_path(screenshot_path, "placeholder"), "rb") as f:
+            data = base64.b64encode(f.read()).decode("utf-8")
+        return f"data:image/webp;base64,{data}"
+    except OSError:
+        return ""
+
+
+def backfill_derivatives(force=False):
+    """
+    Строит миниатюры и заглушки для уже сохранённых скриншотов.
+    Возвращает количество обработанных, пропущенных и ошибочных файлов.
+    """
+    from PIL import Image
+
+    result = {"processed": 0, "skipped": 0, "failed": 0}
+
+    for filepath in list_screenshot_files():
+        missing = [
+            variant
+            for variant in SCREENSHOT_VARIANTS
+            if not os.path.exists(derivative_path(filepath, variant))
+        ]
+        if not missing and not force:
+            result["skipped"] += 1
+            continue
+
+        try:
+            with Image.open(filepath) as image:
+                image.load()
+                # Полноразмерный файл уже оптимизирован — перезаписываем только производные
+                derivatives = build_derivatives(image, max_width=image.width)
+            derivatives.pop("full")
+            write_derivatives(filepath, derivatives)
+            result["processed"] += 1
+        except Exception as e:
+            logger.warning("Error building derivatives for %s: %s", filepath, e)
+            result["failed"] += 1
+
+    logger.info(
+        "Derivatives backfill: %s processed, %s skipped, %s failed",
+        result["processed"],
+        result["skipped"],
+        result["failed"],
+    )
+    return result
 
 
 def ensure_dirs():
@@ -111,50 +396,472 @@ def ensure_dirs():
     try:
         DATA_DIR.mkdir(exist_ok=True)
         SCREENSHOTS_DIR.mkdir(exist_ok=True)
-        logger.debug(f"Directories checked/created: {DATA_DIR}, {SCREENSHOTS_DIR}")
+        UPLOADS_DIR.mkdir(exist_ok=True)
+        logger.debug(
+            "Directories checked/created: %s, %s, %s", DATA_DIR, SCREENSHOTS_DIR, UPLOADS_DIR
+        )
     except OSError as e:
-        logger.critical(f"Failed to create directories: {e}", exc_info=True)
+        logger.critical("Failed to create directories: %s", e, exc_info=True)
         raise
 
 
-def save_screenshot(image_data, game_id, game_title):
-    """Сохраняет оптимизированный скриншот"""
+def content_hash(image_bytes):
+    """SHA-256 исходных байтов изображения — ключ скриншота в хранилище"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 файла, прочитанного по частям"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _screenshot_filepath(digest):
+    """Путь к файлу скриншота по хэшу содержимого (все скриншоты сохраняем как WebP)"""
+    return SCREENSHOTS_DIR / f"{digest}.webp"
+
+
+def _find_stored(digest, game_id, game_title):
+    """Путь к уже сохранённому скриншоту с тем же содержимым или None"""
+    stored_path = GameRepository().find_screenshot(digest)
+    if stored_path and os.path.exists(stored_path):
+        logger.info("Screenshot reused (ID: %s, '%s'): %s", game_id, game_title, stored_path)
+        return stored_path
+    return None
+
+
+def is_screenshot_stored(screenshot_path):
+    """Файл есть в таблице скриншотов и на диске (его не удалили вместе с последней игрой)"""
+    return (
+        GameRepository().get_screenshot_refs(screenshot_path) is not None
+        and os.path.exists(screenshot_path)
+    )
+
+
+def _store_derivatives(digest, derivatives, settings, game_id, game_title):
+    """
+    Записывает файлы скриншота и заносит его в таблицу скриншотов.
+    Под блокировкой записи БД, как и delete_screenshot: файл с тем же хэшем
+    не удаляется, пока его записывают и регистрируют.
+    """
+    filepath = _screenshot_filepath(digest)
+    with db.transaction(immediate=True):
+        if is_screenshot_stored(str(filepath)):
+            logger.info("Screenshot reused (ID: %s, '%s'): %s", game_id, game_title, filepath)
+            return str(filepath)
+        write_derivatives(filepath, derivatives, settings)
+        GameRepository().register_screenshot(digest, str(filepath))
+    logger.info("Screenshot saved (ID: %s, '%s'): %s", game_id, game_title, filepath.name)
+    return str(filepath)
+
+
+class ScreenshotError(ValueError):
+    """Изображение нельзя сохранить: неподдерживаемый формат или повреждённый файл"""
+
+
+def _decode_derivatives(open_image, keep_source=None):
+    """
+    build_derivatives для изображения из open_image(). Ошибки разбора (PIL
+    сообщает о повреждённом файле через OSError) становятся ScreenshotError,
+    чтобы их не путали с временными ошибками ввода-вывода.
+    keep_source(image) -> True: исходник сохраняется как есть, "full" не кодируется.
+    """
+    from PIL import Image
+
+    try:
+        with open_image() as image:
+            full = not (keep_source and keep_source(image))
+            return image, build_derivatives(image, full=full)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ScreenshotError(f"Cannot decode image: {e}") from e
+
+
+def _save_failed(error, game_id, strict):
+    """Ошибка сохранения: в strict-режиме пробрасывается, иначе — пустой путь"""
+    logger.error("Error saving screenshot for game %s: %s", game_id, error)
+    if strict:
+        raise error
+    return ""
+
+
+def save_screenshot(image_data, game_id, game_title, strict=False):
+    """
+    Сохраняет оптимизированный скриншот из data URL.
+    Если такое же изображение уже сохранено, возвращает его путь без перекодирования.
+    При ошибке возвращает "", а со strict=True пробрасывает её: ScreenshotError —
+    изображение непригодно, OSError/sqlite3.OperationalError — можно повторить.
+    """
+    from PIL import Image
+
     if not image_data:
         return ""
 
     try:
-        optimized_data = optimize_screenshot(image_data)
-        if optimized_data is None:
-            logger.error(f"Failed to optimize screenshot for game {game_id}: invalid format")
-            return ""
-        
-        if "," in optimized_data:
-            optimized_data = optimized_data.split(",", 1)[1]
+        if not validate_image_format(image_data):
+            raise ScreenshotError("Unsupported image format")
+
+        image_bytes = base64.b64decode(image_data.split(",", 1)[-1])
+        digest = content_hash(image_bytes)
+        stored_path = _find_stored(digest, game_id, game_title)
+        if stored_path:
+            return stored_path
+
+        _, derivatives = _decode_derivatives(lambda: Image.open(io.BytesIO(image_bytes)))
+        return _store_derivatives(digest, derivatives, encoding_settings(), game_id, game_title)
+    except Exception as e:
+        return _save_failed(e, game_id, strict)
+
 
-        image_bytes = base64.b64decode(optimized_data)
+def save_screenshot_file(source_path, game_id, game_title, strict=False):
+    """
+    Сохраняет скриншот из файла на диске (например, из загрузки по частям).
+    PIL читает файл напрямую, без промежуточных копий в памяти.
+    Ошибки — как у save_screenshot.
+    """
+    from PIL import Image
+
+    try:
+        with open(source_path, "rb") as f:
+            if not detect_image_format(f.read(12)):
+                raise ScreenshotError("Unsupported image format")
 
-        # Все скриншоты сохраняем как WebP
-        file_extension = ".webp"
-        filename = f"{game_id}_{normalize_filename(game_title)}{file_extension}"
-        filepath = SCREENSHOTS_DIR / filename
+        digest = file_content_hash(source_path)
+        stored_path = _find_stored(digest, game_id, game_title)
+        if stored_path:
+            return stored_path
 
-        with open(filepath, "wb") as f:
-            f.write(image_bytes)
+        source_size = os.path.getsize(source_path)
+        image, derivatives = _decode_derivatives(lambda: Image.open(source_path))
 
-        logger.info(f"Screenshot saved (ID: {game_id}): {filename}")
-        return str(filepath)
+        logger.info(
+            "Image optimized: %sx%s, %s → %s bytes",
+            image.width,
+            image.height,
+            source_size,
+            len(derivatives["full"]),
+        )
+        return _store_derivatives(digest, derivatives, encoding_settings(), game_id, game_title)
     except Exception as e:
-        logger.error(f"Error saving screenshot for game {game_id}: {e}")
+        return _save_failed(e, game_id, strict)
+
+
+def _is_ready_webp(image):
+    """WebP не шире IMAGE_MAX_WIDTH сохраняется без перекодирования"""
+    return image.format == "WEBP" and image.width <= IMAGE_MAX_WIDTH
+
+
+def save_screenshot_bytes(image_bytes, game_id, game_title, strict=False):
+    """
+    Сохраняет скриншот из сырых байтов (например, из архива библиотеки).
+    Готовый WebP не шире IMAGE_MAX_WIDTH пишется как есть, перекодируются только производные.
+    Ошибки — как у save_screenshot.
+    """
+    from PIL import Image
+
+    if not image_bytes or not detect_image_format(image_bytes[:12]):
+        logger.warning("Skipping screenshot for game %s: unknown image signature", game_id)
+        if strict:
+            raise ScreenshotError("Unsupported image format")
+        return ""
+
+    try:
+        digest = content_hash(image_bytes)
+        stored_path = _find_stored(digest, game_id, game_title)
+        if stored_path:
+            return stored_path
+
+        _, derivatives = _decode_derivatives(
+            lambda: Image.open(io.BytesIO(image_bytes)), keep_source=_is_ready_webp
+        )
+
+        # Готовый файл записываем как есть: его настройки кодирования неизвестны
+        settings = encoding_settings()
+        if "full" not in derivatives:
+            derivatives["full"] = image_bytes
+            settings = None
+
+        return _store_derivatives(digest, derivatives, settings, game_id, game_title)
+    except Exception as e:
+        return _save_failed(e, game_id, strict)
+
+
+def screenshot_version(screenshot_path):
+    """
+    Возвращает токен версии файла скриншота (по времени изменения и размеру).
+    Пустая строка, если файла нет.
+    """
+    if not screenshot_path:
+        return ""
+    try:
+        stat = os.stat(screenshot_path)
+    except OSError:
         return ""
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
 
 
 def delete_screenshot(screenshot_path, game_id):
-    """Удаляет файл скриншота"""
-    if screenshot_path and os.path.exists(screenshot_path):
+    """
+    Освобождает скриншот игры. Файл вместе с производными удаляется, только
+    когда на него не осталось ссылок. Вызывать после коммита транзакции, в которой
+    игра перестала ссылаться на файл: при её откате ссылка на удалённый файл осталась бы.
+    """
+    if not screenshot_path:
+        return
+    if db.depth:
+        raise RuntimeError("delete_screenshot must be called after the transaction commits")
+
+    repo = GameRepository()
+    # Проверка ссылок и удаление — под одной блокировкой записи: рабочий поток
+    # не может в это время переиспользовать файл по хэшу (_store_derivatives, _apply)
+    with db.transaction(immediate=True):
+        refs = repo.get_screenshot_refs(screenshot_path)
+        if refs:
+            logger.info(
+                "Screenshot kept (ID: %s): %s is used by %s more game(s)",
+                game_id,
+                screenshot_path,
+                refs,
+            )
+            return
+        if refs is not None:
+            repo.forget_screenshot(screenshot_path)
+
+        extra_files = [derivative_path(screenshot_path, variant) for variant in SCREENSHOT_VARIANTS]
+        extra_files.append(metadata_path(screenshot_path))
+        if os.path.exists(screenshot_path):
+            try:
+                os.remove(screenshot_path)
+                logger.info("Screenshot deleted (ID: %s): %s", game_id, screenshot_path)
+            except OSError as e:
+                logger.warning(
+                    "Error deleting screenshot (ID: %s): %s: %s", game_id, screenshot_path, e
+                )
+        for path in extra_files:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Error deleting %s (ID: %s): %s", path, game_id, e)
+
+
+# ---------------------------------------------------------------------------
+# Фоновая обработка скриншотов
+# ---------------------------------------------------------------------------
+
+SCREENSHOT_PENDING = "pending"
+SCREENSHOT_FAILED = "failed"
+
+# Сколько завершённых заданий помнить для get_job
+_FINISHED_JOBS_KEPT = 100
+# Сколько раз сохранять скриншот заново, если переиспользованный файл удалили до записи в игру
+_REUSE_ATTEMPTS = 2
+
+
+def pending_state(job_id):
+    """Значение screenshot_state игры, скриншот которой ждёт задание job_id"""
+    return f"{SCREENSHOT_PENDING}:{job_id}"
+
+
+class ScreenshotJob:
+    """Задание на обработку скриншота одной игры"""
+
+    def __init__(self, game_id, save, cleanup=None):
+        self.job_id = uuid.uuid4().hex
+        self.game_id = game_id
+        # функция без аргументов: путь к файлу; OSError/sqlite3.OperationalError
+        # повторяются, другие исключения и пустой путь — окончательная ошибка
+        self.save = save
+        self.cleanup = cleanup  # вызывается один раз после последней попытки
+        self.state = "queued"
+        self.attempts = 0
+        self.error = None
+
+    def status(self):
+        return {
+            "job_id": self.job_id,
+            "game_id": self.game_id,
+            "state": self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+class ScreenshotJobQueue:
+    """
+    Очередь кодирования скриншотов в рабочих потоках.
+
+    Вызов API записывает игру с состоянием pending_state(job_id) и сразу
+    возвращается; поток кодирует изображение и записывает путь, только если
+    состояние не изменилось (игру не удалили и скриншот не заменили).
+    Глубина очереди ограничена: при переполнении задание выполняется сразу
+    в вызывающем потоке, как до появления очереди.
+    """
+
+    def __init__(
+        self,
+        workers=SCREENSHOT_WORKERS,
+        max_size=SCREENSHOT_QUEUE_SIZE,
+        retries=SCREENSHOT_JOB_RETRIES,
+    ):
+        self.workers = workers
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._threads = []
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """listener(status) вызывается из рабочего потока по завершении задания"""
+        self._listeners.append(listener)
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f"screenshot-worker-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job):
+        """Ставит задание в очередь (или выполняет сразу, если очередь заполнена)"""
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._start()
         try:
-            os.remove(screenshot_path)
-            logger.info(f"Screenshot deleted (ID: {game_id}): {screenshot_path}")
-        except OSError as e:
+            self._queue.put_nowait(job)
+        except queue.Full:
             logger.warning(
-                f"Error deleting screenshot (ID: {game_id}): {screenshot_path}: {e}"
+                "Screenshot queue is full, processing job for game %s inline", job.game_id
             )
+            self._run(job)
+        return job.job_id
+
+    def get_job(self, job_id):
+        """Состояние задания или None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.status() if job else None
+
+    def pending_count(self):
+        """Заданий в очереди"""
+        return self._queue.qsize()
+
+    def wait(self):
+        """Ждёт, пока очередь опустеет (для служебных команд и тестов)"""
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _save(self, job):
+        """Вызывает job.save с повторами; путь к файлу или ""."""
+        screenshot_path = ""
+        for attempt in range(1, self.retries + 2):
+            job.attempts += 1
+            try:
+                screenshot_path = job.save()
+            except (OSError, sqlite3.OperationalError) as e:
+                # Временная ошибка (диск, блокировка БД) — стоит повторить
+                job.error = str(e)
+                logger.warning("Screenshot job %s attempt %s failed: %s", job.job_id, attempt, e)
+            except Exception as e:
+                # Непригодное изображение: повтор даст ту же ошибку
+                job.error = str(e)
+                logger.error("Screenshot job %s failed: %s", job.job_id, e)
+                break
+            else:
+                if not screenshot_path:
+                    job.error = job.error or "Screenshot could not be saved"
+                break
+            if attempt <= self.retries:
+                time.sleep(0.5 * attempt)
+        if screenshot_path:
+            job.error = None
+        return screenshot_path
+
+    def _run(self, job):
+        job.state = "processing"
+        try:
+            state = None
+            for _ in range(_REUSE_ATTEMPTS):
+                state = self._apply(job, self._save(job))
+                if state is not None:
+                    break
+                # Файл, найденный по хэшу, удалили вместе с последней игрой — сохраняем заново
+                logger.info("Reused screenshot of job %s was deleted, saving again", job.job_id)
+            if state is None:
+                job.error = "Screenshot file was deleted while it was being reused"
+                state = SCREENSHOT_FAILED
+            job.state = state
+        except Exception as e:
+            job.state = SCREENSHOT_FAILED
+            job.error = str(e)
+            logger.error("Error applying screenshot job %s: %s", job.job_id, e, exc_info=True)
+        finally:
+            if job.cleanup:
+                job.cleanup()
+
+        self._finish(job)
+
+    def _apply(self, job, screenshot_path):
+        """
+        Записывает результат в игру; возвращает итоговое состояние задания или None,
+        если файл, переиспользованный по хэшу, успели удалить (его нужно сохранить заново)
+        """
+        repo = GameRepository()
+        with db.transaction(immediate=True):
+            if screenshot_path and not is_screenshot_stored(screenshot_path):
+                return None
+            old_path = repo.get_screenshot_path(job.game_id)
+            applied = repo.finish_screenshot(
+                job.game_id, pending_state(job.job_id), screenshot_path or None
+            )
+
+        # Прежний файл — после коммита (см. delete_screenshot)
+        if applied and screenshot_path and old_path and old_path != screenshot_path:
+            delete_screenshot(old_path, job.game_id)
+
+        if not screenshot_path:
+            return SCREENSHOT_FAILED
+        if not applied:
+            # Игру удалили или скриншот заменили, пока шла обработка
+            delete_screenshot(screenshot_path, job.game_id)
+            return "superseded"
+        return "done"
+
+    def _finish(self, job):
+        with self._lock:
+            while len(self._jobs) > _FINISHED_JOBS_KEPT:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.state in ("queued", "processing"):
+                    break
+                del self._jobs[oldest_id]
+
+        logger.info(
+            "Screenshot job %s for game %s: %s after %s attempt(s)",
+            job.job_id,
+            job.game_id,
+            job.state,
+            job.attempts,
+        )
+        status = job.status()
+        for listener in self._listeners:
+            try:
+                listener(status)
+            except Exception as e:
+                logger.error("Screenshot job listener failed: %s", e, exc_info=True)
+
+
+screenshot_jobs = ScreenshotJobQueue()
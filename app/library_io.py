@@ -0,0 +1,294 @@
+# app/library_io.py
+
+"""
+Потоковый импорт и экспорт библиотеки.
+
+Форматы определяются по расширению файла:
+    .jsonl — JSON Lines, одна игра на строку
+    .csv   — таблица (UTF-8 с BOM, чтобы Excel читал кириллицу)
+    .zip   — games.jsonl + screenshots/<файл>.webp (сырые байты WebP, без base64)
+
+Строки проходят через генераторы, а импорт пишет игры пачками по
+IMPORT_CHUNK_SIZE, каждая пачка — своя транзакция, поэтому расход памяти не
+зависит от размера файла. Скриншоты из архива кодируются после коммита пачки
+через очередь фоновой обработки (screenshot_jobs), не держа блокировку записи.
+"""
+
+import csv
+import functools
+import io
+import json
+import os
+import zipfile
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from app.database import GAME_STATUSES, GameRepository, db
+from app.image_utils import ScreenshotJob, pending_state, save_screenshot_bytes, screenshot_jobs
+from app.logger import get_logger
+from config import IMPORT_CHUNK_SIZE
+
+logger = get_logger(__name__)
+
+# Поля игры в экспорте (screenshot_path — внутренний путь, не переносится)
+EXPORT_FIELDS = (
+    "id",
+    "title",
+    "version",
+    "status",
+    "rating",
+    "review",
+    "game_link",
+    "developer",
+    "created_at",
+    "updated_at",
+)
+
+SUPPORTED_FORMATS = ("jsonl", "csv", "zip")
+ZIP_GAMES_FILE = "games.jsonl"
+ZIP_SCREENSHOTS_DIR = "screenshots"
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Возвращает формат файла: явно заданный или по расширению"""
+    fmt = (fmt or os.path.splitext(str(path))[1].lstrip(".")).lower()
+    if fmt == "json":
+        fmt = "jsonl"
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported library format: '{fmt}'")
+    return fmt
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Разбивает поток на списки по size элементов"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _export_record(game: dict) -> dict:
+    return {field: game.get(field) for field in EXPORT_FIELDS}
+
+
+# ---------------------------------------------------------------------------
+# Экспорт
+# ---------------------------------------------------------------------------
+
+def _has_screenshot(game: dict) -> bool:
+    path = game.get("screenshot_path")
+    return bool(path) and os.path.exists(path)
+
+
+def _write_jsonl(stream, games: Iterable[dict], with_screenshots: bool = False) -> int:
+    count = 0
+    for game in games:
+        record = _export_record(game)
+        if with_screenshots and _has_screenshot(game):
+            record["screenshot"] = _screenshot_arcname(game)
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def _write_csv(stream, games: Iterable[dict]) -> int:
+    writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for game in games:
+        writer.writerow(_export_record(game))
+        count += 1
+    return count
+
+
+def _screenshot_arcname(game: dict) -> str:
+    # Имя файла в хранилище — хэш содержимого, общий скриншот попадает в архив один раз
+    return f"{ZIP_SCREENSHOTS_DIR}/{os.path.basename(game['screenshot_path'])}"
+
+
+def export_library(path: str, fmt: Optional[str] = None, include_screenshots: bool = False) -> dict:
+    """
+    Экспортирует библиотеку в файл.
+    Скриншоты можно приложить только к архиву .zip.
+    Возвращает {"exported": N, "screenshots": M, "path": path}.
+    """
+    fmt = detect_format(path, fmt)
+    if include_screenshots and fmt != "zip":
+        raise ValueError("Screenshots can only be bundled into a .zip export")
+
+    repo = GameRepository()
+    result = {"exported": 0, "screenshots": 0, "path": str(path)}
+
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            result["exported"] = _write_jsonl(f, repo.iter_games())
+    elif fmt == "csv":
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            result["exported"] = _write_csv(f, repo.iter_games())
+    else:
+        # Архив: сначала список игр, затем файлы скриншотов (WebP уже сжат — без deflate)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            with zf.open(ZIP_GAMES_FILE, "w") as raw:
+                stream = io.TextIOWrapper(raw, encoding="utf-8", newline="\n")
+                result["exported"] = _write_jsonl(
+                    stream, repo.iter_games(), with_screenshots=include_screenshots
+                )
+                stream.flush()
+                stream.detach()
+
+            if include_screenshots:
+                written = set()
+                for game in repo.iter_games():
+                    if _has_screenshot(game) and game["screenshot_path"] not in written:
+                        written.add(game["screenshot_path"])
+                        zf.write(
+                            game["screenshot_path"],
+                            _screenshot_arcname(game),
+                            compress_type=zipfile.ZIP_STORED,
+                        )
+                        result["screenshots"] += 1
+
+    logger.info(
+        "Library exported to %s: %s games, %s screenshots",
+        path,
+        result["exported"],
+        result["screenshots"],
+    )
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Импорт
+# ---------------------------------------------------------------------------
+
+def _read_jsonl(stream) -> Iterator[dict]:
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning("Skipping line %s: invalid JSON: %s", line_number, e)
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def _normalize_record(record: dict) -> Optional[dict]:
+    """Приводит запись к виду add_games; None если запись непригодна"""
+    title = str(record.get("title") or "").strip()
+    if not title:
+        return None
+    try:
+        rating = float(record.get("rating") or 0)
+    except (TypeError, ValueError):
+        return None
+    status = str(record.get("status") or "planned").strip().lower()
+    if status not in GAME_STATUSES:
+        logger.warning("Skipping '%s': unknown status '%s'", title, status)
+        return None
+
+    return {
+        "title": title,
+        "version": str(record.get("version") or ""),
+        "status": status,
+        "rating": rating,
+        "review": str(record.get("review") or ""),
+        "game_link": str(record.get("game_link") or ""),
+        "developer": str(record.get("developer") or ""),
+        "created_at": record.get("created_at") or None,
+        "updated_at": record.get("updated_at") or None,
+        "screenshot": record.get("screenshot") or None,
+    }
+
+
+def _save_archived_screenshot(archive: zipfile.ZipFile, name: str, game_id: int, title: str) -> str:
+    """Сохраняет скриншот из архива (вызывается заданием screenshot_jobs)"""
+    return save_screenshot_bytes(archive.read(name), game_id, title, strict=True)
+
+
+def _import_records(records: Iterable[dict], chunk_size: int, archive: Optional[zipfile.ZipFile] = None) -> dict:
+    """
+    Добавляет игры пачками. Скриншоты из archive ставятся в очередь после коммита
+    пачки (игры до этого получают состояние pending); функция ждёт, пока очередь
+    опустеет, чтобы архив был открыт до конца обработки.
+    """
+    repo = GameRepository()
+    result = {"imported": 0, "skipped": 0, "screenshots": 0}
+    jobs = []
+
+    for chunk in _chunked(records, chunk_size):
+        games = []
+        for record in chunk:
+            game = _normalize_record(record)
+            if game is None:
+                result["skipped"] += 1
+            else:
+                games.append(game)
+        if not games:
+            continue
+
+        chunk_jobs = []
+        with db.transaction(immediate=True):
+            game_ids = repo.add_games(games)
+
+            if archive is not None:
+                for game_id, game in zip(game_ids, games):
+                    name = game["screenshot"]
+                    if not name:
+                        continue
+                    try:
+                        archive.getinfo(name)
+                    except KeyError:
+                        logger.warning("Screenshot %s is missing in archive", name)
+                        continue
+                    job = ScreenshotJob(
+                        game_id,
+                        functools.partial(
+                            _save_archived_screenshot, archive, name, game_id, game["title"]
+                        ),
+                    )
+                    repo.set_screenshot_state(game_id, pending_state(job.job_id))
+                    chunk_jobs.append(job)
+
+        # Задания — после коммита: рабочий поток должен видеть записи игр
+        for job in chunk_jobs:
+            screenshot_jobs.submit(job)
+        jobs.extend(chunk_jobs)
+
+        result["imported"] += len(game_ids)
+        logger.info("Imported %s games...", result['imported'])
+
+    if jobs:
+        screenshot_jobs.wait()
+        result["screenshots"] = sum(1 for job in jobs if job.state == "done")
+    return result
+
+
+def import_library(path: str, fmt: Optional[str] = None, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Импортирует игры из файла, добавляя их к библиотеке.
+    Возвращает {"imported": N, "skipped": K, "screenshots": M}.
+    """
+    fmt = detect_format(path, fmt)
+
+    if fmt == "jsonl":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            result = _import_records(_read_jsonl(f), chunk_size)
+    elif fmt == "csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            result = _import_records(csv.DictReader(f), chunk_size)
+    else:
+        with zipfile.ZipFile(path, "r") as zf:
+            with zf.open(ZIP_GAMES_FILE) as raw:
+                stream = io.TextIOWrapper(raw, encoding="utf-8-sig")
+                result = _import_records(_read_jsonl(stream), chunk_size, archive=zf)
+
+    logger.info(
+        "Library imported from %s: %s games, %s skipped, %s screenshots",
+        path,
+        result["imported"],
+        result["skipped"],
+        result["screenshots"],
+    )
+    return result
@@ -1,17 +1,110 @@
 # app/logger.py
 
-import logging
+"""
+Логирование приложения.
+
+Вызовы логгера только кладут запись в очередь (QueueHandler), а форматирование
+и запись в файл и консоль выполняет фоновый поток QueueListener — поток
+запросов Eel не ждёт диска. Файл лога ротируется по размеру или по времени,
+старые файлы сжимаются в .gz.
+"""
 
+import atexit
+import gzip
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
 
-# Конфигурируем логирование один раз при импорте
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+from config import (
+    LOG_BACKUP_COUNT,
+    LOG_COMPRESS,
+    LOG_FILE,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_ROTATION,
+    LOG_ROTATE_WHEN,
 )
 
-# Логируем в файл без ротации
-file_handler = logging.FileHandler("app.log", encoding="utf-8")
-file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
-logging.getLogger().addHandler(file_handler)
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Подставляет аргументы в сообщение в вызывающем потоке (они могут измениться
+    после вызова), а время и трассировку форматирует уже поток записи.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _gzip_namer(name):
+    return f"{name}.gz"
+
+
+def _gzip_rotator(source, dest):
+    """Сжимает ротированный файл лога"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _file_handler():
+    """Обработчик файла лога с ротацией из настроек"""
+    if LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    elif LOG_ROTATION == "size":
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    else:
+        handler = logging.FileHandler(LOG_FILE, encoding="utf-8", delay=True)
+
+    if LOG_COMPRESS and LOG_ROTATION in ("size", "time"):
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def _configure():
+    """Настраивает корневой логгер один раз при импорте"""
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+    handlers = []
+
+    # В сборке --windowed консоли нет и sys.stderr равен None
+    if sys.stderr is not None:
+        handlers.append(logging.StreamHandler())
+
+    # Дочерние процессы пула перекодирования пишут только в консоль:
+    # ротация одного файла из нескольких процессов небезопасна
+    if multiprocessing.parent_process() is None:
+        handlers.append(_file_handler())
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Дописываем очередь до того, как logging.shutdown закроет обработчики
+    atexit.register(listener.stop)
+    return listener
+
+
+_listener = _configure()
 
 
 def get_logger(name=None) -> logging.Logger:
@@ -21,4 +114,3 @@ def get_logger(name=None) -> logging.Logger:
     if name is None:
         name = "app"
     return logging.getLogger(name)
-
@@ -0,0 +1,319 @@
+# app/metrics.py
+
+"""
+Метрики вызовов API и медленные запросы SQLite.
+
+Включается переменной окружения GAMELIST_METRICS=1 (METRICS_ENABLED в config.py).
+Выключенные метрики ничего не стоят: @instrument возвращает функцию без
+обёртки, а соединения БД открываются обычным классом sqlite3.Connection.
+
+Для каждой функции @eel.expose копятся число вызовов и ошибок, гистограмма
+задержек и размер аргументов и ответа в JSON (столько Eel передаёт по
+WebSocket). Запросы SQLite замеряет класс соединения TimedConnection: время
+запроса — сумма времени внутри execute и fetch* его курсора, запрос
+записывается, когда курсор дочитан, закрыт или выполняет следующий запрос.
+Код Python между чтениями строк (разбор строк, _prepare_game) в это время
+не входит. Ограничение: недочитанный курсор записывается, только когда его
+закрывают или собирает сборщик мусора, а commit() — отдельным запросом COMMIT.
+"""
+
+import atexit
+import bisect
+import functools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from app.logger import get_logger
+from config import METRICS_DUMP_FILE, METRICS_ENABLED, SLOW_QUERY_MS
+
+logger = get_logger(__name__)
+
+# Верхние границы корзин гистограммы задержек (мс); последняя корзина — всё, что больше
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+SLOW_QUERY_LOG_SIZE = 50  # последних медленных запросов в get_metrics()
+SQL_TEXT_LIMIT = 300  # символов текста запроса в логе
+
+
+def _json_size(value) -> int:
+    """Размер значения в JSON, как его сериализует Eel"""
+    try:
+        return len(json.dumps(value, default=lambda o: None))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попадает перцентиль"""
+        calls = sum(self.counts)
+        if not calls:
+            return 0.0
+        threshold = fraction * calls
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        calls = sum(self.counts)
+        bounds = [str(bound) for bound in LATENCY_BUCKETS_MS] + ["+inf"]
+        return {
+            "calls": calls,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / calls, 3) if calls else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p99_ms": self.percentile(0.99),
+            "histogram": {bound: count for bound, count in zip(bounds, self.counts) if count},
+        }
+
+
+class _CallStats:
+    __slots__ = ("latency", "errors", "args_bytes", "result_bytes", "result_bytes_max")
+
+    def __init__(self):
+        self.latency = _Histogram()
+        self.errors = 0
+        self.args_bytes = 0
+        self.result_bytes = 0
+        self.result_bytes_max = 0
+
+    def snapshot(self) -> dict:
+        stats = self.latency.snapshot()
+        calls = stats["calls"]
+        stats.update(
+            {
+                "errors": self.errors,
+                "args_bytes": self.args_bytes,
+                "result_bytes": self.result_bytes,
+                "result_bytes_mean": self.result_bytes // calls if calls else 0,
+                "result_bytes_max": self.result_bytes_max,
+            }
+        )
+        return stats
+
+
+class Metrics:
+    """Накопленные метрики процесса (вызовы API приходят из гринлетов, запросы — из любых потоков)"""
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._calls = {}
+        self._queries = _Histogram()
+        self._slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    def record_call(self, name, ms, args_bytes, result_bytes, failed=False):
+        with self._lock:
+            stats = self._calls.get(name)
+            if stats is None:
+                stats = self._calls[name] = _CallStats()
+            stats.latency.add(ms)
+            stats.args_bytes += args_bytes
+            stats.result_bytes += result_bytes
+            if result_bytes > stats.result_bytes_max:
+                stats.result_bytes_max = result_bytes
+            if failed:
+                stats.errors += 1
+
+    def record_query(self, sql, ms):
+        with self._lock:
+            self._queries.add(ms)
+            if ms < self.slow_query_ms:
+                return
+            sql = " ".join(sql.split())[:SQL_TEXT_LIMIT]
+            self._slow_queries.append({"sql": sql, "ms": round(ms, 3), "at": round(time.time(), 3)})
+        logger.warning("Slow query (%.1f ms): %s", ms, sql)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": True,
+                "started_at": round(self._started, 3),
+                "uptime": round(time.time() - self._started, 3),
+                "slow_query_ms": self.slow_query_ms,
+                "calls": {name: stats.snapshot() for name, stats in sorted(self._calls.items())},
+                "queries": self._queries.snapshot(),
+                "slow_queries": list(self._slow_queries),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._started = time.time()
+            self._calls.clear()
+            self._queries = _Histogram()
+            self._slow_queries.clear()
+
+
+metrics = Metrics() if METRICS_ENABLED else None
+
+
+def instrument(func):
+    """
+    Декоратор функции API: время, размер аргументов и ответа, исключения.
+    Ставится под @eel.expose; без METRICS_ENABLED возвращает функцию как есть.
+    """
+    if metrics is None:
+        return func
+
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            ms = (time.perf_counter() - started) * 1000
+            metrics.record_call(name, ms, _json_size(args), 0, failed=True)
+            raise
+        ms = (time.perf_counter() - started) * 1000
+        metrics.record_call(name, ms, _json_size(args), _json_size(result))
+        return result
+
+    return wrapper
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """Курсор, который складывает время своих execute и fetch* для текущего запроса"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._sql = None
+        self._ms = 0.0
+
+    def _record(self):
+        if self._sql is not None:
+            metrics.record_query(self._sql, self._ms)
+            self._sql = None
+            self._ms = 0.0
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._ms += (time.perf_counter() - started) * 1000
+
+    def _run(self, method, sql, *args):
+        self._record()
+        self._sql = sql
+        try:
+            return self._timed(method, sql, *args)
+        finally:
+            # Запрос без строк результата закончился вместе с execute
+            if self.description is None:
+                self._record()
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._run(super().executescript, sql_script)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._record()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if len(rows) < size:
+            self._record()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._record()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._record()
+            raise
+
+    def close(self):
+        self._record()
+        super().close()
+
+    def __del__(self):
+        self._record()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Соединение, чьи запросы замеряет _TimedCursor (только при включённых метриках)"""
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            metrics.record_query("COMMIT", (time.perf_counter() - started) * 1000)
+
+
+def connection_factory():
+    """Класс соединения для sqlite3.connect: с замером запросов, если метрики включены"""
+    return sqlite3.Connection if metrics is None else TimedConnection
+
+
+def get_metrics() -> dict:
+    """Снимок метрик или {"enabled": False}"""
+    if metrics is None:
+        return {"enabled": False}
+    return metrics.snapshot()
+
+
+def dump_metrics(path=METRICS_DUMP_FILE):
+    """Записывает снимок метрик в JSON-файл"""
+    if metrics is None or not path:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(metrics.snapshot(), f, ensure_ascii=False, indent=2)
+        logger.info("Metrics written to %s", path)
+    except OSError as e:
+        logger.error("Error writing metrics to %s: %s", path, e)
+
+
+if metrics is not None and METRICS_DUMP_FILE:
+    atexit.register(dump_metrics)
@@ -3,6 +3,9 @@
 """
 Миграции базы данных.
 
+Версия схемы хранится в PRAGMA user_version (заголовок файла БД), поэтому
+проверка «схема актуальна» при запуске не выполняет запросов к таблицам.
+
 Пример:
     def _migration_2_add_test(conn):
         conn.execute("ALTER TABLE games ADD COLUMN test TEXT DEFAULT ''")
@@ -15,23 +18,74 @@
             up=_migration_2_add_test,
         ),
     ]
+
+Заполнение данных для больших таблиц (производные колонки, индексы)
+описывается отдельно от изменения схемы через Backfill. Оно идёт частями по
+BACKFILL_CHUNK_SIZE строк, каждая часть — своя транзакция вместе с записью
+прогресса, поэтому прерванное заполнение продолжается с того же места:
+
+    def _backfill_3_test(conn, after_id, limit):
+        rows = conn.execute(
+            "SELECT id FROM games WHERE id > ? ORDER BY id LIMIT ?", (after_id or 0, limit)
+        ).fetchall()
+        conn.executemany("UPDATE games SET test = ... WHERE id = ?", rows)
+        return (rows[-1][0], len(rows)) if rows else (None, 0)
+
+    Migration(
+        version=3,
+        description="Fill test column",
+        up=_migration_3_add_test_index,
+        backfill=Backfill(_backfill_3_test, deferred=True),
+    )
+
+Отложенное (deferred) заполнение выполняет run_backfills в фоновом потоке
+после открытия окна; до его окончания код должен мириться с незаполненными строками.
 """
 
 import sqlite3
-from typing import Callable
+import time
+from typing import Callable, Optional
 
 from app.logger import get_logger
+from app.text import normalize_title
+from config import BACKFILL_CHUNK_SIZE, BACKFILL_PAUSE
 
 logger = get_logger(__name__)
 
 
+class Backfill:
+    """
+    Возобновляемое заполнение данных миграции по частям.
+    step(conn, after, limit) обрабатывает до limit строк с ключом больше after
+    (None — с начала) и возвращает (ключ последней строки, число строк);
+    (None, 0) — строк не осталось.
+    """
+
+    def __init__(
+        self,
+        step: Callable[[sqlite3.Connection, Optional[int], int], tuple[Optional[int], int]],
+        chunk_size: int = BACKFILL_CHUNK_SIZE,
+        deferred: bool = False,
+    ):
+        self.step = step
+        self.chunk_size = chunk_size
+        self.deferred = deferred  # True — выполнять после запуска, в фоне
+
+
 class Migration:
-    """Описывает одну миграцию: версия + описание + функция применения."""
+    """Описывает одну миграцию: версия + описание + функция применения + заполнение данных."""
 
-    def __init__(self, version: int, description: str, up: Callable[[sqlite3.Connection], None]):
+    def __init__(
+        self,
+        version: int,
+        description: str,
+        up: Optional[Callable[[sqlite3.Connection], None]] = None,
+        backfill: Optional[Backfill] = None,
+    ):
         self.version = version
         self.description = description
         self.up = up  # функция, принимающая sqlite3.Connection
+        self.backfill = backfill
 
 
 # ---------------------------------------------------------------------------
@@ -65,6 +119,480 @@ def _migration_2_add_developer_column(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     cursor.execute("ALTER TABLE games ADD COLUMN developer TEXT DEFAULT ''")
 
+def _migration_3_add_sort_indexes(conn: sqlite3.Connection) -> None:
+    """Составные индексы под каждый порядок сортировки списка игр (с id для keyset)."""
+    cursor = conn.cursor()
+    # Выражение должно совпадать с STATUS_RANK_SQL в app/database.py
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_games_status_rank ON games(
+            (CASE status
+                WHEN 'playing' THEN 4
+                WHEN 'completed' THEN 3
+                WHEN 'planned' THEN 2
+                WHEN 'dropped' THEN 1
+                ELSE 0
+            END),
+            created_at,
+            id
+        )
+    """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_updated ON games(updated_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_created ON games(created_at, id)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_games_title_nocase ON games(title COLLATE NOCASE, id)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_rating ON games(rating, id)")
+
+    # Те же порядки внутри одного статуса (фильтр по статусу)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_games_status_updated ON games(status, updated_at, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_games_status_created ON games(status, created_at, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_games_status_title "
+        "ON games(status, title COLLATE NOCASE, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_games_status_rating ON games(status, rating, id)"
+    )
+    # idx_status полностью покрывается индексами idx_games_status_*
+    cursor.execute("DROP INDEX IF EXISTS idx_status")
+
+def _fts_fold(column: str) -> str:
+    """SQL-выражение, приводящее ё к е (unicode61 не считает их одной буквой)."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _migration_4_add_games_fts(conn: sqlite3.Connection) -> None:
+    """Полнотекстовый индекс FTS5 по title, developer и review с триггерами синхронизации."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5(
+            title,
+            developer,
+            review,
+            content='games',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """
+    )
+
+    # В индекс попадает текст с ё → е; удаление должно передать те же значения
+    indexed = ", ".join(
+        _fts_fold(f"{{row}}.{column}") for column in ("title", "developer", "review")
+    )
+    insert_new = f"INSERT INTO games_fts(rowid, title, developer, review) VALUES (new.id, {indexed.format(row='new')});"
+    delete_old = (
+        "INSERT INTO games_fts(games_fts, rowid, title, developer, review) "
+        f"VALUES ('delete', old.id, {indexed.format(row='old')});"
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS games_fts_ai AFTER INSERT ON games BEGIN
+            {insert_new}
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS games_fts_ad AFTER DELETE ON games BEGIN
+            {delete_old}
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS games_fts_au AFTER UPDATE OF title, developer, review ON games BEGIN
+            {delete_old}
+            {insert_new}
+        END
+    """
+    )
+
+    # 'rebuild' читает исходный текст без замены ё, поэтому заполняем вручную
+    cursor.execute("INSERT INTO games_fts(games_fts) VALUES ('delete-all')")
+    cursor.execute(
+        f"""
+        INSERT INTO games_fts(rowid, title, developer, review)
+        SELECT id, {indexed.format(row='games')} FROM games
+    """
+    )
+
+def _migration_5_add_game_stats(conn: sqlite3.Connection) -> None:
+    """Таблица-счётчик статистики по статусам, поддерживаемая триггерами."""
+    from app.database import GAME_STATUSES as statuses
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS game_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_games INTEGER NOT NULL DEFAULT 0,
+            {", ".join(f"{status} INTEGER NOT NULL DEFAULT 0" for status in statuses)}
+        )
+    """
+    )
+    cursor.execute(
+        f"""
+        INSERT OR REPLACE INTO game_stats (id, total_games, {", ".join(statuses)})
+        SELECT 1, COUNT(*), {", ".join(f"COUNT(CASE WHEN status = '{status}' THEN 1 END)" for status in statuses)}
+        FROM games
+    """
+    )
+
+    def adjust(row: str, sign: str) -> str:
+        # CASE, а не (status = 'x'): при NULL-статусе сравнение даёт NULL и счётчики обнулились бы
+        return ", ".join(
+            f"{status} = {status} {sign} CASE WHEN {row}.status = '{status}' THEN 1 ELSE 0 END"
+            for status in statuses
+        )
+
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS game_stats_ai AFTER INSERT ON games BEGIN
+            UPDATE game_stats SET total_games = total_games + 1, {adjust("new", "+")} WHERE id = 1;
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS game_stats_ad AFTER DELETE ON games BEGIN
+            UPDATE game_stats SET total_games = total_games - 1, {adjust("old", "-")} WHERE id = 1;
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS game_stats_au AFTER UPDATE OF status ON games
+        WHEN old.status IS NOT new.status BEGIN
+            UPDATE game_stats SET {adjust("old", "-")} WHERE id = 1;
+            UPDATE game_stats SET {adjust("new", "+")} WHERE id = 1;
+        END
+    """
+    )
+
+
+def _migration_6_add_screenshot_store(conn: sqlite3.Connection) -> None:
+    """
+    Таблица скриншотов, адресуемых по хэшу содержимого, со счётчиком ссылок.
+    ref_count — число игр, у которых screenshot_path указывает на файл; его
+    поддерживают триггеры. Файлы, сохранённые до миграции, в таблице не числятся.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS screenshots (
+            hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS screenshots_ref_ai AFTER INSERT ON games
+        WHEN new.screenshot_path != '' BEGIN
+            UPDATE screenshots SET ref_count = ref_count + 1 WHERE path = new.screenshot_path;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS screenshots_ref_ad AFTER DELETE ON games
+        WHEN old.screenshot_path != '' BEGIN
+            UPDATE screenshots SET ref_count = ref_count - 1 WHERE path = old.screenshot_path;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS screenshots_ref_au AFTER UPDATE OF screenshot_path ON games
+        WHEN old.screenshot_path IS NOT new.screenshot_path BEGIN
+            UPDATE screenshots SET ref_count = ref_count - 1 WHERE path = old.screenshot_path;
+            UPDATE screenshots SET ref_count = ref_count + 1 WHERE path = new.screenshot_path;
+        END
+    """
+    )
+
+
+def _migration_7_add_screenshot_state(conn: sqlite3.Connection) -> None:
+    """Состояние обработки скриншота: '' — готов или нет, 'pending' — в очереди, 'failed' — ошибка."""
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE games ADD COLUMN screenshot_state TEXT NOT NULL DEFAULT ''")
+
+
+def _migration_8_add_change_feed(conn: sqlite3.Connection) -> None:
+    """
+    Лента изменений: сквозной номер ревизии библиотеки, колонка revision
+    у каждой игры и таблица-надгробие для удалённых игр. Всё поддерживают триггеры.
+    Существующие игры получают ревизию 1.
+    """
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE games ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE games SET revision = 1")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_revision ON games(revision)")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS library_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+    cursor.execute("INSERT OR REPLACE INTO library_revision (id, revision) VALUES (1, 1)")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS game_tombstones (
+            game_id INTEGER PRIMARY KEY,
+            revision INTEGER NOT NULL
+        )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_game_tombstones_revision ON game_tombstones(revision)"
+    )
+
+    bump = "UPDATE library_revision SET revision = revision + 1 WHERE id = 1;"
+    current = "(SELECT revision FROM library_revision WHERE id = 1)"
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS games_revision_ai AFTER INSERT ON games BEGIN
+            {bump}
+            UPDATE games SET revision = {current} WHERE id = new.id;
+            DELETE FROM game_tombstones WHERE game_id = new.id;
+        END
+    """
+    )
+    # Условие WHEN не даёт собственному UPDATE revision считаться новым изменением
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS games_revision_au AFTER UPDATE ON games
+        WHEN new.revision IS old.revision BEGIN
+            {bump}
+            UPDATE games SET revision = {current} WHERE id = new.id;
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS games_revision_ad AFTER DELETE ON games BEGIN
+            {bump}
+            INSERT OR REPLACE INTO game_tombstones (game_id, revision) VALUES (old.id, {current});
+        END
+    """
+    )
+
+# Колонки, изменение которых видно пользователю и меняет ревизию игры.
+# Производные колонки (title_norm) сюда не входят: их заполнение не должно
+# рассылать фронтенду всю библиотеку.
+REVISION_COLUMNS = (
+    "title",
+    "version",
+    "status",
+    "rating",
+    "review",
+    "game_link",
+    "developer",
+    "screenshot_path",
+    "screenshot_state",
+    "created_at",
+    "updated_at",
+)
+
+
+def _build_title_index(conn: sqlite3.Connection) -> None:
+    """
+    Заполняет title_norm у всех игр и заново строит триграммный индекс.
+    Триггеры индекса создаются после заполнения: команда 'delete' для строки,
+    которой в индексе с внешним содержимым нет, портит индекс
+    («database disk image is malformed»).
+    """
+    cursor = conn.cursor()
+    for name in ("games_title_trgm_ai", "games_title_trgm_ad", "games_title_trgm_au"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    conn.create_function("normalize_title", 1, normalize_title, deterministic=True)
+    cursor.execute(
+        "UPDATE games SET title_norm = normalize_title(title) "
+        "WHERE title_norm IS NOT normalize_title(title)"
+    )
+    cursor.execute("INSERT INTO games_title_trgm(games_title_trgm) VALUES ('rebuild')")
+
+    insert_new = "INSERT INTO games_title_trgm(rowid, title_norm) VALUES (new.id, new.title_norm);"
+    delete_old = (
+        "INSERT INTO games_title_trgm(games_title_trgm, rowid, title_norm) "
+        "VALUES ('delete', old.id, old.title_norm);"
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER games_title_trgm_ai AFTER INSERT ON games BEGIN
+            {insert_new}
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER games_title_trgm_ad AFTER DELETE ON games BEGIN
+            {delete_old}
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER games_title_trgm_au AFTER UPDATE OF title_norm ON games BEGIN
+            {delete_old}
+            {insert_new}
+        END
+    """
+    )
+
+
+def _migration_9_add_title_index(conn: sqlite3.Connection) -> None:
+    """
+    Нормализованное название (title_norm) для поиска похожих названий:
+    B-tree индекс для точного совпадения и префикса и триграммный индекс FTS5
+    для подстрок. Существующие игры заполняются здесь же, до создания триггеров индекса.
+    """
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE games ADD COLUMN title_norm TEXT NOT NULL DEFAULT ''")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_title_norm ON games(title_norm)")
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS games_title_trgm USING fts5(
+            title_norm,
+            content='games',
+            content_rowid='id',
+            tokenize='trigram'
+        )
+    """
+    )
+
+    # Ревизия меняется только при изменении видимых колонок (см. миграцию 8),
+    # поэтому заполнение title_norm ниже не рассылает фронтенду всю библиотеку
+    bump = "UPDATE library_revision SET revision = revision + 1 WHERE id = 1;"
+    current = "(SELECT revision FROM library_revision WHERE id = 1)"
+    cursor.execute("DROP TRIGGER IF EXISTS games_revision_au")
+    cursor.execute(
+        f"""
+        CREATE TRIGGER games_revision_au AFTER UPDATE OF {", ".join(REVISION_COLUMNS)} ON games
+        WHEN new.revision IS old.revision BEGIN
+            {bump}
+            UPDATE games SET revision = {current} WHERE id = new.id;
+        END
+    """
+    )
+
+    _build_title_index(conn)
+
+
+def _migration_10_add_developers(conn: sqlite3.Connection) -> None:
+    """
+    Разработчики отдельно от строки games.developer: таблица developers
+    с уникальным нормализованным именем (индекс для поиска по префиксу)
+    и счётчиком игр, связи game_developers. Счётчики поддерживают триггеры.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS developers (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_fold TEXT NOT NULL UNIQUE,
+            game_count INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS game_developers (
+            developer_id INTEGER NOT NULL,
+            game_id INTEGER NOT NULL,
+            PRIMARY KEY (developer_id, game_id)
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_game_developers_game ON game_developers(game_id)"
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS game_developers_ai AFTER INSERT ON game_developers BEGIN
+            UPDATE developers SET game_count = game_count + 1 WHERE id = new.developer_id;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS game_developers_ad AFTER DELETE ON game_developers BEGIN
+            UPDATE developers SET game_count = game_count - 1 WHERE id = old.developer_id;
+            DELETE FROM developers WHERE id = old.developer_id AND game_count <= 0;
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS games_developers_ad AFTER DELETE ON games BEGIN
+            DELETE FROM game_developers WHERE game_id = old.id;
+        END
+    """
+    )
+
+
+def _backfill_10_developers(conn: sqlite3.Connection, after_id: Optional[int], limit: int):
+    """Раскладывает строки developer существующих игр по developers и game_developers."""
+    rows = conn.execute(
+        "SELECT id, developer FROM games WHERE id > ? ORDER BY id LIMIT ?", (after_id or 0, limit)
+    ).fetchall()
+    from app.database import sync_game_developers
+
+    for game_id, developer in rows:
+        sync_game_developers(conn, game_id, developer)
+    return (rows[-1][0], len(rows)) if rows else (None, 0)
+
+
+def _migration_11_add_tombstone_floor(conn: sqlite3.Connection) -> None:
+    """
+    Граница ленты изменений: надгробия с ревизией не выше tombstone_floor удалены
+    (prune_tombstones), клиенту с более старой ревизией нужна полная загрузка.
+    """
+    conn.execute(
+        "ALTER TABLE library_revision ADD COLUMN tombstone_floor INTEGER NOT NULL DEFAULT 0"
+    )
+
+
+def _migration_12_rebuild_title_index(conn: sqlite3.Connection) -> None:
+    """
+    Перестраивает title_norm и триграммный индекс в базах, где миграция 9 ещё
+    заполняла их отложенно и оставила индекс неполным.
+    """
+    _build_title_index(conn)
+    conn.execute("DELETE FROM migration_backfills WHERE version = 9")
+
+
+def _migration_13_sort_by_title_norm(conn: sqlite3.Connection) -> None:
+    """
+    Сортировка по названию идёт по title_norm: COLLATE NOCASE сворачивает
+    регистр только у ASCII, и кириллица сортировалась иначе, чем в интерфейсе.
+    """
+    cursor = conn.cursor()
+    # Без фильтра по статусу порядок (title_norm, id) даёт idx_games_title_norm:
+    # id — это rowid, он и так последний ключ индекса
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_games_status_title_norm ON games(status, title_norm, id)"
+    )
+    cursor.execute("DROP INDEX IF EXISTS idx_games_title_nocase")
+    cursor.execute("DROP INDEX IF EXISTS idx_games_status_title")
+
+
 # ---------------------------------------------------------------------------
 # Список миграций
 # ---------------------------------------------------------------------------
@@ -80,14 +608,74 @@ MIGRATIONS: list[Migration] = [
         description="Add developer column to games table",
         up=_migration_2_add_developer_column,
     ),
+    Migration(
+        version=3,
+        description="Add composite indexes for list sort orders",
+        up=_migration_3_add_sort_indexes,
+    ),
+    Migration(
+        version=4,
+        description="Add FTS5 full-text index over title, developer and review",
+        up=_migration_4_add_games_fts,
+    ),
+    Migration(
+        version=5,
+        description="Add trigger-maintained game_stats counters",
+        up=_migration_5_add_game_stats,
+    ),
+    Migration(
+        version=6,
+        description="Add content-addressed screenshot store with reference counts",
+        up=_migration_6_add_screenshot_store,
+    ),
+    Migration(
+        version=7,
+        description="Add screenshot_state column to games table",
+        up=_migration_7_add_screenshot_state,
+    ),
+    Migration(
+        version=8,
+        description="Add revision change feed with tombstones for deleted games",
+        up=_migration_8_add_change_feed,
+    ),
+    Migration(
+        version=9,
+        description="Add normalized title with prefix and trigram indexes for similar titles",
+        up=_migration_9_add_title_index,
+    ),
+    Migration(
+        version=10,
+        description="Add developers and game_developers tables with game counts",
+        up=_migration_10_add_developers,
+        # Не отложенное: по этим таблицам фильтруется список, неполные они дали бы неверный результат
+        backfill=Backfill(_backfill_10_developers),
+    ),
+    Migration(
+        version=11,
+        description="Add tombstone floor to prune the change feed",
+        up=_migration_11_add_tombstone_floor,
+    ),
+    Migration(
+        version=12,
+        description="Rebuild title_norm and the trigram title index",
+        up=_migration_12_rebuild_title_index,
+    ),
+    Migration(
+        version=13,
+        description="Sort titles by the normalized title instead of ASCII NOCASE",
+        up=_migration_13_sort_by_title_norm,
+    ),
 ]
 
 # ---------------------------------------------------------------------------
 # Движок миграций
 # ---------------------------------------------------------------------------
 
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
 def _ensure_schema_version_table(conn: sqlite3.Connection) -> None:
-    """Создает служебную таблицу schema_version, если её нет."""
+    """Создает служебные таблицы schema_version и migration_backfills, если их нет."""
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS schema_version (
@@ -95,10 +683,33 @@ def _ensure_schema_version_table(conn: sqlite3.Connection) -> None:
         )
     """
     )
+    # Прогресс заполнения данных: ключ последней обработанной строки
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS migration_backfills (
+            version INTEGER PRIMARY KEY,
+            position INTEGER,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP
+        )
+    """
+    )
+
+
+def _get_user_version(conn: sqlite3.Connection) -> int:
+    """Версия схемы из заголовка файла БД (без обращения к таблицам)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
 
 
 def _get_current_version(conn: sqlite3.Connection) -> int:
-    """Возвращает текущую версию схемы (0 если миграций ещё не было)."""
+    """
+    Возвращает текущую версию схемы (0 если миграций ещё не было).
+    Базы, созданные до перехода на user_version, хранят её только в schema_version.
+    """
+    version = _get_user_version(conn)
+    if version:
+        return version
+
     cursor = conn.cursor()
     cursor.execute(
         "SELECT name FROM sqlite_master WHERE type='table' AND name='schema_version'"
@@ -107,36 +718,186 @@ def _get_current_version(conn: sqlite3.Connection) -> int:
         return 0
     cursor.execute("SELECT MAX(version) FROM schema_version")
     row = cursor.fetchone()
-    return row[0] if row and row[0] is not None else 0
+    version = row[0] if row and row[0] is not None else 0
+    if version:
+        _ensure_schema_version_table(conn)  # в старых базах нет migration_backfills
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        logger.info("Schema version %s moved to PRAGMA user_version", version)
+    return version
 
 
 def _set_version(conn: sqlite3.Connection, version: int) -> None:
-    """Записывает текущую версию схемы."""
+    """
+    Записывает текущую версию схемы. Таблица schema_version ведётся дальше,
+    чтобы её видели версии приложения до перехода на user_version.
+    """
     conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+    conn.execute(f"PRAGMA user_version = {int(version)}")
 
 
 def run_migrations(conn: sqlite3.Connection) -> None:
     """Применяет все неприменённые миграции к соединению."""
-    _ensure_schema_version_table(conn)
-    current = _get_current_version(conn)
+    # Быстрый путь: одна PRAGMA, без запросов к таблицам
+    current = _get_user_version(conn)
+    if current >= LATEST_VERSION:
+        logger.info("Database schema is up to date (version %s)", current)
+        return
 
+    current = _get_current_version(conn)
     pending = [m for m in MIGRATIONS if m.version > current]
     if not pending:
-        logger.info(f"Database schema is up to date (version {current})")
+        logger.info("Database schema is up to date (version %s)", current)
         return
 
+    _ensure_schema_version_table(conn)
     for migration in pending:
-        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        backfill = migration.backfill
+        # Схема уже изменена, но заполнение прервалось — продолжаем его, up не повторяем
+        resuming = (
+            bool(backfill) and not backfill.deferred and _has_backfill_row(conn, migration.version)
+        )
+        if resuming:
+            logger.info("Resuming migration %s: %s", migration.version, migration.description)
+        else:
+            logger.info("Applying migration %s: %s", migration.version, migration.description)
         try:
-            migration.up(conn)
-            _set_version(conn, migration.version)
+            conn.execute("BEGIN")
+            if not resuming:
+                if migration.up:
+                    migration.up(conn)
+                if backfill:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO migration_backfills (version) VALUES (?)",
+                        (migration.version,),
+                    )
+            if not backfill or backfill.deferred:
+                _set_version(conn, migration.version)
             conn.commit()
-            logger.info(f"Migration {migration.version} applied successfully")
         except sqlite3.Error as e:
             conn.rollback()
             logger.critical(
-                f"Failed to apply migration {migration.version}: {e}", exc_info=True
+                "Failed to apply migration %s: %s", migration.version, e, exc_info=True
             )
             raise RuntimeError(f"Migration {migration.version} failed: {e}") from e
 
-    logger.info(f"All migrations applied. New schema version: {pending[-1].version}")
+        # Заполнение, без которого не обойдутся следующие миграции, — сразу;
+        # версия записывается после него, чтобы прерванное заполнение продолжилось
+        if backfill and not backfill.deferred:
+            _run_backfill(conn, migration)
+            conn.execute("BEGIN")
+            _set_version(conn, migration.version)
+            conn.commit()
+        logger.info("Migration %s applied successfully", migration.version)
+
+    logger.info("All migrations applied. New schema version: %s", pending[-1].version)
+
+
+def _has_backfill_row(conn: sqlite3.Connection, version: int) -> bool:
+    row = conn.execute("SELECT 1 FROM migration_backfills WHERE version = ?", (version,)).fetchone()
+    return row is not None
+
+
+def pending_backfills(conn: sqlite3.Connection, deferred: Optional[bool] = None) -> list[Migration]:
+    """Миграции с незаконченным заполнением данных (deferred — только отложенные или только нет)"""
+    candidates = {
+        m.version: m
+        for m in MIGRATIONS
+        if m.backfill and (deferred is None or m.backfill.deferred == deferred)
+    }
+    # Без заполнений в списке миграций — ни одного запроса
+    if not candidates:
+        return []
+    rows = conn.execute(
+        "SELECT version FROM migration_backfills WHERE finished_at IS NULL ORDER BY version"
+    ).fetchall()
+    return [candidates[row[0]] for row in rows if row[0] in candidates]
+
+
+def _run_backfill(
+    conn: sqlite3.Connection,
+    migration: Migration,
+    on_commit: Optional[Callable[[], None]] = None,
+    pause: float = 0.0,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> bool:
+    """
+    Выполняет заполнение одной миграции с сохранённой позиции.
+    Возвращает True, если оно закончено, и False, если остановлено should_stop.
+    """
+    backfill = migration.backfill
+    row = conn.execute(
+        "SELECT position, rows_done FROM migration_backfills WHERE version = ?",
+        (migration.version,),
+    ).fetchone()
+    position, rows_done = (row[0], row[1]) if row else (None, 0)
+    if position is not None:
+        logger.info("Resuming backfill of migration %s after key %s", migration.version, position)
+
+    started = time.perf_counter()
+    while True:
+        if should_stop and should_stop():
+            logger.info(
+                "Backfill of migration %s paused after %s rows", migration.version, rows_done
+            )
+            return False
+        try:
+            # IMMEDIATE: блокировка записи берётся сразу, а не посреди части
+            conn.execute("BEGIN IMMEDIATE")
+            last, processed = backfill.step(conn, position, backfill.chunk_size)
+            if last is None:
+                conn.execute(
+                    "UPDATE migration_backfills SET finished_at = CURRENT_TIMESTAMP WHERE version = ?",
+                    (migration.version,),
+                )
+            else:
+                rows_done += processed
+                conn.execute(
+                    "UPDATE migration_backfills SET position = ?, rows_done = ? WHERE version = ?",
+                    (last, rows_done, migration.version),
+                )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(
+                "Backfill of migration %s failed at key %s: %s",
+                migration.version,
+                position,
+                e,
+                exc_info=True,
+            )
+            raise RuntimeError(f"Backfill of migration {migration.version} failed: {e}") from e
+
+        if on_commit:
+            on_commit()
+        if last is None:
+            break
+        position = last
+        if pause:
+            time.sleep(pause)
+
+    logger.info(
+        "Backfill of migration %s finished: %s rows in %.1f s",
+        migration.version,
+        rows_done,
+        time.perf_counter() - started,
+    )
+    return True
+
+
+def run_backfills(
+    conn: sqlite3.Connection,
+    on_commit: Optional[Callable[[], None]] = None,
+    pause: float = BACKFILL_PAUSE,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> int:
+    """
+    Выполняет отложенные заполнения данных по частям (для фонового потока).
+    on_commit вызывается после каждой части, pause — пауза между частями.
+    Возвращает число законченных заполнений.
+    """
+    finished = 0
+    for migration in pending_backfills(conn, deferred=True):
+        if not _run_backfill(conn, migration, on_commit, pause, should_stop):
+            break
+        finished += 1
+    return finished
@@ -0,0 +1,141 @@
+# app/startup.py
+
+"""
+Профилирование запуска (python main.py --profile-startup).
+
+ImportTimer замеряет импорт каждого модуля (общее время и собственное, без
+вложенных импортов), StartupProfile — фазы запуска, в том числе идущие
+параллельно в потоках. Модуль не импортирует ничего тяжёлого, чтобы его
+можно было подключить до остальных импортов main.py.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+IMPORT_REPORT_LIMIT = 20  # модулей в отчёте об импорте
+
+
+class _TimedLoader:
+    """Обёртка загрузчика: замеряет exec_module и возвращает модулю настоящий загрузчик"""
+
+    def __init__(self, loader, name, timer):
+        self.loader = loader
+        self.name = name
+        self.timer = timer
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self.loader
+        self.timer._enter()
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer._leave(self.name, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer:
+    """Искатель модулей в начале sys.meta_path, оборачивающий загрузчики остальных"""
+
+    def __init__(self):
+        self.timings = {}  # имя модуля -> (общее время, собственное время)
+        self._total = 0.0
+        self._local = threading.local()  # стек вложенных импортов своего потока
+        self._lock = threading.Lock()
+
+    @classmethod
+    def install(cls):
+        timer = cls()
+        sys.meta_path.insert(0, timer)
+        return timer
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, name, self)
+            return spec
+        return None
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self):
+        self._stack().append(0.0)
+
+    def _leave(self, name, elapsed):
+        stack = self._stack()
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            if not stack:
+                self._total += elapsed
+            self.timings[name] = (elapsed, elapsed - nested)
+
+    def total(self) -> float:
+        """Время импортов верхнего уровня (секунды)"""
+        return self._total
+
+    def report(self, limit=IMPORT_REPORT_LIMIT) -> list:
+        """Строки отчёта: самые долгие модули по общему времени импорта"""
+        lines = [f"Imports: {len(self.timings)} modules, {self.total() * 1000:.1f} ms"]
+        slowest = sorted(self.timings.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (cumulative, own) in slowest[:limit]:
+            lines.append(f"  {cumulative * 1000:8.1f} ms  (own {own * 1000:6.1f} ms)  {name}")
+        return lines
+
+
+class StartupProfile:
+    """Фазы запуска относительно момента старта процесса"""
+
+    def __init__(self, started: float, import_timer: ImportTimer = None):
+        self.started = started
+        self.import_timer = import_timer
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.phases.append(
+                    (name, started - self.started, finished - started, threading.current_thread().name)
+                )
+
+    def mark(self, name):
+        """Отмечает момент без длительности"""
+        with self._lock:
+            self.phases.append((name, time.perf_counter() - self.started, 0.0, threading.current_thread().name))
+
+    def report(self) -> list:
+        lines = ["Startup profile:"]
+        for name, offset, duration, thread in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append(f"  +{offset * 1000:8.1f} ms  {duration * 1000:8.1f} ms  {name}  [{thread}]")
+        if self.import_timer:
+            lines.extend(self.import_timer.report())
+        return lines
@@ -0,0 +1,23 @@
+# app/text.py
+
+"""Нормализация текста для поиска: названия игр и имена разработчиков."""
+
+
+def normalize_title(title: str) -> str:
+    """
+    Нормализованное название для поиска похожих: casefold, ё → е, пробелы схлопнуты.
+    Колонку games.title_norm заполняют этой же функцией запись в database.py и миграция 9,
+    developers.name_fold — sync_game_developers в database.py.
+    """
+    text = (title or "").casefold().replace("ё", "е")
+    return " ".join(text.split())
+
+
+def split_developers(developer: str) -> dict:
+    """Разработчики из строки через запятую: {нормализованное имя: имя}, без повторов"""
+    names = {}
+    for part in (developer or "").split(","):
+        name = " ".join(part.split())
+        if name:
+            names.setdefault(normalize_title(name), name)
+    return names
@@ -1,35 +1,74 @@
 # app/updater.py
 
-import webbrowser
-from typing import Any, Dict, Optional
+"""
+Проверка обновлений.
+
+Ответ GitHub о последнем релизе хранится на диске (UPDATE_CACHE_FILE) вместе с
+ETag. Пока ответ моложе UPDATE_CHECK_TTL, сеть не запрашивается; устаревший
+ответ перепроверяется условным запросом (If-None-Match), и неизменившийся
+релиз стоит один ответ 304 без тела. Проверка выполняется один раз при запуске
+в фоновом потоке (start_update_check), а API отдаёт сохранённый ответ сразу —
+без сети окно не ждёт таймаута запроса.
+"""
 
-import requests
-from packaging.version import InvalidVersion, Version
+import json
+import threading
+import time
+import webbrowser
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
+from app.fsutil import write_file_atomic
 from app.logger import get_logger
-from config import APP_VERSION, GITHUB_API_URL
+from config import (
+    APP_VERSION,
+    GITHUB_API_URL,
+    UPDATE_CACHE_FILE,
+    UPDATE_CHECK_TIMEOUT,
+    UPDATE_CHECK_TTL,
+)
 
 logger = get_logger(__name__)
 
+# requests и packaging импортируются при первой проверке обновлений, а не при запуске
+if TYPE_CHECKING:
+    from packaging.version import Version
+
+_cache_lock = threading.Lock()
+_cache = None  # содержимое UPDATE_CACHE_FILE после первого чтения
+_check_thread = None
 
-def get_latest_release_info() -> Optional[Dict[str, Any]]:
+
+def get_latest_release_info(
+    etag: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
     """
     Запрашивает информацию о последнем релизе с GitHub.
+    С etag запрос условный. Возвращает (релиз, ETag, не изменился ли релиз);
+    при ошибке — (None, None, False).
     """
+    import requests
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if etag:
+        headers["If-None-Match"] = etag
     try:
-        response = requests.get(GITHUB_API_URL, timeout=5)
+        response = requests.get(GITHUB_API_URL, headers=headers, timeout=UPDATE_CHECK_TIMEOUT)
+        if response.status_code == 304:
+            return None, response.headers.get("ETag", etag), True
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        logger.info(f"Error fetching GitHub API: {e}")
-        return None
+        return response.json(), response.headers.get("ETag"), False
+    except (requests.RequestException, ValueError) as e:
+        logger.info("Error fetching GitHub API: %s", e)
+        return None, None, False
 
 
-def parse_version(tag: str) -> Optional[Version]:
+def parse_version(tag: str) -> Optional["Version"]:
     """
     Извлекает версию из тега (например, из 'v1.2.3' -> '1.2.3').
     Возвращает объект packaging.version.Version или None.
     """
+    from packaging.version import InvalidVersion, Version
+
     ver_str = tag.lstrip("v")
     try:
         return Version(ver_str)
@@ -37,11 +76,89 @@ def parse_version(tag: str) -> Optional[Version]:
         return None
 
 
-def check_for_updates() -> Dict[str, Any]:
+def _release_summary(release_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля релиза, которые нужны для ответа (в том же виде, что у GitHub)"""
+    asset = (release_info.get("assets") or [{}])[0]
+    return {
+        "tag_name": release_info.get("tag_name", ""),
+        "created_at": release_info.get("created_at"),
+        "html_url": release_info.get("html_url"),
+        "body": release_info.get("body", ""),
+        "assets": [{"browser_download_url": asset.get("browser_download_url")}],
+    }
+
+
+def _load_cache() -> Dict[str, Any]:
+    """Кэш с диска; ответ для другого адреса API не используется"""
+    try:
+        with open(UPDATE_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("url") != GITHUB_API_URL:
+        return {}
+    return cache
+
+
+def _get_cache() -> Dict[str, Any]:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = _load_cache()
+        return _cache
+
+
+def _save_cache(cache: Dict[str, Any]):
+    global _cache
+    with _cache_lock:
+        _cache = cache
+    try:
+        data = json.dumps(cache, ensure_ascii=False).encode("utf-8")
+        write_file_atomic(UPDATE_CACHE_FILE, data)
+    except OSError as e:
+        logger.warning("Error writing update cache %s: %s", UPDATE_CACHE_FILE, e)
+
+
+def _is_fresh(cache: Dict[str, Any]) -> bool:
+    checked_at = cache.get("checked_at") or 0
+    return bool(cache.get("release")) and 0 <= time.time() - checked_at < UPDATE_CHECK_TTL
+
+
+def refresh_update_cache(force: bool = False) -> Dict[str, Any]:
     """
-    Проверяет наличие обновлений.
-    Возвращает информацию о доступном релизе.
+    Обновляет кэш ответа о релизе, если он устарел (или force).
+    При ошибке сети остаётся прежний ответ, а время проверки не меняется —
+    следующий запуск спросит снова.
     """
+    cache = _get_cache()
+    if not force and _is_fresh(cache):
+        logger.info("Update check skipped: cached answer is fresh")
+        return cache
+
+    # ETag без сохранённого релиза бесполезен: на 304 нечего было бы показать
+    etag = cache.get("etag") if cache.get("release") else None
+    release_info, etag, not_modified = get_latest_release_info(etag)
+
+    if not_modified:
+        logger.info("Update check: release not modified")
+        cache = dict(cache, etag=etag, checked_at=time.time(), error=None)
+    elif release_info is not None:
+        cache = {
+            "url": GITHUB_API_URL,
+            "etag": etag,
+            "checked_at": time.time(),
+            "release": _release_summary(release_info),
+            "error": None,
+        }
+    else:
+        cache = dict(cache, url=GITHUB_API_URL, error="Failed to get release information")
+
+    _save_cache(cache)
+    return cache
+
+
+def _build_result(cache: Dict[str, Any]) -> Dict[str, Any]:
+    """Ответ для фронтенда из сохранённого релиза и текущей версии"""
     current = APP_VERSION
     result = {
         "has_update": False,  # есть ли обновление
@@ -51,12 +168,14 @@ def check_for_updates() -> Dict[str, Any]:
         "release_url": None,  # ссылка на релиз
         "download_url": None,  # ссылка на скачивание
         "release_notes": None,  # описание изменений
+        "checked_at": cache.get("checked_at"),  # время последней успешной проверки (Unix)
+        "pending": False,  # первая проверка ещё идёт, ответа пока нет
         "error": None,  # сообщение об ошибке, если что-то пошло не так
     }
 
-    release_info = get_latest_release_info()
-    if release_info is None:
-        result["error"] = "Failed to get release information"
+    release_info = cache.get("release")
+    if not release_info:
+        result["error"] = cache.get("error") or "Failed to get release information"
         return result
 
     tag = release_info.get("tag_name", "")
@@ -70,10 +189,6 @@ def check_for_updates() -> Dict[str, Any]:
         result["error"] = f"Not a valid version: '{current}'"
         return result
 
-    logger.info(
-        f"Check for updates: latest = {latest_ver_obj}, current = {current_ver_obj}"
-    )
-
     result["latest_version"] = str(latest_ver_obj)
     result["created_at"] = release_info.get("created_at")
     result["release_url"] = release_info.get("html_url")
@@ -88,6 +203,49 @@ def check_for_updates() -> Dict[str, Any]:
     return result
 
 
+def check_for_updates(force: bool = False) -> Dict[str, Any]:
+    """
+    Проверяет наличие обновлений (с сетью, если кэш устарел).
+    Возвращает информацию о доступном релизе.
+    """
+    result = _build_result(refresh_update_cache(force))
+    logger.info(
+        "Check for updates: latest = %s, current = %s",
+        result["latest_version"],
+        result["current_version"],
+    )
+    return result
+
+
+def get_update_info() -> Dict[str, Any]:
+    """
+    Сохранённый ответ о релизе без обращения к сети.
+    Пока фоновая проверка идёт и ответа ещё нет, "pending" равен True.
+    """
+    cache = _get_cache()
+    result = _build_result(cache)
+    if not cache.get("release") and _check_thread is not None and _check_thread.is_alive():
+        result["pending"] = True
+        result["error"] = None
+    return result
+
+
+def _run_update_check():
+    try:
+        check_for_updates()
+    except Exception as e:
+        logger.error("Error checking for updates: %s", e, exc_info=True)
+
+
+def start_update_check() -> threading.Thread:
+    """Запускает проверку обновлений в фоновом потоке (один раз за запуск)"""
+    global _check_thread
+    if _check_thread is None:
+        _check_thread = threading.Thread(target=_run_update_check, name="update-check", daemon=True)
+        _check_thread.start()
+    return _check_thread
+
+
 def perform_update(update_info: Dict[str, Any]) -> None:
     """
     Выполняет обновление.
@@ -95,7 +253,7 @@ def perform_update(update_info: Dict[str, Any]) -> None:
     url = update_info.get("release_url")
     if url:
         # Открываем ссылку на релиз в браузере
-        logger.info(f"Opening release page: {url}")
+        logger.info("Opening release page: %s", url)
         webbrowser.open(url)
     else:
         logger.info("URL for update not found")
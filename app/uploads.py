@@ -0,0 +1,163 @@
+# app/uploads.py
+
+"""
+Загрузка скриншотов по частям.
+
+Фронтенд отправляет файл кусками через begin_upload/upload_chunk/commit_upload.
+Байты сразу пишутся во временный файл в UPLOADS_DIR, поэтому в памяти
+одновременно находится не больше одной части. После commit_upload загрузка
+получает дескриптор вида "upload:<id>", который передаётся в add_game/update_game
+вместо data URL; PIL затем читает изображение прямо из временного файла.
+"""
+
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+from app.image_utils import detect_image_format
+from app.logger import get_logger
+from config import UPLOAD_MAX_SIZE, UPLOAD_TTL, UPLOADS_DIR
+
+logger = get_logger(__name__)
+
+HANDLE_PREFIX = "upload:"
+SIGNATURE_SIZE = 12  # байт, достаточных для detect_image_format
+
+
+class UploadError(ValueError):
+    """Ошибка загрузки: неизвестный дескриптор, превышен размер, неверный формат"""
+
+
+def is_upload_handle(value) -> bool:
+    """Строка — дескриптор завершённой загрузки, а не data URL"""
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+class _Upload:
+    __slots__ = ("path", "size", "header", "image_format", "committed", "started_at")
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.header = b""
+        self.image_format = None
+        self.committed = False
+        self.started_at = time.monotonic()
+
+
+class UploadStore:
+    """Незавершённые и завершённые загрузки текущего процесса"""
+
+    def __init__(self, directory=UPLOADS_DIR, max_size=UPLOAD_MAX_SIZE, ttl=UPLOAD_TTL):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._uploads = {}
+
+    def begin(self) -> str:
+        """Начинает загрузку и возвращает её id"""
+        self.cleanup()
+        os.makedirs(self.directory, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(str(self.directory), f"{upload_id}.part")
+        open(path, "wb").close()
+        with self._lock:
+            self._uploads[upload_id] = _Upload(path)
+        return upload_id
+
+    def _get(self, upload_id) -> _Upload:
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise UploadError(f"Unknown upload: {upload_id}")
+        return upload
+
+    def append(self, upload_id: str, chunk: bytes) -> int:
+        """Дописывает часть в файл загрузки и возвращает принятый размер"""
+        upload = self._get(upload_id)
+        if upload.committed:
+            raise UploadError(f"Upload {upload_id} is already committed")
+
+        if upload.size + len(chunk) > self.max_size:
+            self.discard(upload_id)
+            raise UploadError(f"Upload exceeds {self.max_size} bytes")
+
+        # Сигнатуру проверяем по первым байтам, не дожидаясь конца загрузки
+        if len(upload.header) < SIGNATURE_SIZE:
+            upload.header += chunk[: SIGNATURE_SIZE - len(upload.header)]
+            if len(upload.header) >= SIGNATURE_SIZE and not detect_image_format(upload.header):
+                self.discard(upload_id)
+                raise UploadError("Unknown image signature")
+
+        with open(upload.path, "ab") as f:
+            f.write(chunk)
+        upload.size += len(chunk)
+        return upload.size
+
+    def commit(self, upload_id: str, expected_size: Optional[int] = None) -> dict:
+        """Завершает загрузку: {"handle", "format", "size"}"""
+        upload = self._get(upload_id)
+        if expected_size is not None and upload.size != expected_size:
+            self.discard(upload_id)
+            raise UploadError(
+                f"Upload {upload_id} is incomplete: {upload.size} of {expected_size} bytes"
+            )
+
+        image_format = detect_image_format(upload.header)
+        if not image_format:
+            self.discard(upload_id)
+            raise UploadError("Unknown image signature")
+
+        upload.image_format = image_format
+        upload.committed = True
+        return {"handle": f"{HANDLE_PREFIX}{upload_id}", "format": image_format, "size": upload.size}
+
+    def path_for(self, handle: str) -> str:
+        """Путь к файлу завершённой загрузки по дескриптору"""
+        upload = self._get(handle[len(HANDLE_PREFIX):])
+        if not upload.committed:
+            raise UploadError(f"Upload {handle} is not committed")
+        return upload.path
+
+    def discard(self, upload_id_or_handle: str):
+        """Удаляет загрузку и её временный файл"""
+        upload_id = upload_id_or_handle
+        if is_upload_handle(upload_id):
+            upload_id = upload_id[len(HANDLE_PREFIX):]
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload and os.path.exists(upload.path):
+            try:
+                os.remove(upload.path)
+            except OSError as e:
+                logger.warning("Error deleting upload file %s: %s", upload.path, e)
+
+    def cleanup(self):
+        """Удаляет загрузки старше ttl и осиротевшие файлы от прошлых запусков"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                upload_id
+                for upload_id, upload in self._uploads.items()
+                if now - upload.started_at > self.ttl
+            ]
+            known = {upload.path for upload in self._uploads.values()}
+        for upload_id in expired:
+            self.discard(upload_id)
+
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(str(self.directory), name)
+            if path not in known and name.endswith(".part"):
+                try:
+                    if time.time() - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+upload_store = UploadStore()
@@ -0,0 +1,95 @@
+# app/wire_format.py
+
+"""
+Компактный формат списка игр для передачи во фронтенд.
+
+Обычный ответ — список словарей: имена полей повторяются в JSON у каждой игры.
+Компактный — заголовок с именами полей и по массиву значений на поле:
+
+    {
+        "format": "columns",
+        "fields": ["id", "title", ...],
+        "statuses": ["completed", "playing", ...],
+        "rows": 2,
+        "columns": [[1, 2], ["Half-Life", "Portal"], ...],
+    }
+
+Передаются только поля карточки списка, статус — индексом в "statuses",
+даты — секундами Unix (UTC) или null.
+"""
+
+from datetime import datetime, timezone
+
+from app.database import GAME_STATUSES
+
+WIRE_FORMAT = "columns"
+
+# Поля, которые нужны карточке, окну просмотра и форме редактирования
+CARD_FIELDS = (
+    "id",
+    "title",
+    "version",
+    "developer",
+    "review",
+    "game_link",
+    "rating",
+    "status",
+    "screenshot_url",
+    "screenshot_version",
+    "screenshot_placeholder",
+    "screenshot_state",
+    "created_at",
+    "updated_at",
+)
+TIMESTAMP_FIELDS = ("created_at", "updated_at")
+
+
+def to_epoch(value):
+    """Дата SQLite ('YYYY-MM-DD HH:MM:SS', UTC) или ISO-строка → секунды Unix; None, если не разобрать"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def encode_games(games: list[dict], fields=CARD_FIELDS) -> dict:
+    """Список подготовленных игр (_prepare_game) в колоночный формат"""
+    statuses = list(GAME_STATUSES)
+    codes = {status: code for code, status in enumerate(statuses)}
+    columns = []
+    for field in fields:
+        values = [game.get(field) for game in games]
+        if field == "status":
+            for index, status in enumerate(values):
+                code = codes.get(status)
+                if code is None:
+                    # Неизвестный статус не теряется: он добавляется в таблицу кодов
+                    code = codes[status] = len(statuses)
+                    statuses.append(status)
+                values[index] = code
+        elif field in TIMESTAMP_FIELDS:
+            values = [to_epoch(value) for value in values]
+        columns.append(values)
+    return {
+        "format": WIRE_FORMAT,
+        "fields": list(fields),
+        "statuses": statuses,
+        "rows": len(games),
+        "columns": columns,
+    }
+
+
+def decode_games(payload: dict) -> list[dict]:
+    """Обратное преобразование (как его делает фронтенд); даты остаются секундами Unix"""
+    fields = payload["fields"]
+    statuses = payload["statuses"]
+    games = [dict(zip(fields, row)) for row in zip(*payload["columns"])]
+    for game in games:
+        if "status" in game:
+            game["status"] = statuses[game["status"]]
+    return games
@@ -0,0 +1,9 @@
+# benchmarks/__init__.py
+
+"""
+Воспроизводимые бенчмарки GameList.
+
+Генерирует библиотеку заданного размера с фиксированным seed во временной
+папке и замеряет методы репозитория, функции API и обработку изображений.
+Результат — JSON с перцентилями задержек и пиковым RSS (python -m benchmarks).
+"""
@@ -0,0 +1,206 @@
+# benchmarks/__main__.py
+"""
+Запуск бенчмарков.
+
+Пример:
+    python -m benchmarks run --size 10000 --output results.json
+    python -m benchmarks run --sizes 1000 10000 100000 --output results.json
+    python -m benchmarks compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GROUPS = ("repo", "api", "image", "backup")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_size(args) -> dict:
+    """
+    Один прогон на библиотеке размера args.size в отдельной рабочей папке.
+    Пути в config.py относительные (data/, app.log), поэтому переходим в папку
+    до импорта модулей приложения.
+    """
+    workdir = args.workdir or tempfile.mkdtemp(prefix="gamelist-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    if os.path.exists(os.path.join(workdir, "data")):
+        raise SystemExit(f"Work directory {workdir} already contains data/, use an empty one")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    import logging
+
+    from app.logger import get_logger  # настраивает логирование приложения
+
+    get_logger()
+    logging.getLogger().setLevel(args.log_level)
+
+    from app.database import db, init_db
+    from app.image_utils import ensure_dirs, screenshot_jobs
+    from benchmarks import cases
+    from benchmarks.generator import generate_library
+    from benchmarks.harness import Runner, peak_rss_kb
+
+    ensure_dirs()
+    init_db()
+
+    started = time.perf_counter()
+    library = generate_library(args.size, args.seed, args.screenshots)
+    generation_seconds = time.perf_counter() - started
+    print(
+        f"Generated {library['games']} games, {library['screenshots']} screenshots "
+        f"in {generation_seconds:.1f}s ({workdir})",
+        file=sys.stderr,
+    )
+
+    runner = Runner(scale=args.scale, only=args.only)
+    ctx = cases.Context(library, args.seed, workdir)
+    for group in args.groups:
+        getattr(cases, f"{'repository' if group == 'repo' else group}_cases")(runner, ctx)
+    screenshot_jobs.wait()
+    db.close_all()
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "size": args.size,
+            "seed": args.seed,
+            "screenshots": library["screenshots"],
+            "scale": args.scale,
+            "log_level": args.log_level,
+            "generation_seconds": round(generation_seconds, 3),
+            "peak_rss_kb": peak_rss_kb(),
+            "workdir": workdir if args.keep else None,
+            "skipped": runner.skipped,
+        },
+        "results": runner.results,
+    }
+
+    if not args.keep and not args.workdir:
+        import shutil
+
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def run_sizes(args) -> dict:
+    """Прогон по каждому размеру в отдельном процессе: пиковый RSS не смешивается"""
+    reports = []
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            output = tmp.name
+        command = [
+            sys.executable, "-m", "benchmarks", "run",
+            "--size", str(size),
+            "--seed", str(args.seed),
+            "--screenshots", str(args.screenshots),
+            "--scale", str(args.scale),
+            "--log-level", args.log_level,
+            "--groups", *args.groups,
+            "--output", output,
+        ]
+        if args.only:
+            command += ["--only", *args.only]
+        if args.keep:
+            command.append("--keep")
+        subprocess.run(command, cwd=REPO_ROOT, check=True)
+        with open(output, encoding="utf-8") as f:
+            reports.append(json.load(f))
+        os.remove(output)
+    return {"runs": reports}
+
+
+def _iter_results(report: dict):
+    for run in report.get("runs", [report]):
+        size = run["meta"]["size"]
+        for result in run["results"]:
+            yield (size, result["group"], result["name"]), result
+
+
+def cmd_run(args) -> int:
+    # run_size меняет текущую папку — путь отчёта разрешаем заранее
+    output = os.path.abspath(args.output) if args.output else None
+    report = run_sizes(args) if args.sizes else run_size(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+def cmd_compare(args) -> int:
+    """Сравнивает p50 двух отчётов: изменение в процентах по общим случаям"""
+    with open(args.before, encoding="utf-8") as f:
+        before = dict(_iter_results(json.load(f)))
+    with open(args.after, encoding="utf-8") as f:
+        after = dict(_iter_results(json.load(f)))
+
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key][args.metric], after[key][args.metric]
+        change = (new - old) / old * 100 if old else 0.0
+        size, group, name = key
+        print(f"{size:>7} {group:>6} {name:<48} {old:>10.3f} → {new:>10.3f} ms  {change:+7.1f}%")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="GameList benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Generate a library and run the benchmark cases")
+    run.add_argument("--size", type=int, default=1000, help="Games in the generated library")
+    run.add_argument("--sizes", type=int, nargs="+", help="Run each size in its own process")
+    run.add_argument("--seed", type=int, default=42, help="Generator seed")
+    run.add_argument("--screenshots", type=int, default=50, help="Games that get a screenshot")
+    run.add_argument("--scale", type=float, default=1.0, help="Multiplier for iteration counts")
+    run.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS), help="Case groups to run")
+    run.add_argument("--only", nargs="+", help="Run only cases whose group.name contains one of these")
+    run.add_argument("--log-level", default="WARNING", help="Application log level during the run")
+    run.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    run.add_argument("--workdir", help="Work directory (default: a new temporary one)")
+    run.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    run.set_defaults(func=cmd_run)
+
+    compare = subparsers.add_parser("compare", help="Compare two JSON reports")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--metric", default="p50_ms", help="Metric to compare (default: p50_ms)")
+    compare.set_defaults(func=cmd_compare)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
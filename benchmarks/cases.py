@@ -0,0 +1,516 @@
+# benchmarks/cases.py
+
+"""
+Случаи бенчмарка: методы GameRepository, функции API (@eel.expose и маршрут
+скриншотов), конвейер изображений и резервные копии.
+
+Чтения замеряются до записей, чтобы записи не меняли набор данных под ними.
+Записи по возможности возвращают базу к исходному размеру (добавленное
+удаляется в setup следующей итерации или после случая).
+"""
+
+import base64
+import io
+import json
+import os
+import random
+import shutil
+import threading
+
+import bottle
+from PIL import Image
+
+from app import api
+from app.backup import create_backup
+from app.batch_reencode import reencode_screenshots
+from app.database import GameRepository, db
+from app.image_utils import (
+    ENCODING_PROFILES,
+    backfill_derivatives,
+    build_derivatives,
+    detect_image_format,
+    list_screenshot_files,
+    read_placeholder,
+    save_screenshot,
+    save_screenshot_bytes,
+    save_screenshot_file,
+    screenshot_jobs,
+    screenshot_version,
+    validate_image_format,
+)
+from app.wire_format import decode_games
+from benchmarks.generator import DEVELOPERS, make_game, make_image_bytes
+from config import BACKUP_DIR
+
+SEARCH_TERMS = ("dark", "ведьмак", "knight souls", "отличный", "cd projekt", "zzzz")
+# Ввод названия по буквам, как его видит проверка дубликатов
+SIMILAR_TITLE_INPUTS = ("da", "dark", "dark so", "dark souls", "темна", "knight dragon", "zzzz")
+DEVELOPER_INPUTS = ("cd", "cd pro", "fr", "ubi", "сн", "zz")
+FILTER_DEVELOPERS = tuple(developer for developer in DEVELOPERS if developer)
+
+
+class Context:
+    """Общие данные случаев: сгенерированная библиотека и генератор"""
+
+    def __init__(self, library: dict, seed: int, workdir: str):
+        self.rng = random.Random(seed + 1)
+        self.game_ids = library["game_ids"]
+        self.workdir = workdir
+        self.repo = GameRepository()
+        with db as conn:
+            self.screenshot_ids = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM games WHERE screenshot_path != '' ORDER BY id"
+                )
+            ]
+            self.screenshot_paths = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT DISTINCT screenshot_path FROM games WHERE screenshot_path != ''"
+                )
+            ]
+
+    def game_id(self, i: int) -> int:
+        return self.game_ids[i % len(self.game_ids)]
+
+    def screenshot_id(self, i: int) -> int:
+        return self.screenshot_ids[i % len(self.screenshot_ids)]
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.workdir, name)
+
+
+def _data_url(image_bytes: bytes, mime: str = "image/jpeg") -> str:
+    return f"data:{mime};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+
+
+def _deep_cursor(repo: GameRepository, sort: str, pages: int, limit: int = 50):
+    """Курсор страницы номер pages (или последней доступной)"""
+    cursor = None
+    for _ in range(pages):
+        _, next_cursor = repo.query_games(sort=sort, cursor=cursor, limit=limit)
+        if not next_cursor:
+            break
+        cursor = next_cursor
+    return cursor
+
+
+def repository_cases(runner, ctx: Context):
+    repo = ctx.repo
+    size = len(ctx.game_ids)
+    group = "repo"
+
+    # Чтения
+    runner.measure(group, "get_all_games", lambda i: repo.get_all_games(), iterations=10)
+    runner.measure(group, "get_revision", lambda i: repo.get_revision(), iterations=500)
+    revision = repo.get_revision()
+    runner.measure(
+        group, "get_changes_since.current", lambda i: repo.get_changes_since(revision), iterations=200
+    )
+    runner.measure(
+        group, "get_changes_since.zero", lambda i: repo.get_changes_since(0), iterations=10
+    )
+
+    for sort in ("status", "added-desc", "title-asc", "rating-desc"):
+        runner.measure(
+            group, f"query_games.first_page.{sort}", lambda i, s=sort: repo.query_games(sort=s), iterations=100
+        )
+    deep = _deep_cursor(repo, "added-desc", max(1, size // 50 // 2))
+    runner.measure(
+        group, "query_games.deep_page", lambda i: repo.query_games(sort="added-desc", cursor=deep), iterations=100
+    )
+    runner.measure(
+        group, "query_games.status_filter", lambda i: repo.query_games(status="dropped"), iterations=100
+    )
+    runner.measure(
+        group,
+        "query_games.substring_filter",
+        lambda i: repo.query_games(search=SEARCH_TERMS[i % len(SEARCH_TERMS)]),
+        iterations=50,
+    )
+    runner.measure(
+        group,
+        "query_games.developer_filter",
+        lambda i: repo.query_games(developer=FILTER_DEVELOPERS[i % len(FILTER_DEVELOPERS)]),
+        iterations=50,
+    )
+    runner.measure(
+        group,
+        "search_games",
+        lambda i: repo.search_games(SEARCH_TERMS[i % len(SEARCH_TERMS)]),
+        iterations=100,
+    )
+    runner.measure(
+        group,
+        "search_game_ids",
+        lambda i: repo.search_game_ids(SEARCH_TERMS[i % len(SEARCH_TERMS)]),
+        iterations=100,
+    )
+    runner.measure(
+        group,
+        "find_similar_titles",
+        lambda i: repo.find_similar_titles(SIMILAR_TITLE_INPUTS[i % len(SIMILAR_TITLE_INPUTS)]),
+        iterations=100,
+    )
+    runner.measure(
+        group, "iter_games", lambda i: sum(1 for _ in repo.iter_games()), iterations=5
+    )
+    runner.measure(group, "get_game_by_id", lambda i: repo.get_game_by_id(ctx.game_id(i * 7919)), iterations=500)
+    runner.measure(
+        group, "get_screenshot_path", lambda i: repo.get_screenshot_path(ctx.game_id(i * 7919)), iterations=500
+    )
+    runner.measure(group, "get_statistics", lambda i: repo.get_statistics(), iterations=500)
+    runner.measure(group, "count_statistics", lambda i: repo.count_statistics(), iterations=20)
+    runner.measure(group, "verify_statistics", lambda i: repo.verify_statistics(), iterations=20)
+    runner.measure(group, "find_screenshot", lambda i: repo.find_screenshot("0" * 64), iterations=500)
+    if ctx.screenshot_paths:
+        runner.measure(
+            group,
+            "get_screenshot_refs",
+            lambda i: repo.get_screenshot_refs(ctx.screenshot_paths[i % len(ctx.screenshot_paths)]),
+            iterations=500,
+        )
+    else:
+        runner.skip(group, "get_screenshot_refs", "library has no screenshots")
+
+    # Записи
+    added = []
+    runner.measure(group, "add_game", lambda i: added.append(repo.add_game(make_game(ctx.rng))), iterations=200)
+    batch = [make_game(ctx.rng) for _ in range(100)]
+    runner.measure(group, "add_games.100", lambda i: added.extend(repo.add_games(batch)), iterations=10)
+    runner.measure(
+        group,
+        "update_game",
+        lambda i: repo.update_game(ctx.game_id(i), make_game(ctx.rng), repo.get_screenshot_path(ctx.game_id(i))),
+        iterations=200,
+    )
+    runner.measure(
+        group, "delete_game", lambda i: added and repo.delete_game(added.pop()), iterations=100
+    )
+    for game_id in added:
+        repo.delete_game(game_id)
+
+    runner.measure(
+        group, "set_screenshot_state", lambda i: repo.set_screenshot_state(ctx.game_id(i), ""), iterations=200
+    )
+    if ctx.screenshot_ids:
+        runner.measure(
+            group,
+            "finish_screenshot",
+            lambda i: repo.finish_screenshot(
+                ctx.screenshot_id(i), "pending:bench", repo.get_screenshot_path(ctx.screenshot_id(i))
+            ),
+            setup=lambda i: repo.set_screenshot_state(ctx.screenshot_id(i), "pending:bench"),
+            iterations=200,
+        )
+        runner.measure(
+            group,
+            "update_screenshot_path",
+            lambda i: repo.update_screenshot_path(
+                ctx.screenshot_id(i), repo.get_screenshot_path(ctx.screenshot_id(i))
+            ),
+            iterations=200,
+        )
+    else:
+        runner.skip(group, "finish_screenshot", "library has no screenshots")
+        runner.skip(group, "update_screenshot_path", "library has no screenshots")
+    runner.measure(group, "fail_pending_screenshots", lambda i: repo.fail_pending_screenshots(), iterations=20)
+    runner.measure(
+        group,
+        "register_screenshot",
+        lambda i: repo.register_screenshot(f"{i % 10**6:064x}", f"bench/{i % 10**6}.webp"),
+        iterations=200,
+    )
+    runner.measure(
+        group, "forget_screenshot", lambda i: repo.forget_screenshot(f"bench/{i % 10**6}.webp"), iterations=200
+    )
+    with db as conn:
+        conn.execute("DELETE FROM screenshots WHERE path LIKE 'bench/%'")
+
+
+def _bind_request(path: str):
+    """Привязывает запрос bottle к окружению, как при обращении из браузера"""
+    bottle.request.bind({"REQUEST_METHOD": "GET", "PATH_INFO": path, "wsgi.input": io.BytesIO()})
+
+
+def _serve(game_id: int, variant: str):
+    response = api.serve_screenshot(game_id, variant)
+    body = getattr(response, "body", None)
+    if hasattr(body, "close"):
+        body.close()
+    return response
+
+
+def api_cases(runner, ctx: Context):
+    group = "api"
+    repo = ctx.repo
+
+    runner.measure(group, "get_version", lambda i: api.get_version(), iterations=500)
+    runner.measure(group, "log_frontend", lambda i: api.log_frontend("debug", "benchmark"), iterations=500)
+    runner.measure(
+        group,
+        "load_games.cold",
+        lambda i: api.load_games(),
+        setup=lambda i: api.library_snapshot.invalidate(),
+        iterations=10,
+    )
+    runner.measure(group, "load_games.warm", lambda i: api.load_games(), iterations=200)
+    runner.measure(
+        group,
+        "load_games.compact.cold",
+        lambda i: api.load_games(compact=True),
+        setup=lambda i: api.library_snapshot.invalidate(),
+        iterations=10,
+    )
+    runner.measure(group, "load_games.compact.warm", lambda i: api.load_games(compact=True), iterations=200)
+
+    # Размер и (де)сериализация ответа в обоих форматах. Eel отправляет ответ через
+    # json.dumps(..., default=lambda o: None); разбор — json.loads и, для колонок,
+    # сборка объектов, как в decodeGames на фронтенде
+    payloads = {"dicts": api.load_games(), "columns": api.load_games(compact=True)}
+    for fmt, payload in payloads.items():
+        message = json.dumps(payload, default=lambda o: None)
+        decode = decode_games if fmt == "columns" else (lambda games: games)
+        runner.measure(
+            group,
+            f"wire.serialize.{fmt}",
+            lambda i, p=payload: json.dumps(p, default=lambda o: None),
+            iterations=50,
+            bytes=len(message.encode("utf-8")),
+        )
+        runner.measure(
+            group,
+            f"wire.parse.{fmt}",
+            lambda i, m=message, d=decode: d(json.loads(m)),
+            iterations=50,
+            bytes=len(message.encode("utf-8")),
+        )
+    revision = repo.get_revision()
+    runner.measure(
+        group, "load_games_since.current", lambda i: api.load_games_since(revision), iterations=200
+    )
+    runner.measure(group, "load_games_since.full", lambda i: api.load_games_since(), iterations=50)
+    runner.measure(group, "query_games.first_page", lambda i: api.query_games(), iterations=100)
+    runner.measure(
+        group,
+        "query_games.filtered",
+        lambda i: api.query_games({"status": "completed", "search": SEARCH_TERMS[i % len(SEARCH_TERMS)]}, "rating-desc"),
+        iterations=50,
+    )
+    runner.measure(
+        group,
+        "search_games",
+        lambda i: api.search_games(SEARCH_TERMS[i % len(SEARCH_TERMS)]),
+        iterations=100,
+    )
+    runner.measure(
+        group,
+        "suggest_developers",
+        lambda i: api.suggest_developers(DEVELOPER_INPUTS[i % len(DEVELOPER_INPUTS)]),
+        iterations=100,
+    )
+    runner.measure(
+        group,
+        "find_similar_titles",
+        lambda i: api.find_similar_titles(SIMILAR_TITLE_INPUTS[i % len(SIMILAR_TITLE_INPUTS)]),
+        iterations=100,
+    )
+    runner.measure(group, "get_statistics", lambda i: api.get_statistics(), iterations=500)
+    runner.measure(group, "get_screenshot_job", lambda i: api.get_screenshot_job("missing"), iterations=500)
+
+    if ctx.screenshot_ids:
+        for variant in ("thumb", "full"):
+            runner.measure(
+                group,
+                f"serve_screenshot.{variant}",
+                lambda i, v=variant: _serve(ctx.screenshot_id(i), v),
+                setup=lambda i, v=variant: _bind_request(f"/screenshots/{ctx.screenshot_id(i)}/{v}"),
+                iterations=200,
+            )
+    else:
+        runner.skip(group, "serve_screenshot", "library has no screenshots")
+
+    # Загрузка по частям: 1080p JPEG, части по UPLOAD_CHUNK_SIZE
+    upload_bytes = make_image_bytes(ctx.rng, 1920, 1080, "JPEG")
+    chunk_size = api.UPLOAD_CHUNK_SIZE
+    chunks = [
+        base64.b64encode(upload_bytes[offset : offset + chunk_size]).decode("ascii")
+        for offset in range(0, len(upload_bytes), chunk_size)
+    ]
+
+    def upload_round_trip(i):
+        upload_id = api.begin_upload()["upload_id"]
+        for chunk in chunks:
+            api.upload_chunk(upload_id, chunk)
+        handle = api.commit_upload(upload_id, len(upload_bytes))["handle"]
+        api.cancel_upload(handle)
+
+    runner.measure(group, "upload_round_trip", upload_round_trip, iterations=20, payload_bytes=len(upload_bytes))
+
+    # Записи; фоновые задания скриншотов дожидаемся вне замера
+    data_url = _data_url(make_image_bytes(ctx.rng, 1280, 720, "JPEG"))
+    before = set(ctx.game_ids)
+
+    runner.measure(
+        group,
+        "add_game.with_screenshot",
+        lambda i: api.add_game(make_game(ctx.rng), data_url),
+        setup=lambda i: screenshot_jobs.wait(),
+        iterations=20,
+    )
+    screenshot_jobs.wait()
+    runner.measure(group, "add_game", lambda i: api.add_game(make_game(ctx.rng)), iterations=100)
+    runner.measure(
+        group,
+        "update_game",
+        lambda i: api.update_game(ctx.game_id(i), make_game(ctx.rng)),
+        iterations=100,
+    )
+
+    with db as conn:
+        added = [row[0] for row in conn.execute("SELECT id FROM games") if row[0] not in before]
+    runner.measure(
+        group, "delete_game", lambda i: added and api.delete_game(added.pop()), iterations=100
+    )
+    for game_id in added:
+        api.delete_game(game_id)
+
+    for fmt in ("jsonl", "csv"):
+        runner.measure(
+            group,
+            f"export_library.{fmt}",
+            lambda i, f=fmt: api.export_library(ctx.path(f"export.{f}")),
+            iterations=3,
+        )
+    runner.measure(
+        group,
+        "export_library.zip",
+        lambda i: api.export_library(ctx.path("export.zip"), include_screenshots=True),
+        iterations=3,
+    )
+
+    def import_then_trim(i):
+        api.import_library(ctx.path("export.jsonl"))
+
+    def trim(i):
+        # Удаляем импортированное, чтобы каждая итерация импортировала в ту же базу
+        with db.transaction(immediate=True) as conn:
+            conn.execute("DELETE FROM games WHERE id > ?", (max(ctx.game_ids),))
+
+    runner.measure(group, "import_library.jsonl", import_then_trim, setup=trim, iterations=3)
+    trim(0)
+
+    # Отдаёт сохранённый ответ; сама проверка с сетью идёт в фоновом потоке приложения
+    runner.measure(group, "check_updates", lambda i: api.check_updates())
+    runner.skip(group, "update_app", "downloads and replaces the running executable")
+
+
+def image_cases(runner, ctx: Context):
+    group = "image"
+    sources = {
+        "png_1080p": make_image_bytes(ctx.rng, 1920, 1080, "PNG"),
+        "jpeg_4k": make_image_bytes(ctx.rng, 3840, 2160, "JPEG"),
+    }
+    jpeg_url = _data_url(sources["jpeg_4k"])
+
+    runner.measure(group, "detect_image_format", lambda i: detect_image_format(sources["jpeg_4k"][:12]), iterations=1000)
+    runner.measure(group, "validate_image_format", lambda i: validate_image_format(jpeg_url), iterations=1000)
+
+    for source_name, source in sources.items():
+        for profile in ENCODING_PROFILES:
+
+            def derive(i, data=source, p=profile):
+                with Image.open(io.BytesIO(data)) as image:
+                    return build_derivatives(image, profile=p)
+
+            runner.measure(
+                group,
+                f"build_derivatives.{source_name}.{profile}",
+                derive,
+                iterations=5,
+                max_seconds=10,
+                source_bytes=len(source),
+            )
+
+    # Новые изображения каждый раз (сохранение с нуля) и одно и то же (повтор по хэшу)
+    fresh = [_data_url(make_image_bytes(ctx.rng, 1920, 1080, "JPEG")) for _ in range(max(2, int(5 * runner.scale)) + 1)]
+    runner.measure(
+        group, "save_screenshot.fresh", lambda i: save_screenshot(fresh[i + 1], 0, "bench"), iterations=5, max_seconds=10
+    )
+    runner.measure(group, "save_screenshot.reuse", lambda i: save_screenshot(fresh[0], 0, "bench"), iterations=50)
+
+    source_file = ctx.path("source.jpg")
+    with open(source_file, "wb") as f:
+        f.write(sources["jpeg_4k"])
+    runner.measure(group, "save_screenshot_file.reuse", lambda i: save_screenshot_file(source_file, 0, "bench"), iterations=50)
+    runner.measure(
+        group, "save_screenshot_bytes.reuse", lambda i: save_screenshot_bytes(sources["png_1080p"], 0, "bench"), iterations=50
+    )
+
+    if ctx.screenshot_paths:
+        paths = ctx.screenshot_paths
+        runner.measure(group, "read_placeholder", lambda i: read_placeholder(paths[i % len(paths)]), iterations=500)
+        runner.measure(group, "screenshot_version", lambda i: screenshot_version(paths[i % len(paths)]), iterations=1000)
+    else:
+        runner.skip(group, "read_placeholder", "library has no screenshots")
+        runner.skip(group, "screenshot_version", "library has no screenshots")
+
+    # Пакетные обходы на актуальном дереве — стоимость проверки, без кодирования
+    files = len(list_screenshot_files())
+    runner.measure(group, "backfill_derivatives.up_to_date", lambda i: backfill_derivatives(), iterations=5, files=files)
+    reencode_screenshots(workers=1)
+    runner.measure(
+        group, "reencode_screenshots.up_to_date", lambda i: reencode_screenshots(workers=1), iterations=5, files=files
+    )
+
+
+def backup_cases(runner, ctx: Context):
+    group = "backup"
+    stats = {}
+
+    def backup(i):
+        stats.update(create_backup()["stats"])
+
+    # Полная копия: перед каждой итерацией прошлых копий нет
+    result = runner.measure(
+        group,
+        "backup.full",
+        backup,
+        iterations=3,
+        max_seconds=30,
+        setup=lambda i: shutil.rmtree(BACKUP_DIR, ignore_errors=True),
+    )
+    if result:
+        result.update(stats)
+    # Повторная копия без изменений: скриншоты — ссылки на файлы прошлой копии
+    result = runner.measure(group, "backup.incremental", backup, iterations=3, max_seconds=30)
+    if result:
+        result.update(stats)
+
+    # Запись из UI во время копии: задержка update_game, пока в фоне идут копии подряд
+    done = threading.Event()
+    backups = []
+
+    def run_backups():
+        while not done.is_set():
+            backups.append(create_backup()["stats"])
+
+    if runner.selected(group, "update_game.during_backup"):
+        worker = threading.Thread(target=run_backups, daemon=True)
+        worker.start()
+        result = runner.measure(
+            group,
+            "update_game.during_backup",
+            lambda i: ctx.repo.update_game(
+                ctx.game_id(i), make_game(ctx.rng), ctx.repo.get_screenshot_path(ctx.game_id(i))
+            ),
+            iterations=200,
+            max_seconds=10,
+        )
+        done.set()
+        worker.join()
+        if result:
+            result["backups"] = len(backups)
+            result["db_restarts"] = sum(item["db_restarts"] for item in backups)
+    shutil.rmtree(BACKUP_DIR, ignore_errors=True)
@@ -0,0 +1,132 @@
+# benchmarks/generator.py
+
+"""
+Генератор синтетической библиотеки для бенчмарков.
+
+Одинаковый seed даёт одинаковую библиотеку: названия, разработчики (латиница
+и кириллица), отзывы, даты и скриншоты разных размеров. Пишет в текущую
+рабочую папку (DATA_DIR из config.py), поэтому запускается из временной папки.
+"""
+
+import io
+import random
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+from app.database import GAME_STATUSES, GameRepository
+from app.image_utils import ensure_dirs, save_screenshot_bytes
+from config import IMPORT_CHUNK_SIZE
+
+TITLE_WORDS = (
+    "Shadow", "Legend", "Dark", "Souls", "Night", "City", "Star", "Hollow",
+    "Knight", "Dragon", "Age", "Empire", "Lost", "Kingdom", "Space", "Dead",
+    "Red", "Cyber", "Punk", "Iron", "Blood", "Forest", "Ocean", "Crown",
+    "Metro", "Exodus", "Stalker", "Pathfinder", "Wrath", "Frontier",
+    "Ведьмак", "Атомное", "Сердце", "Тёмная", "Башня", "Мор", "Утопия",
+    "Чёрная", "Книга", "Смута", "Полдень", "Ледяной", "Край", "Зов",
+)
+TITLE_SUFFIXES = (
+    "", "", "", " II", " III", " 2", " Remastered", ": Definitive Edition",
+    ": Директорская версия", " — Дополнение", " Origins", " Reloaded",
+)
+DEVELOPERS = (
+    "CD Projekt Red", "FromSoftware", "Larian Studios", "Ubisoft Montreal",
+    "Bethesda Game Studios", "Obsidian Entertainment", "Supergiant Games",
+    "Team Cherry", "Remedy Entertainment", "Arkane Studios", "4A Games",
+    "GSC Game World", "Owlcat Games", "Mundfish", "Ice-Pick Lodge",
+    "Cyberia Nova", "Pixonic", "Студия Кайдзю", "Снежные Хатки",
+    "Мягкий Ёж", "Северный Ветер", "Игровая Лаборатория", "",
+)
+REVIEW_SENTENCES = (
+    "Отличный сюжет и атмосфера.",
+    "Боевая система быстро надоедает.",
+    "Прошёл на одном дыхании, рекомендую.",
+    "Музыка великолепна, особенно в финале.",
+    "Слишком много гринда во второй половине.",
+    "Great level design and tight controls.",
+    "The story drags in the middle but the ending is worth it.",
+    "Performance issues on release, mostly fixed now.",
+    "Co-op with friends is the best part.",
+    "Не зашло, бросил после пары часов.",
+)
+
+# Размеры скриншотов: от маленьких до 4K, как при вставке из буфера обмена
+SCREENSHOT_SIZES = ((640, 360), (1280, 720), (1600, 900), (1920, 1080), (2560, 1440), (3840, 2160))
+
+START_DATE = datetime(2020, 1, 1)
+
+
+def make_title(rng: random.Random) -> str:
+    words = rng.sample(TITLE_WORDS, rng.randint(1, 3))
+    return " ".join(words) + rng.choice(TITLE_SUFFIXES)
+
+
+def make_review(rng: random.Random) -> str:
+    if rng.random() < 0.3:
+        return ""
+    return " ".join(rng.choices(REVIEW_SENTENCES, k=rng.randint(1, 6)))
+
+
+def make_game(rng: random.Random) -> dict:
+    """Одна синтетическая игра в формате GameRepository.add_games"""
+    created = START_DATE + timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60))
+    updated = created + timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+    status = rng.choices(GAME_STATUSES, weights=(40, 10, 40, 10))[0]
+    return {
+        "title": make_title(rng),
+        "version": rng.choice(("", "1.0", "1.2.3", "v2.1", "GOTY")),
+        "status": status,
+        "rating": round(rng.uniform(1, 10), 1) if status != "planned" else 0,
+        "review": make_review(rng),
+        "game_link": f"https://store.example.com/app/{rng.randint(1000, 999999)}" if rng.random() < 0.6 else "",
+        "developer": rng.choice(DEVELOPERS),
+        "created_at": created.strftime("%Y-%m-%d %H:%M:%S"),
+        "updated_at": updated.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def make_image(rng: random.Random, width: int, height: int) -> Image.Image:
+    """
+    Детерминированное изображение, похожее на скриншот: плавные пятна цвета
+    (случайная мозаика, увеличенная бикубически), а не несжимаемый шум
+    """
+    cells = (max(2, width // 32), max(2, height // 32))
+    mosaic = Image.frombytes("RGB", cells, rng.randbytes(cells[0] * cells[1] * 3))
+    return mosaic.resize((width, height), Image.Resampling.BICUBIC)
+
+
+def make_image_bytes(rng: random.Random, width: int, height: int, fmt: str = "JPEG") -> bytes:
+    """make_image, закодированное в JPEG или PNG"""
+    output = io.BytesIO()
+    options = {"quality": 92} if fmt == "JPEG" else {}
+    make_image(rng, width, height).save(output, format=fmt, **options)
+    return output.getvalue()
+
+
+def generate_library(size: int, seed: int = 42, screenshots: int = 50) -> dict:
+    """
+    Заполняет пустую базу size играми, screenshots из них получают скриншот.
+    Возвращает {"games", "screenshots", "game_ids"}.
+    """
+    rng = random.Random(seed)
+    ensure_dirs()
+    repo = GameRepository()
+
+    game_ids = []
+    remaining = size
+    while remaining > 0:
+        chunk = [make_game(rng) for _ in range(min(IMPORT_CHUNK_SIZE, remaining))]
+        game_ids.extend(repo.add_games(chunk))
+        remaining -= len(chunk)
+
+    saved = 0
+    for game_id in rng.sample(game_ids, min(screenshots, len(game_ids))):
+        width, height = rng.choice(SCREENSHOT_SIZES)
+        image_bytes = make_image_bytes(rng, width, height, rng.choice(("JPEG", "PNG")))
+        screenshot_path = save_screenshot_bytes(image_bytes, game_id, "")
+        if screenshot_path:
+            repo.update_screenshot_path(game_id, screenshot_path)
+            saved += 1
+
+    return {"games": len(game_ids), "screenshots": saved, "game_ids": game_ids}
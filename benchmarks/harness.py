@@ -0,0 +1,155 @@
+# benchmarks/harness.py
+
+"""
+Замер задержек и памяти.
+
+measure() вызывает функцию несколько раз (не дольше max_seconds) и считает
+перцентили; подготовка (setup) в замер не входит. Пиковый RSS процесса
+берётся из ОС после каждого случая, поэтому прирост пика показывает, какой
+случай впервые поднял потребление памяти.
+"""
+
+import gc
+import statistics
+import sys
+import time
+from typing import Callable, Optional
+
+
+def peak_rss_kb() -> int:
+    """Пиковый RSS процесса в КБ (0, если ОС его не сообщает)"""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb
+        ):
+            return 0
+        return counters.PeakWorkingSetSize // 1024
+
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS сообщает байты, Linux — килобайты
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Перцентиль с линейной интерполяцией по отсортированному списку"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples: list) -> dict:
+    """Сводка по замерам в секундах: перцентили и среднее в миллисекундах"""
+    ordered = sorted(samples)
+    ms = 1000.0
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50) * ms, 4),
+        "p90_ms": round(percentile(ordered, 0.90) * ms, 4),
+        "p99_ms": round(percentile(ordered, 0.99) * ms, 4),
+        "mean_ms": round(statistics.fmean(ordered) * ms, 4) if ordered else 0.0,
+        "min_ms": round(ordered[0] * ms, 4) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * ms, 4) if ordered else 0.0,
+    }
+
+
+class Runner:
+    """Выполняет случаи и копит результаты для JSON-отчёта"""
+
+    def __init__(self, scale: float = 1.0, only: Optional[list] = None, verbose: bool = True):
+        self.scale = scale
+        self.only = only
+        self.verbose = verbose
+        self.results = []
+        self.skipped = []
+
+    def selected(self, group: str, name: str) -> bool:
+        if not self.only:
+            return True
+        full_name = f"{group}.{name}"
+        return any(pattern in full_name for pattern in self.only)
+
+    def skip(self, group: str, name: str, reason: str):
+        """Отмечает случай, который не замеряется, с причиной"""
+        self.skipped.append({"group": group, "name": name, "reason": reason})
+
+    def measure(
+        self,
+        group: str,
+        name: str,
+        fn: Callable[[int], object],
+        iterations: int = 50,
+        max_seconds: float = 5.0,
+        setup: Optional[Callable[[int], object]] = None,
+        warmup: int = 1,
+        **extra,
+    ) -> Optional[dict]:
+        """
+        Замеряет fn(i) до iterations раз или пока не пройдёт max_seconds.
+        setup(i) выполняется перед каждым вызовом вне замера; прогрев идёт с i < 0.
+        Дополнительные именованные аргументы попадают в отчёт как есть.
+        """
+        if not self.selected(group, name):
+            return None
+
+        iterations = max(1, int(iterations * self.scale))
+        for i in range(min(warmup, iterations)):
+            if setup:
+                setup(-1 - i)
+            fn(-1 - i)
+
+        rss_before = peak_rss_kb()
+        samples = []
+        gc.collect()
+        deadline = time.perf_counter() + max_seconds
+        for i in range(iterations):
+            if setup:
+                setup(i)
+            started = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - started)
+            if time.perf_counter() > deadline:
+                break
+
+        peak = peak_rss_kb()
+        result = {
+            "group": group,
+            "name": name,
+            **summarize(samples),
+            "peak_rss_kb": peak,
+            "peak_rss_growth_kb": peak - rss_before,
+            **extra,
+        }
+        self.results.append(result)
+        if self.verbose:
+            print(
+                f"{group:>6} {name:<48} p50 {result['p50_ms']:>10.3f} ms  "
+                f"p99 {result['p99_ms']:>10.3f} ms  n={result['iterations']:<4} "
+                f"rss {peak // 1024} MB",
+                file=sys.stderr,
+            )
+        return result
@@ -0,0 +1,206 @@
+# cli.py
+"""
+Служебные команды для обслуживания библиотеки без запуска интерфейса.
+
+Пример:
+    python cli.py backfill-thumbnails
+    python cli.py reencode --workers 4
+    python cli.py export library.zip --screenshots
+    python cli.py import backlog.csv
+    python cli.py backup
+    python cli.py restore 20240101-120000
+"""
+
+import argparse
+import multiprocessing
+import sys
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def cmd_backfill_thumbnails(args) -> int:
+    """Строит миниатюры и заглушки для существующих скриншотов"""
+    from app.image_utils import backfill_derivatives, ensure_dirs
+
+    ensure_dirs()
+    result = backfill_derivatives(force=args.force)
+    print(
+        f"Processed: {result['processed']}, "
+        f"skipped: {result['skipped']}, failed: {result['failed']}"
+    )
+    return 1 if result["failed"] else 0
+
+
+def cmd_reencode(args) -> int:
+    """Перекодирует скриншоты под текущие настройки сжатия"""
+    from app.batch_reencode import reencode_screenshots
+    from app.image_utils import ensure_dirs
+
+    def report(progress):
+        done = progress["processed"] + progress["failed"]
+        print(
+            f"\r{done} done, {progress['images_per_second']:.1f} images/s, "
+            f"{progress['bytes_saved'] / 1024:.0f} KB saved",
+            end="",
+            flush=True,
+        )
+
+    ensure_dirs()
+    result = reencode_screenshots(
+        profile=args.profile, workers=args.workers, force=args.force, progress=report
+    )
+    if result["processed"] or result["failed"]:
+        print()
+    print(
+        f"Processed: {result['processed']}, skipped: {result['skipped']}, "
+        f"kept: {result['kept']}, failed: {result['failed']}, saved: {result['bytes_saved']} bytes "
+        f"in {result['elapsed']:.1f}s"
+    )
+    return 1 if result["failed"] else 0
+
+
+def _init_storage():
+    from app.database import init_db
+    from app.image_utils import ensure_dirs
+
+    ensure_dirs()
+    init_db()
+
+
+def cmd_export(args) -> int:
+    """Экспортирует библиотеку в файл"""
+    from app.library_io import export_library
+
+    _init_storage()
+    result = export_library(args.path, args.format, args.screenshots)
+    print(f"Exported: {result['exported']} games, {result['screenshots']} screenshots")
+    return 0
+
+
+def cmd_import(args) -> int:
+    """Импортирует игры из файла"""
+    from app.library_io import import_library
+
+    _init_storage()
+    result = import_library(args.path, args.format)
+    print(
+        f"Imported: {result['imported']} games, {result['screenshots']} screenshots, "
+        f"skipped: {result['skipped']}"
+    )
+    return 0
+
+
+def cmd_backup(args) -> int:
+    """Создаёт резервную копию базы и скриншотов"""
+    from app.backup import create_backup
+
+    _init_storage()
+    result = create_backup()
+    stats = result["stats"]
+    print(
+        f"Backup {result['name']}: {stats['files']} files "
+        f"({stats['files_copied']} copied, {stats['files_linked']} linked), "
+        f"{stats['bytes_written']} bytes written in {stats['duration_s']:.1f}s"
+    )
+    return 0
+
+
+def cmd_list_backups(args) -> int:
+    """Выводит сохранённые резервные копии"""
+    from app.backup import list_backups, pending_restore
+
+    pending = pending_restore()
+    for backup in list_backups():
+        mark = " (restore scheduled)" if backup["name"] == pending else ""
+        print(f"{backup['name']}  {backup['created_at']} UTC  {backup['files']} files{mark}")
+    return 0
+
+
+def cmd_restore(args) -> int:
+    """Планирует восстановление копии при следующем запуске"""
+    from app.backup import schedule_restore
+
+    schedule_restore(args.name)
+    print(f"Backup {args.name} will be restored on the next start")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создает парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="GameList maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser(
+        "backfill-thumbnails",
+        help="Build thumbnails and placeholders for existing screenshots",
+    )
+    backfill.add_argument(
+        "--force", action="store_true", help="Rebuild even if derivatives exist"
+    )
+    backfill.set_defaults(func=cmd_backfill_thumbnails)
+
+    reencode = subparsers.add_parser(
+        "reencode",
+        help="Re-encode screenshots with the current compression settings",
+        description=(
+            "Re-encode screenshots with the current compression settings. Re-encoding "
+            "decodes the already lossy WebP, so every pass loses some quality: files are "
+            "only re-encoded when the new quality, width or byte budget is stricter. "
+            "Raising the quality cannot restore lost detail and is skipped."
+        ),
+    )
+    reencode.add_argument(
+        "--profile",
+        choices=["fast", "balanced", "max-compression"],
+        help="Encoding profile (default: IMAGE_PROFILE from config.py)",
+    )
+    reencode.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )
+    reencode.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-encode every file, even at target settings or when it only adds generation loss",
+    )
+    reencode.set_defaults(func=cmd_reencode)
+
+    export = subparsers.add_parser("export", help="Export the library to .jsonl, .csv or .zip")
+    export.add_argument("path", help="Output file")
+    export.add_argument("--format", choices=["jsonl", "csv", "zip"], help="Override format detection")
+    export.add_argument(
+        "--screenshots", action="store_true", help="Bundle screenshots (.zip only)"
+    )
+    export.set_defaults(func=cmd_export)
+
+    import_ = subparsers.add_parser("import", help="Import games from .jsonl, .csv or .zip")
+    import_.add_argument("path", help="Input file")
+    import_.add_argument("--format", choices=["jsonl", "csv", "zip"], help="Override format detection")
+    import_.set_defaults(func=cmd_import)
+
+    backup = subparsers.add_parser("backup", help="Back up the database and screenshots")
+    backup.set_defaults(func=cmd_backup)
+
+    list_backups = subparsers.add_parser("list-backups", help="List saved backups")
+    list_backups.set_defaults(func=cmd_list_backups)
+
+    restore = subparsers.add_parser("restore", help="Restore a backup on the next start")
+    restore.add_argument("name", help="Backup name (see list-backups)")
+    restore.set_defaults(func=cmd_restore)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
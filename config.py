@@ -2,6 +2,7 @@
 """
 Конфигурационный файл приложения.
 """
+import os
 from pathlib import Path
 
 # Конфигурация приложения GameList
@@ -21,20 +22,75 @@ BUILD_CONFIG = {
 DATA_DIR = Path("data")
 DB_FILE = DATA_DIR / "app.db"
 SCREENSHOTS_DIR = DATA_DIR / "screenshots"
+UPLOADS_DIR = DATA_DIR / "uploads"  # временные файлы загружаемых скриншотов
 
 # Настройки базы данных
 DB_TIMEOUT = 5  # таймаут подключения к БД (секунды)
+DB_CACHE_SIZE_KB = 16 * 1024  # размер кэша страниц SQLite на соединение (КБ)
+DB_MMAP_SIZE = 256 * 1024 * 1024  # объём файла БД, читаемый через mmap (байты)
+IMPORT_CHUNK_SIZE = 500  # игр в одной транзакции при импорте библиотеки
+BACKFILL_CHUNK_SIZE = 500  # строк в одной транзакции при заполнении данных миграцией
+BACKFILL_PAUSE = 0.05  # пауза между частями заполнения, чтобы пропустить запись из UI (секунды)
+TOMBSTONE_KEEP = 1000  # сколько последних удалений хранит лента изменений (более старые ревизии — полная загрузка)
 
 # Настройки оптимизации изображений
 IMAGE_MAX_WIDTH = 1920
 IMAGE_QUALITY = 85
+IMAGE_PROFILE = "balanced"  # профиль кодирования WebP: fast, balanced или max-compression
+IMAGE_BYTE_BUDGET = 0  # целевой размер полноразмерного скриншота (байты), 0 — без ограничения
+IMAGE_MIN_QUALITY = 50  # нижняя граница качества при подборе под IMAGE_BYTE_BUDGET
+IMAGE_THUMB_WIDTH = 320  # ширина миниатюры для карточки в списке (x2 для HiDPI)
+IMAGE_THUMB_QUALITY = 80
+IMAGE_PLACEHOLDER_WIDTH = 24  # ширина крошечной заглушки, пока грузится миниатюра
+IMAGE_PLACEHOLDER_QUALITY = 40
+
+# Настройки фоновой обработки скриншотов
+SCREENSHOT_WORKERS = 1  # потоков, кодирующих скриншоты
+SCREENSHOT_QUEUE_SIZE = 8  # заданий в очереди; при переполнении скриншот обрабатывается сразу
+SCREENSHOT_JOB_RETRIES = 2  # повторов после неудачной попытки
+
+# Настройки резервных копий (база онлайн через sqlite3 backup + скриншоты)
+BACKUP_DIR = DATA_DIR / "backups"
+BACKUP_INTERVAL = 24 * 60 * 60  # копия при запуске, если последняя старше (секунды); 0 — выключено
+BACKUP_KEEP = 7  # сколько последних копий хранить
+BACKUP_PAGES_PER_STEP = 256  # страниц БД за один шаг копирования
+BACKUP_STEP_PAUSE = 0.005  # пауза между шагами, чтобы запись из UI не ждала (секунды)
+BACKUP_MAX_RESTARTS = 3  # перезапусков из-за записи в БД, после которых база копируется одним шагом
+BACKUP_STALE_AFTER = 10 * 60  # незаконченная копия без отметки дольше (секунды) считается брошенной
+RESTORE_MARKER = DATA_DIR / "restore.json"  # копия, которую нужно восстановить при следующем запуске
+
+# Уведомления фронтенда: изменения за интервал объединяются в одно событие (секунды)
+PUSH_INTERVAL = 0.2
+
+# Настройки загрузки скриншотов по частям
+UPLOAD_CHUNK_SIZE = 256 * 1024  # размер одной части (байты, до base64)
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024  # максимальный размер загружаемого файла (байты)
+UPLOAD_TTL = 60 * 60  # через сколько секунд незавершённая загрузка удаляется
 
 # Настройки проверки порта
 PORT_START = 8000
 PORT_RANGE = 25  # количество портов для проверки
 
-# Настройки репозитория
-GITHUB_API_URL = "https://api.github.com/repos/lergvot/GameList/releases/latest"
+# Настройки репозитория и проверки обновлений
+# Адрес API переопределяется переменной окружения (например, локальным сервером-заглушкой)
+GITHUB_API_URL = os.environ.get(
+    "GAMELIST_GITHUB_API_URL", "https://api.github.com/repos/lergvot/GameList/releases/latest"
+)
+UPDATE_CACHE_FILE = DATA_DIR / "update_check.json"  # последний ответ о релизе и его ETag
+UPDATE_CHECK_TTL = 6 * 60 * 60  # как долго ответ считается свежим и сеть не запрашивается (секунды)
+UPDATE_CHECK_TIMEOUT = 5  # таймаут запроса к GitHub (секунды)
+
+# Метрики вызовов API и медленных запросов (включаются переменной окружения GAMELIST_METRICS=1)
+METRICS_ENABLED = os.environ.get("GAMELIST_METRICS", "") not in ("", "0")
+METRICS_DUMP_FILE = os.environ.get("GAMELIST_METRICS_DUMP", "")  # файл снимка метрик при выходе
+SLOW_QUERY_MS = 100  # запросы SQLite дольше порога (мс) пишутся в лог
 
 # Настройки логирования
+LOG_FILE = "app.log"
+LOG_LEVEL = "INFO"
+LOG_ROTATION = "size"  # "size" — по LOG_MAX_BYTES, "time" — по LOG_ROTATE_WHEN, "" — без ротации
+LOG_MAX_BYTES = 5 * 1024 * 1024  # размер файла лога, после которого он ротируется (байты)
+LOG_ROTATE_WHEN = "midnight"  # интервал ротации по времени (см. TimedRotatingFileHandler)
+LOG_BACKUP_COUNT = 5  # сколько старых файлов лога хранить
+LOG_COMPRESS = True  # сжимать старые файлы лога в .gz
 LOG_SEPARATOR = "─" * 60 # Разделителя для логов
\ No newline at end of file
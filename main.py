@@ -1,26 +1,45 @@
 # main.py
 
-import socket
 import sys
+import time
 
-import eel
-
-from app.api import *
-from app.database import init_db
-from app.image_utils import ensure_dirs
-from app.logger import get_logger
-from config import (
-    APP_NAME,
-    APP_VERSION,
-    PORT_RANGE,
-    PORT_START,
-    WINDOW_POSITION,
-    WINDOW_SIZE,
-    LOG_SEPARATOR,
-)
+# Отсчёт времени запуска и замер импортов начинаются до тяжёлых импортов
+STARTED = time.perf_counter()
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+
+from app.startup import ImportTimer, StartupProfile
+
+import_timer = ImportTimer.install() if PROFILE_STARTUP else None
+profile = StartupProfile(STARTED, import_timer)
+
+with profile.phase("import modules"):
+    import socket
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import eel
+
+    from app.api import *
+    from app.api import on_window_ready, start_notifier
+    from app.backup import apply_pending_restore, start_scheduled_backup
+    from app.database import init_db, start_backfills
+    from app.image_utils import ensure_dirs
+    from app.logger import get_logger
+    from app.updater import start_update_check
+    from config import (
+        APP_NAME,
+        APP_VERSION,
+        PORT_RANGE,
+        PORT_START,
+        WINDOW_POSITION,
+        WINDOW_SIZE,
+        LOG_SEPARATOR,
+    )
 
 logger = get_logger(__name__)
 
+JS_EXTENSIONS = [".js", ".html"]  # файлы фронтенда, в которых ищутся вызовы eel.expose
+
 
 def check_port(start_port: int = PORT_START, num_ports: int = PORT_RANGE) -> int:
     """Проверяет, что порт доступен и возвращает первый свободный порт (int)."""
@@ -31,11 +50,11 @@ def check_port(start_port: int = PORT_START, num_ports: int = PORT_RANGE) -> int
                 # Пытаемся привязаться к порту
                 s.bind(("localhost", port))
                 # Если успешно — порт свободен
-                logger.info(f"Port {port} is available.")
+                logger.info("Port %s is available.", port)
                 return port
             except OSError:
                 # Порт занят — пробуем следующий
-                logger.info(f"Port {port} is in use, trying next...")
+                logger.info("Port %s is in use, trying next...", port)
                 continue
 
     raise RuntimeError(
@@ -43,16 +62,79 @@ def check_port(start_port: int = PORT_START, num_ports: int = PORT_RANGE) -> int
     )
 
 
+def register_js_functions():
+    """
+    Разбирает файлы фронтенда и регистрирует функции, объявленные в них через
+    eel.expose. eel.init разбирает каждый файл медленной грамматикой pyparsing,
+    поэтому при запуске он вызывается без разбора, а этот вызов выполняется
+    в потоке после загрузки окна: функции JS нужны только уведомлениям фронтенда.
+    """
+    started = time.perf_counter()
+    eel.init("web", allowed_extensions=JS_EXTENSIONS)
+    logger.info("Frontend functions registered in %.2f s", time.perf_counter() - started)
+
+
+def prepare_storage():
+    """Создаёт папки данных, восстанавливает запланированную копию и применяет миграции БД"""
+    with profile.phase("ensure_dirs"):
+        ensure_dirs()
+    with profile.phase("restore backup"):
+        apply_pending_restore()
+    with profile.phase("init_db"):
+        init_db()
+
+
+def find_port() -> int:
+    with profile.phase("check_port"):
+        return check_port()
+
+
+def print_startup_profile():
+    """Выводит отчёт --profile-startup в консоль (если она есть) и в лог"""
+    for line in profile.report():
+        if sys.stdout is not None:
+            print(line)
+        logger.info(line)
+
+
+def after_window_ready():
+    """
+    Окно загрузилось и вызвало ready(): выводит отчёт о запуске (--profile-startup),
+    регистрирует функции фронтенда и запускает отложенные заполнения данных
+    миграций и плановую резервную копию.
+    """
+    if PROFILE_STARTUP:
+        profile.mark("window ready")
+        print_startup_profile()
+    threading.Thread(target=register_js_functions, name="eel-init", daemon=True).start()
+    start_backfills()
+    start_scheduled_backup()
+
+
 if __name__ == "__main__":
     try:
         logger.info(LOG_SEPARATOR)
         logger.info("Launching %s v%s...", APP_NAME, APP_VERSION)
-        eel.init("web")
-        ensure_dirs()
-        init_db()
-        free_port = check_port()
+
+        # Папки и миграции БД (SQLite отпускает GIL) и поиск порта идут в потоках
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup") as executor:
+            storage = executor.submit(prepare_storage)
+            port = executor.submit(find_port)
+            with profile.phase("eel.init"):
+                # Только папка фронтенда, без разбора файлов — см. register_js_functions
+                eel.init("web", allowed_extensions=[])
+            storage.result()
+            free_port = port.result()
+
+        # Кэш ответа о релизе лежит в папке данных, поэтому проверка — после её создания
+        start_update_check()
+        start_notifier()
         logger.info("Starting server on port %d", free_port)
         logger.info(LOG_SEPARATOR)
+        profile.mark("eel.start")
+        if PROFILE_STARTUP:
+            import_timer.uninstall()
+        on_window_ready(after_window_ready)
         eel.start(
             "index.html",
             size=WINDOW_SIZE,
@@ -0,0 +1,46 @@
+# tests/conftest.py
+
+"""
+Общие фикстуры тестов. Пути данных в config.py относительные (data/...),
+поэтому каждый тест работает во временной папке со своей базой.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db, init_db  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Временная рабочая папка с пустыми data/ и data/screenshots/"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "screenshots").mkdir(parents=True)
+    db.close_all()
+    yield tmp_path / "data"
+    db.close_all()
+
+
+@pytest.fixture
+def repo(data_dir):
+    """GameRepository над новой базой со всеми миграциями"""
+    from app.database import GameRepository
+
+    init_db()
+    return GameRepository()
+
+
+@pytest.fixture
+def png_bytes():
+    """Небольшое PNG-изображение"""
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 40, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,78 @@
+# tests/test_change_feed.py
+
+import sqlite3
+
+from app import api
+from app.database import db
+
+
+def test_changes_since_revision(repo):
+    kept = repo.add_game({"title": "Kept"})
+    removed = repo.add_game({"title": "Removed"})
+    revision = repo.get_revision()
+
+    repo.update_game(kept, {"title": "Kept 2"})
+    repo.delete_game(removed)
+    added = repo.add_game({"title": "Added"})
+
+    games, deleted = repo.get_changes_since(revision)
+    assert [g["id"] for g in games] == [kept, added]
+    assert deleted == [removed]
+    assert repo.get_changes_since(repo.get_revision()) == ([], [])
+
+
+def test_derived_title_norm_does_not_bump_the_revision(repo):
+    game_id = repo.add_game({"title": "A"})
+    revision = repo.get_revision()
+
+    with db as conn:
+        conn.execute("UPDATE games SET title_norm = 'x' WHERE id = ?", (game_id,))
+
+    assert repo.get_revision() == revision
+
+
+def test_pruned_tombstones_force_a_full_reload(repo):
+    ids = [repo.add_game({"title": f"G{i}"}) for i in range(5)]
+    before = repo.get_revision()
+    for game_id in ids[:3]:
+        repo.delete_game(game_id)
+
+    assert repo.prune_tombstones(keep=1) == 2
+    floor = repo.get_change_floor()
+    assert before < floor
+
+    assert api.load_games_since(before)["full"] is True
+    changes = api.load_games_since(floor)
+    assert changes["full"] is False and changes["deleted"] == [ids[2]]
+
+
+def test_pusher_reports_changes_once(repo):
+    pusher = api.ChangePusher()
+    assert pusher.poll() is None  # первый вызов только запоминает ревизию
+
+    game_id = repo.add_game({"title": "A", "status": "playing"})
+    event = pusher.poll()
+    assert event["games"]["columns"][0] == [game_id]
+    assert event["resync"] is False and event["stats"]["playing"] == 1
+    assert pusher.poll() is None
+
+
+def test_writes_from_another_process_are_noticed(repo):
+    from config import DB_FILE
+
+    snapshot = api.LibrarySnapshot()
+    pusher = api.ChangePusher()
+    repo.add_game({"title": "A"})
+    pusher.poll()
+    assert [g["title"] for g in snapshot.get(api._load_library)[1]] == ["A"]
+
+    # Отдельное соединение — как cli.py import, пока приложение открыто
+    other = sqlite3.connect(DB_FILE)
+    with other:
+        other.execute("INSERT INTO games (title) VALUES ('B')")
+    other.close()
+
+    assert sorted(g["title"] for g in snapshot.get(api._load_library)[1]) == ["A", "B"]
+    assert snapshot.stats()["misses"] == 2
+    event = pusher.poll()
+    assert event["resync"] is False and event["stats"]["total_games"] == 2
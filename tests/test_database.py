@@ -0,0 +1,91 @@
+# tests/test_database.py
+
+from app.database import db
+
+
+def _stats(repo):
+    stats = repo.get_statistics()
+    return stats["total_games"], stats["playing"], stats["completed"], stats["planned"]
+
+
+def test_game_stats_counters_follow_writes(repo):
+    first = repo.add_game({"title": "A", "status": "playing"})
+    repo.add_games([{"title": "B", "status": "completed"}, {"title": "C"}])
+    assert _stats(repo) == (3, 1, 1, 1)
+
+    repo.update_game(first, {"title": "A", "status": "completed"})
+    assert _stats(repo) == (3, 0, 2, 1)
+
+    repo.delete_game(first)
+    assert _stats(repo) == (2, 0, 1, 1)
+    assert repo.get_statistics() == repo.count_statistics()
+    assert repo.verify_statistics()
+
+
+def test_game_stats_counters_survive_null_status(repo):
+    with db as conn:
+        conn.execute("INSERT INTO games (title, status) VALUES ('Legacy', NULL)")
+    assert repo.get_statistics()["total_games"] == 1
+    assert repo.verify_statistics()
+
+
+def test_drifted_counters_are_rebuilt(repo):
+    repo.add_game({"title": "A", "status": "dropped"})
+    with db as conn:
+        conn.execute("UPDATE game_stats SET total_games = 42, dropped = 0")
+
+    assert not repo.verify_statistics()
+    assert repo.get_statistics() == repo.count_statistics()
+
+
+def test_screenshot_ref_counts_follow_game_rows(repo):
+    first = repo.add_game({"title": "A"})
+    second = repo.add_game({"title": "B"})
+    repo.register_screenshot("hash-1", "data/screenshots/one.webp")
+    repo.register_screenshot("hash-2", "data/screenshots/two.webp")
+
+    repo.update_screenshot_path(first, "data/screenshots/one.webp")
+    repo.update_screenshot_path(second, "data/screenshots/one.webp")
+    assert repo.get_screenshot_refs("data/screenshots/one.webp") == 2
+
+    repo.update_screenshot_path(second, "data/screenshots/two.webp")
+    assert repo.get_screenshot_refs("data/screenshots/one.webp") == 1
+    assert repo.get_screenshot_refs("data/screenshots/two.webp") == 1
+
+    repo.delete_game(first)
+    assert repo.get_screenshot_refs("data/screenshots/one.webp") == 0
+    assert repo.find_screenshot("hash-1") == "data/screenshots/one.webp"
+    assert repo.get_screenshot_refs("data/screenshots/missing.webp") is None
+
+
+def _developers(repo):
+    with db as conn:
+        return {
+            row["name"]: row["game_count"]
+            for row in conn.execute("SELECT name, game_count FROM developers")
+        }
+
+
+def test_developer_links_follow_game_writes(repo):
+    first = repo.add_game({"title": "A", "developer": "Valve, Id  Software"})
+    repo.add_game({"title": "B", "developer": "valve"})
+    assert _developers(repo) == {"Valve": 2, "Id Software": 1}
+
+    repo.update_game(first, {"title": "A", "developer": "Valve"})
+    assert _developers(repo) == {"Valve": 2}
+
+    repo.delete_game(first)
+    assert _developers(repo) == {"Valve": 1}
+    games, _ = repo.query_games(developer="VALVE")
+    assert [g["title"] for g in games] == ["B"]
+
+
+def test_developer_suggestions_use_the_last_name_after_a_comma(repo):
+    repo.add_game({"title": "A", "developer": "Valve, Id Software"})
+    repo.add_game({"title": "B", "developer": "Valve"})
+
+    assert repo.suggest_developers("va") == [{"developer": "Valve", "count": 2}]
+    assert repo.suggest_developers("v") == []
+    assert repo.suggest_developers("Valve, i") == []
+    assert [d["developer"] for d in repo.suggest_developers("Valve, id")] == ["Id Software"]
+    assert [d["developer"] for d in repo.suggest_developers("soft")] == ["Id Software"]
@@ -0,0 +1,40 @@
+# tests/test_library_io.py
+
+import zipfile
+
+from app.database import db
+from app.image_utils import save_screenshot_bytes
+from app.library_io import export_library, import_library
+
+
+def test_zip_round_trip_saves_screenshots_after_commit(repo, data_dir, png_bytes):
+    game_id = repo.add_game({"title": "Portal", "developer": "Valve", "status": "completed"})
+    repo.update_screenshot_path(game_id, save_screenshot_bytes(png_bytes, game_id, "Portal"))
+    archive = data_dir / "library.zip"
+    assert export_library(str(archive), include_screenshots=True)["screenshots"] == 1
+
+    result = import_library(str(archive))
+
+    assert (result["imported"], result["screenshots"]) == (1, 1)
+    with db as conn:
+        row = conn.execute(
+            "SELECT screenshot_path, screenshot_state FROM games WHERE id != ?", (game_id,)
+        ).fetchone()
+    assert row["screenshot_path"] and row["screenshot_state"] == ""
+
+
+def test_import_skips_unknown_statuses_and_missing_screenshots(repo, data_dir):
+    archive = data_dir / "library.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(
+            "games.jsonl",
+            '{"title": "A", "status": " Playing ", "screenshot": "screenshots/1.webp"}\n'
+            '{"title": "B", "status": "wishlist"}\n'
+            '{"title": "C"}\n',
+        )
+
+    result = import_library(str(archive))
+
+    assert result == {"imported": 2, "skipped": 1, "screenshots": 0}
+    assert repo.get_statistics()["playing"] == 1
+    assert repo.get_statistics()["planned"] == 1
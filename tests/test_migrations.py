@@ -0,0 +1,134 @@
+# tests/test_migrations.py
+
+from app import migrations
+from app.database import GameRepository, db, init_db
+from app.text import normalize_title
+
+OLD_GAMES = [
+    ("Ёжик в тумане", "Studio A, Studio B", "playing"),
+    ("Half-Life 2", "Valve", "completed"),
+    ("  The   Witcher ", "CD Projekt", "planned"),
+]
+
+
+def _populated_database(monkeypatch, version):
+    """База на схеме version с несколькими играми, записанными старым кодом"""
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:version])
+        patch.setattr(migrations, "LATEST_VERSION", version)
+        conn = db.connection()
+        migrations.run_migrations(conn)
+        conn.executemany(
+            "INSERT INTO games (title, developer, status) VALUES (?, ?, ?)", OLD_GAMES
+        )
+    return conn
+
+
+def test_upgrade_from_version_8_fills_title_index(data_dir, monkeypatch):
+    conn = _populated_database(monkeypatch, 8)
+
+    init_db()
+    migrations.run_backfills(conn, pause=0)
+
+    rows = conn.execute("SELECT title, title_norm FROM games ORDER BY id").fetchall()
+    assert [row["title_norm"] for row in rows] == [normalize_title(row["title"]) for row in rows]
+    found = conn.execute(
+        "SELECT rowid FROM games_title_trgm WHERE games_title_trgm MATCH ?", ('"witch"',)
+    ).fetchall()
+    assert [row[0] for row in found] == [3]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == migrations.LATEST_VERSION
+
+
+def test_upgraded_games_can_be_updated_and_deleted(data_dir, monkeypatch):
+    _populated_database(monkeypatch, 8)
+    init_db()
+    repo = GameRepository()
+
+    assert repo.update_game(1, {"title": "Ежик", "developer": "Studio A", "status": "dropped"})
+    assert repo.delete_game(2)
+
+    assert [g["title"] for g in repo.find_similar_titles("ежик")] == ["Ежик"]
+    assert [g["title"] for g in repo.find_similar_titles("witch")] == ["  The   Witcher "]
+    with db as conn:
+        # Ошибка, если индекс разошёлся с таблицей
+        conn.execute("INSERT INTO games_title_trgm(games_title_trgm) VALUES ('integrity-check')")
+
+
+def test_upgrade_from_version_8_links_developers(data_dir, monkeypatch):
+    _populated_database(monkeypatch, 8)
+    init_db()
+    repo = GameRepository()
+
+    assert [d["developer"] for d in repo.suggest_developers("stu")] == ["Studio A", "Studio B"]
+    stats = repo.get_statistics()
+    assert (stats["total_games"], stats["playing"], stats["completed"]) == (3, 1, 1)
+
+
+def test_repair_migration_rebuilds_index_left_by_deferred_backfill(data_dir, monkeypatch):
+    conn = _populated_database(monkeypatch, 11)
+    # Так базу оставляла миграция 9 с отложенным заполнением: title_norm пуст,
+    # индекс без строк, запись о незаконченном заполнении
+    conn.execute("UPDATE games SET title_norm = ''")
+    conn.execute("INSERT INTO games_title_trgm(games_title_trgm) VALUES ('delete-all')")
+    conn.execute("INSERT OR REPLACE INTO migration_backfills (version) VALUES (9)")
+
+    init_db()
+
+    assert conn.execute("SELECT count(*) FROM games WHERE title_norm = ''").fetchone()[0] == 0
+    assert migrations.pending_backfills(conn) == []
+    assert GameRepository().delete_game(1)
+
+
+def _add_test_column(conn):
+    conn.execute("ALTER TABLE games ADD COLUMN test TEXT NOT NULL DEFAULT ''")
+
+
+def _fill_test_column(conn, after_id, limit):
+    rows = conn.execute(
+        "SELECT id FROM games WHERE id > ? ORDER BY id LIMIT ?", (after_id or 0, limit)
+    ).fetchall()
+    conn.executemany("UPDATE games SET test = 'filled' WHERE id = ?", rows)
+    return (rows[-1][0], len(rows)) if rows else (None, 0)
+
+
+def test_deferred_backfill_resumes_where_it_stopped(repo, monkeypatch):
+    repo.add_games([{"title": f"G{i}"} for i in range(5)])
+    version = migrations.LATEST_VERSION + 1
+    migration = migrations.Migration(
+        version=version,
+        description="Fill test column",
+        up=_add_test_column,
+        backfill=migrations.Backfill(_fill_test_column, chunk_size=2, deferred=True),
+    )
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS, migration])
+    monkeypatch.setattr(migrations, "LATEST_VERSION", version)
+    conn = db.connection()
+
+    migrations.run_migrations(conn)
+    # Отложенное заполнение не мешает записать версию схемы
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == version
+
+    chunks = []
+    migrations.run_backfills(
+        conn, on_commit=lambda: chunks.append(1), pause=0, should_stop=lambda: len(chunks) >= 1
+    )
+    row = conn.execute(
+        "SELECT position, rows_done, finished_at FROM migration_backfills WHERE version = ?",
+        (version,),
+    ).fetchone()
+    assert (row["position"], row["rows_done"], row["finished_at"]) == (2, 2, None)
+
+    assert migrations.run_backfills(conn, pause=0) == 1
+    filled = conn.execute("SELECT count(*) FROM games WHERE test = 'filled'").fetchone()[0]
+    assert filled == 5
+    assert migrations.pending_backfills(conn) == []
+
+
+def test_up_to_date_schema_is_detected_from_user_version(repo):
+    conn = db.connection()
+    # Быстрый путь читает только PRAGMA user_version, таблица версий не нужна
+    conn.execute("DROP TABLE schema_version")
+
+    migrations.run_migrations(conn)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == migrations.LATEST_VERSION
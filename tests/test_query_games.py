@@ -0,0 +1,87 @@
+# tests/test_query_games.py
+
+import pytest
+
+from app.database import SORT_ORDERS
+
+STATUSES = ("playing", "completed", "planned", "dropped")
+
+
+@pytest.fixture
+def library(repo):
+    repo.add_games(
+        [
+            {
+                "title": f"Game {i % 7}",  # одинаковые названия проверяют связку с id
+                "status": STATUSES[i % 4],
+                "rating": i % 5,
+                "developer": "Studio Alpha" if i % 3 == 0 else "Beta",
+                "created_at": f"2024-01-{i % 28 + 1:02d} 12:00:00",
+            }
+            for i in range(60)
+        ]
+    )
+    return repo
+
+
+def _all_pages(repo, limit, **query):
+    ids, cursor, pages = [], None, 0
+    while True:
+        games, cursor = repo.query_games(cursor=cursor, limit=limit, **query)
+        ids.extend(g["id"] for g in games)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("sort", SORT_ORDERS)
+def test_pages_match_a_single_query(library, sort):
+    expected = [g["id"] for g in library.query_games(sort=sort, limit=500)[0]]
+    ids, pages = _all_pages(library, 7, sort=sort)
+
+    assert ids == expected
+    assert len(set(ids)) == 60
+    assert pages == 9
+
+
+@pytest.mark.parametrize("sort", ["status", "rating-desc", "title-asc"])
+def test_pages_with_filters(library, sort):
+    expected = [
+        g["id"]
+        for g in library.query_games(sort=sort, limit=500, status="playing", search="alpha")[0]
+    ]
+    ids, _ = _all_pages(library, 2, sort=sort, status="playing", search="alpha")
+
+    assert ids == expected and len(ids) == 5
+    for game_id in ids:
+        assert game_id % 12 == 1  # i % 4 == 0 и i % 3 == 0 (id = i + 1)
+
+
+def test_cursor_with_other_keys_is_rejected(library):
+    _, cursor = library.query_games(sort="status", limit=5)
+    with pytest.raises(ValueError):
+        library.query_games(sort="rating-desc", cursor=cursor)
+
+
+def test_title_sort_folds_cyrillic_case(repo):
+    repo.add_games([{"title": t} for t in ("яблоко", "Арбуз", "ёж", "Банан", "apple")])
+    games, _ = repo.query_games(sort="title-asc")
+
+    assert [g["title"] for g in games] == ["apple", "Арбуз", "Банан", "ёж", "яблоко"]
+
+
+def test_search_uses_full_text_index(repo):
+    repo.add_games(
+        [
+            {"title": "Ведьмак", "review": "Отличный сюжет"},
+            {"title": "Portal", "developer": "Valve"},
+            {"title": "Ёлка"},
+        ]
+    )
+
+    def titles(search):
+        return sorted(g["title"] for g in repo.query_games(search=search)[0])
+
+    assert titles("сюж") == ["Ведьмак"]
+    assert titles("valv") == ["Portal"]
+    assert titles("елк") == ["Ёлка"]
@@ -0,0 +1,130 @@
+# tests/test_screenshots.py
+
+import functools
+import os
+
+import pytest
+
+from app import api
+from app.database import db
+from app.image_utils import (
+    ScreenshotJob,
+    ScreenshotJobQueue,
+    delete_screenshot,
+    pending_state,
+    save_screenshot_bytes,
+)
+
+
+def _game_with_screenshot(repo, png_bytes, title):
+    game_id = repo.add_game({"title": title})
+    path = save_screenshot_bytes(png_bytes, game_id, title)
+    repo.update_screenshot_path(game_id, path)
+    return game_id, path
+
+
+def test_shared_screenshot_is_deleted_with_its_last_game(repo, png_bytes):
+    first, path = _game_with_screenshot(repo, png_bytes, "A")
+    second, same_path = _game_with_screenshot(repo, png_bytes, "B")
+    assert same_path == path
+    assert repo.get_screenshot_refs(path) == 2
+
+    assert api.delete_game(first)
+    assert os.path.exists(path) and repo.get_screenshot_refs(path) == 1
+
+    assert api.delete_game(second)
+    assert not os.path.exists(path) and repo.get_screenshot_refs(path) is None
+
+
+def test_update_game_releases_old_screenshot_after_commit(repo, png_bytes):
+    game_id, path = _game_with_screenshot(repo, png_bytes, "A")
+
+    assert api.update_game(game_id, {"title": "A"}, "")
+
+    assert repo.get_screenshot_path(game_id) in ("", None)
+    assert not os.path.exists(path)
+
+
+def test_delete_screenshot_refuses_to_run_inside_a_transaction(repo, png_bytes):
+    game_id, path = _game_with_screenshot(repo, png_bytes, "A")
+    with pytest.raises(RuntimeError):
+        with db.transaction(immediate=True):
+            repo.delete_game(game_id)
+            delete_screenshot(path, game_id)
+
+    # Откат вернул игру, файл на месте
+    assert repo.get_screenshot_path(game_id) == path
+    assert os.path.exists(path)
+
+
+def test_api_calls_must_start_outside_a_transaction(repo):
+    with db:
+        with pytest.raises(RuntimeError):
+            api.get_statistics()
+    assert api.get_statistics()["total_games"] == 0
+
+
+def test_identical_images_are_stored_once(repo, data_dir, png_bytes):
+    _, path = _game_with_screenshot(repo, png_bytes, "A")
+    _, again = _game_with_screenshot(repo, png_bytes, "B")
+
+    assert again == path
+    # <хэш>.webp плюс производные <хэш>.<вариант>.webp
+    full_files = [p.name for p in (data_dir / "screenshots").iterdir() if p.name.count(".") == 1]
+    assert full_files == [os.path.basename(path)]
+
+
+def test_job_result_is_dropped_when_the_game_was_deleted(repo, png_bytes):
+    game_id = repo.add_game({"title": "A"})
+    job = ScreenshotJob(
+        game_id, functools.partial(save_screenshot_bytes, png_bytes, game_id, "A", strict=True)
+    )
+    repo.set_screenshot_state(game_id, pending_state(job.job_id))
+    repo.delete_game(game_id)
+
+    jobs = ScreenshotJobQueue(workers=1)
+    jobs.submit(job)
+    jobs.wait()
+
+    assert job.state == "superseded"
+    assert not any(path.endswith(".webp") for path in os.listdir("data/screenshots"))
+
+
+def test_undecodable_image_fails_without_retries(repo):
+    game_id = repo.add_game({"title": "A"})
+    broken = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    job = ScreenshotJob(
+        game_id, functools.partial(save_screenshot_bytes, broken, game_id, "A", strict=True)
+    )
+    repo.set_screenshot_state(game_id, pending_state(job.job_id))
+
+    jobs = ScreenshotJobQueue(workers=1)
+    jobs.submit(job)
+    jobs.wait()
+
+    assert (job.state, job.attempts) == ("failed", 1)
+    assert job.error
+
+
+def test_ready_webp_is_stored_without_encoding_full(repo, monkeypatch):
+    import io
+
+    from PIL import Image
+
+    from app import image_utils
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (40, 200, 40)).save(buffer, format="WEBP")
+    webp = buffer.getvalue()
+
+    calls = []
+    encode = image_utils._encode_webp_within
+    monkeypatch.setattr(
+        image_utils, "_encode_webp_within", lambda *args: calls.append(args) or encode(*args)
+    )
+    path = save_screenshot_bytes(webp, repo.add_game({"title": "A"}), "A")
+
+    with open(path, "rb") as f:
+        assert f.read() == webp
+    assert os.path.exists(image_utils.derivative_path(path, "thumb"))
+    assert calls == []
@@ -0,0 +1,65 @@
+# tests/test_uploads.py
+
+import os
+
+import pytest
+
+from app.uploads import UploadError, UploadStore, is_upload_handle
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(directory=tmp_path / "uploads", max_size=1024, ttl=60)
+
+
+def test_chunks_are_joined_into_one_file(store, png_bytes):
+    upload_id = store.begin()
+    store.append(upload_id, png_bytes[:10])
+    assert store.append(upload_id, png_bytes[10:]) == len(png_bytes)
+
+    committed = store.commit(upload_id, len(png_bytes))
+
+    assert is_upload_handle(committed["handle"]) and committed["format"] == "png"
+    with open(store.path_for(committed["handle"]), "rb") as f:
+        assert f.read() == png_bytes
+
+
+def test_discard_removes_the_file(store, png_bytes):
+    upload_id = store.begin()
+    store.append(upload_id, png_bytes)
+    handle = store.commit(upload_id)["handle"]
+    path = store.path_for(handle)
+
+    store.discard(handle)
+
+    assert not os.path.exists(path)
+    with pytest.raises(UploadError):
+        store.path_for(handle)
+
+
+def test_unknown_signature_is_rejected_early(store):
+    upload_id = store.begin()
+    with pytest.raises(UploadError):
+        store.append(upload_id, b"not an image at all")
+    with pytest.raises(UploadError):
+        store.append(upload_id, b"more")
+
+
+def test_size_limits(store, png_bytes):
+    upload_id = store.begin()
+    store.append(upload_id, png_bytes)
+    with pytest.raises(UploadError):
+        store.commit(upload_id, len(png_bytes) + 1)
+
+    upload_id = store.begin()
+    with pytest.raises(UploadError):
+        store.append(upload_id, png_bytes[:12] + b"\x00" * 2000)
+
+
+def test_uncommitted_upload_has_no_path(store, png_bytes):
+    upload_id = store.begin()
+    store.append(upload_id, png_bytes)
+    with pytest.raises(UploadError):
+        store.path_for(f"upload:{upload_id}")
+    with pytest.raises(UploadError):
+        store.path_for("upload:unknown")
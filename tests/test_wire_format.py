@@ -0,0 +1,43 @@
+# tests/test_wire_format.py
+
+from app.wire_format import CARD_FIELDS, decode_games, encode_games, to_epoch
+
+
+def _game(game_id, status, **extra):
+    game = {field: "" for field in CARD_FIELDS}
+    game.update(id=game_id, title=f"Game {game_id}", status=status, rating=4.5)
+    game.update(created_at="2024-03-01 10:00:00", updated_at=None, review="лучшая")
+    game.update(extra)
+    return game
+
+
+def test_round_trip_keeps_card_fields():
+    games = [_game(1, "playing"), _game(2, "completed", screenshot_url="/screenshots/2/thumb?v=1")]
+
+    payload = encode_games(games)
+    decoded = decode_games(payload)
+
+    assert payload["rows"] == 2 and payload["fields"] == list(CARD_FIELDS)
+    for original, game in zip(games, decoded):
+        expected = dict(original, created_at=to_epoch(original["created_at"]))
+        assert game == expected
+
+
+def test_unknown_status_is_kept():
+    decoded = decode_games(encode_games([_game(1, "wishlist"), _game(2, "planned")]))
+    assert [g["status"] for g in decoded] == ["wishlist", "planned"]
+
+
+def test_extra_fields_are_not_sent():
+    payload = encode_games([_game(1, "planned", screenshot_path="data/screenshots/x.webp")])
+    assert "screenshot_path" not in payload["fields"]
+
+
+def test_empty_list():
+    assert decode_games(encode_games([])) == []
+
+
+def test_to_epoch():
+    assert to_epoch("1970-01-02 00:00:00") == 86400
+    assert to_epoch("1970-01-02T03:00:00+03:00") == 86400
+    assert to_epoch("not a date") is None and to_epoch(None) is None
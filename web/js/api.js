@@ -3,7 +3,93 @@ import { t } from "./localisation.js";
 
 export const api = {
   async loadGames() {
-    return (await eel.load_games()()) || [];
+    return decodeGames(await eel.load_games(true)());
+  },
+
+  /**
+   * Изменения библиотеки после ревизии клиента (null — вся библиотека)
+   * @param {number|null} revision
+   * @returns {Promise<{revision: number, full: boolean, games: Array, deleted: number[]}|null>}
+   */
+  async loadGamesSince(revision = null) {
+    const changes = await eel.load_games_since(revision, true)();
+    if (changes) changes.games = decodeGames(changes.games);
+    return changes;
+  },
+
+  /**
+   * Страница игр с фильтрацией и сортировкой на бэкенде
+   * @param {{status?: string, search?: string}} filter
+   * @param {string} sort - значение из #sort-select
+   * @param {string|null} cursor - next_cursor предыдущей страницы
+   * @param {number} limit
+   */
+  async queryGames(filter = {}, sort = "status", cursor = null, limit = 50) {
+    const page = await eel.query_games(filter, sort, cursor, limit)();
+    if (!page) return { games: [], next_cursor: null };
+    return { games: decodeGames(page.games), next_cursor: page.next_cursor };
+  },
+
+  /**
+   * Полнотекстовый поиск на бэкенде (название, разработчик, отзыв)
+   * @returns {Promise<Array<{id: number, title: string, developer: string, review: string}>>}
+   */
+  async searchGames(query, limit = 50) {
+    return (await eel.search_games(query, limit)()) || [];
+  },
+
+  /**
+   * id всех игр, найденных полнотекстовым поиском (без лимита)
+   * @returns {Promise<Array<number>>}
+   */
+  async searchGameIds(query) {
+    return (await eel.search_game_ids(query)()) || [];
+  },
+
+  /**
+   * Игры с похожим названием (поиск по индексу на бэкенде)
+   * @param {string} text
+   * @param {number|string|null} excludeId - id редактируемой игры
+   * @returns {Promise<Array<{id: number, title: string, status: string, match: string}>>}
+   */
+  async findSimilarTitles(text, excludeId = null, limit = 10) {
+    return (await eel.find_similar_titles(text, excludeId, limit)()) || [];
+  },
+
+  /**
+   * Подсказки разработчиков по началу имени (индекс на бэкенде)
+   * @returns {Promise<Array<{developer: string, count: number}>>}
+   */
+  async suggestDevelopers(prefix, limit = 10) {
+    return (await eel.suggest_developers(prefix, limit)()) || [];
+  },
+
+  /**
+   * Загружает файл скриншота на бэкенд по частям
+   * @param {File} file
+   * @returns {Promise<string>} дескриптор загрузки для addGame/updateGame
+   */
+  async uploadScreenshot(file) {
+    const begin = await eel.begin_upload()();
+    if (!begin || begin.error) throw new Error(begin?.error || "upload failed");
+
+    const { upload_id: uploadId, chunk_size: chunkSize } = begin;
+    try {
+      for (let offset = 0; offset < file.size; offset += chunkSize) {
+        const chunk = await blobToBase64(file.slice(offset, offset + chunkSize));
+        const result = await eel.upload_chunk(uploadId, chunk)();
+        if (!result || result.error) throw new Error(result?.error || "upload failed");
+      }
+
+      const committed = await eel.commit_upload(uploadId, file.size)();
+      if (!committed || committed.error) {
+        throw new Error(committed?.error || "upload failed");
+      }
+      return committed.handle;
+    } catch (err) {
+      await eel.cancel_upload(uploadId)();
+      throw err;
+    }
   },
 
   async addGame(payload, screenshot) {
@@ -22,6 +108,15 @@ export const api = {
     return await eel.get_statistics()();
   },
 
+  /** Сообщает бэкенду, что окно загрузилось (запускает фоновые задачи) */
+  notifyReady() {
+    try {
+      eel.ready();
+    } catch (error) {
+      console.error("Error notifying backend:", error);
+    }
+  },
+
   async getAppVersion() {
     try {
       return await eel.get_version()();
@@ -61,15 +156,50 @@ export function logToBackend(level, message) {
   }
 }
 
+/**
+ * Список игр из колоночного формата бэкенда (app/wire_format.py) в массив объектов.
+ * Статус приходит индексом в payload.statuses, даты — секундами Unix.
+ * @param {{format: string, fields: string[], statuses: string[], rows: number, columns: Array[]}|Array} payload
+ * @returns {Array<object>}
+ */
+export function decodeGames(payload) {
+  if (!payload) return [];
+  if (payload.format !== "columns") return payload;
+
+  const { fields, statuses, rows, columns } = payload;
+  const statusIndex = fields.indexOf("status");
+  const games = new Array(rows);
+  for (let row = 0; row < rows; row++) {
+    const game = {};
+    for (let field = 0; field < fields.length; field++) {
+      game[fields[field]] = columns[field][row];
+    }
+    games[row] = game;
+  }
+  if (statusIndex >= 0) {
+    for (const game of games) game.status = statuses[game.status];
+  }
+  return games;
+}
+
+/**
+ * Дата игры в миллисекундах: секунды Unix из компактного формата
+ * или строка SQLite ("YYYY-MM-DD HH:MM:SS", UTC) из обычного
+ * @returns {number} NaN, если дату не разобрать
+ */
+export function toTimestamp(value) {
+  if (value === null || value === undefined || value === "") return NaN;
+  if (typeof value === "number") return value * 1000;
+  return new Date(
+    value.includes(" ") ? value.replace(" ", "T") + "Z" : value,
+  ).getTime();
+}
+
 export function formatDateTime(dateString, returnOnlyDate = false) {
-  if (!dateString) return "—";
+  if (!dateString && dateString !== 0) return "—";
 
   try {
-    const date = new Date(
-      dateString.includes(" ")
-        ? dateString.replace(" ", "T") + "Z"
-        : dateString,
-    );
+    const date = new Date(toTimestamp(dateString));
 
     if (isNaN(date.getTime())) return "—";
 
@@ -103,6 +233,29 @@ export function statusClassFor(status) {
   return classes[status] || "";
 }
 
+/**
+ * Содержимое Blob в base64 (без префикса data URL)
+ * @param {Blob} blob
+ * @returns {Promise<string>}
+ */
+function blobToBase64(blob) {
+  return new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => resolve(reader.result.split(",", 2)[1] || "");
+    reader.onerror = () => reject(reader.error);
+    reader.readAsDataURL(blob);
+  });
+}
+
+/**
+ * Ссылка на полноразмерный скриншот (в списке приходит только миниатюра)
+ * @param {object} game - игра из loadGames
+ */
+export function screenshotFullUrl(game) {
+  if (!game?.screenshot_version) return "";
+  return `/screenshots/${game.id}?v=${game.screenshot_version}`;
+}
+
 export function escapeHtml(str) {
   if (!str) return "";
   return String(str)
@@ -118,125 +271,6 @@ export function sanitizeInput(str) {
   return String(str).replace(/[<>]/g, "");
 }
 
-export function findSimilarGames(gameName, allGames, currentGameId = null) {
-  const searchTerm = gameName.toLowerCase().trim();
-
-  if (searchTerm.length < 2) {
-    return [];
-  }
-
-  return allGames
-    .filter((game) => {
-      if (currentGameId && game.id == currentGameId) {
-        return false;
-      }
-
-      const gameNameLower = game.title
-        ? game.title.toLowerCase()
-        : game.name
-          ? game.name.toLowerCase()
-          : "";
-
-      if (gameNameLower === searchTerm) {
-        return true;
-      }
-
-      if (gameNameLower.startsWith(searchTerm)) {
-        return true;
-      }
-
-      const searchWords = searchTerm.split(/\s+/).filter((w) => w.length > 1);
-      const gameWords = gameNameLower.split(/\s+/);
-
-      if (searchWords.length > 0) {
-        const allSearchWordsFound = searchWords.every((searchWord) =>
-          gameWords.some((gameWord) => gameWord === searchWord),
-        );
-
-        if (allSearchWordsFound) {
-          return true;
-        }
-      }
-
-      if (searchTerm.length > 3) {
-        if (gameNameLower.includes(searchTerm)) {
-          return true;
-        }
-
-        if (searchWords.length > 0) {
-          const allWordsPartiallyFound = searchWords.every((searchWord) =>
-            gameNameLower.includes(searchWord),
-          );
-
-          return allWordsPartiallyFound;
-        }
-      }
-
-      return false;
-    })
-    .sort((a, b) => {
-      const aName = a.title
-        ? a.title.toLowerCase()
-        : a.name
-          ? a.name.toLowerCase()
-          : "";
-      const bName = b.title
-        ? b.title.toLowerCase()
-        : b.name
-          ? b.name.toLowerCase()
-          : "";
-
-      if (aName === searchTerm) return -1;
-      if (bName === searchTerm) return 1;
-
-      if (aName.startsWith(searchTerm)) return -1;
-      if (bName.startsWith(searchTerm)) return 1;
-
-      return aName.localeCompare(bName);
-    });
-}
-
-export function findSimilarDevelopers(searchTerm, allGames, currentGameId = null) {
-  if (!searchTerm || searchTerm.trim().length < 2) {
-    return [];
-  }
-
-  const term = searchTerm.toLowerCase().trim();
-
-  const developerMap = new Map();
-
-  allGames.forEach((game) => {
-    if (currentGameId && game.id == currentGameId) {
-      return;
-    }
-
-    const developer = game.developer;
-    if (!developer) return;
-
-    const developerLower = developer.toLowerCase();
-
-    if (developerLower.includes(term)) {
-      if (!developerMap.has(developer)) {
-        developerMap.set(developer, { developer, count: 0 });
-      }
-      developerMap.get(developer).count++;
-    }
-  });
-
-  return Array.from(developerMap.values()).sort((a, b) => {
-    const aLower = a.developer.toLowerCase();
-    const bLower = b.developer.toLowerCase();
-
-    if (aLower === term) return -1;
-    if (bLower === term) return 1;
-
-    if (aLower.startsWith(term)) return -1;
-    if (bLower.startsWith(term)) return 1;
-
-    return b.count - a.count || a.developer.localeCompare(b.developer);
-  });
-}
-
 export function getStatusText(status) {
   const statusMap = {
     playing: "status_playing_display",
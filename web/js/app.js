@@ -4,8 +4,18 @@ import locale, { t } from "./localisation.js";
 import { ThemeManager } from "./theme.js";
 import ui from "./ui.js";
 
+// Как часто спрашивать результат проверки обновлений, пока она идёт в фоне (мс)
+const UPDATE_PENDING_RETRY_MS = 2000;
+// Сколько игр подгружать за раз; фильтр и сортировка считаются на бэкенде
+const PAGE_SIZE = 50;
+// Наибольший limit, который принимает query_games
+const QUERY_MAX_LIMIT = 500;
+
 const state = {
-  allGames: [],
+  games: [],
+  nextCursor: null,
+  queryToken: 0,
+  isLoadingMore: false,
   currentFilter: "all",
   currentSearch: "",
   selectedToDelete: null,
@@ -25,7 +35,8 @@ window.app = {
   openForm: (game = null) => ui.openForm(state, game),
   openConfirmModal: (gameId) => ui.openConfirmModal(state, gameId),
   loadAndRender: () => loadAndRender(state),
-  filterAndDisplay: () => filterAndDisplay(state),
+  reloadGames: () => reloadGames(state),
+  loadMoreGames: () => loadMoreGames(state),
   showDuplicatePopup: (searchText, currentGameId = null) =>
     ui.showDuplicatePopup(state, searchText, currentGameId),
   hideDuplicatePopup: ui.hideDuplicatePopup,
@@ -44,11 +55,13 @@ window.app = {
 };
 
 document.addEventListener("DOMContentLoaded", async () => {
+  api.notifyReady();
   try {
     state.currentLang = await locale.init();
 
     initializeThemeManager();
     ui.setupEventHandlers(state);
+    ui.watchListEnd(() => loadMoreGames(state));
     await loadAndRender(state);
     await updateAppVersion();
   } catch (error) {
@@ -80,9 +93,8 @@ async function loadAndRender(state) {
   showAppOverlay();
 
   try {
-    state.allGames = await api.loadGames();
-    ui.updateStats(await api.getStatistics());
-    filterAndDisplay(state);
+    const [stats] = await Promise.all([api.getStatistics(), reloadGames(state, true)]);
+    ui.updateStats(stats);
   } catch (error) {
     console.error("Error loading data:", error);
     logToBackend("error", `Data load error: ${error.message || error}`);
@@ -92,9 +104,91 @@ async function loadAndRender(state) {
   }
 }
 
-function filterAndDisplay(state) {
-  ui.filterAndDisplay(state);
+function currentQuery(state) {
+  return { status: state.currentFilter, search: state.currentSearch };
+}
+
+/**
+ * Перечитывает список с первой страницы под текущие фильтр, поиск и сортировку.
+ * keepLoaded — заново загрузить столько игр, сколько уже показано
+ * (после изменений библиотеки список не должен укорачиваться под прокруткой).
+ */
+async function reloadGames(state, keepLoaded = false) {
+  const wanted = keepLoaded ? Math.max(state.games.length, PAGE_SIZE) : PAGE_SIZE;
+  const token = ++state.queryToken;
+  const games = [];
+  let cursor = null;
+
+  do {
+    const limit = Math.min(wanted - games.length, QUERY_MAX_LIMIT);
+    const page = await api.queryGames(currentQuery(state), state.currentSort, cursor, limit);
+    // Пока ждали ответ, запрос сменился — результат устарел
+    if (token !== state.queryToken) return;
+    games.push(...page.games);
+    cursor = page.next_cursor;
+  } while (cursor && games.length < wanted);
+
+  state.games = games;
+  state.nextCursor = cursor;
+  ui.renderGameList(games, state);
+  ui.recheckListEnd();
+}
+
+/**
+ * Дописывает следующую страницу текущего запроса
+ */
+async function loadMoreGames(state) {
+  if (!state.nextCursor || state.isLoadingMore) return;
+
+  const token = state.queryToken;
+  state.isLoadingMore = true;
+  try {
+    const page = await api.queryGames(
+      currentQuery(state),
+      state.currentSort,
+      state.nextCursor,
+      PAGE_SIZE,
+    );
+    if (token !== state.queryToken) return;
+    state.games.push(...page.games);
+    state.nextCursor = page.next_cursor;
+    ui.appendGameList(page.games, state);
+  } catch (error) {
+    logToBackend("error", `Load more error: ${error.message || error}`);
+    return;
+  } finally {
+    state.isLoadingMore = false;
+  }
+  ui.recheckListEnd();
+}
+
+/**
+ * Бэкенд сообщает о скриншоте, обработанном в фоне.
+ * Сама карточка обновится событием onLibraryChanged.
+ * @param {{job_id: string, game_id: number, state: string}} job
+ */
+function onScreenshotProcessed(job) {
+  if (job.state === "failed") ui.showToast(t("screenshot_failed"));
+}
+eel.expose(onScreenshotProcessed);
+
+/**
+ * Бэкенд присылает изменения библиотеки после записи (из этого окна,
+ * другого окна, импорта или фоновой обработки скриншота).
+ * @param {{from_revision: number, revision: number, resync: boolean,
+ *   games: object, deleted: number[], stats: object}} event - games в колоночном формате
+ */
+async function onLibraryChanged(event) {
+  try {
+    ui.updateStats(event.stats);
+    // Изменённая игра могла попасть в фильтр, выпасть из него или сменить место
+    // в сортировке — перечитываем уже показанные страницы
+    await reloadGames(state, true);
+  } catch (error) {
+    logToBackend("error", `Library push error: ${error.message || error}`);
+  }
 }
+eel.expose(onLibraryChanged);
 
 function initializeThemeManager() {
   try {
@@ -127,6 +221,11 @@ async function updateAppVersion() {
 async function checkForUpdates(versionElement = null) {
   try {
     const updateInfo = await api.checkUpdates();
+    if (updateInfo.pending) {
+      // Первая проверка ещё идёт в фоне — спросим ещё раз позже
+      setTimeout(() => checkForUpdates(versionElement), UPDATE_PENDING_RETRY_MS);
+      return;
+    }
     state.updateInfo = updateInfo;
 
     if (versionElement) {
@@ -212,4 +311,4 @@ export function updateVersionTooltip() {
   }
 }
 
-export { filterAndDisplay, loadAndRender, state };
+export { loadAndRender, reloadGames, state };
@@ -80,6 +80,8 @@ export default {
   load_error: "Failed to load games list",
 
   no_image: "No image",
+  screenshot_processing: "Processing image…",
+  screenshot_failed: "Image processing failed",
   copy_title: "Copy title",
 
   required_field: "*",
@@ -80,6 +80,8 @@ export default {
   load_error: "Не удалось загрузить список игр",
 
   no_image: "Нет изображения",
+  screenshot_processing: "Обработка изображения…",
+  screenshot_failed: "Не удалось обработать изображение",
   copy_title: "Копировать название",
 
   required_field: "*",
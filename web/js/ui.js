@@ -5,14 +5,14 @@ import {
   sanitizeInput,
   formatDateTime,
   statusClassFor,
-  findSimilarGames,
-  findSimilarDevelopers,
   getStatusText,
   logToBackend,
+  screenshotFullUrl,
 } from "./api.js";
 import { t } from "./localisation.js";
 
 let gamesListEl,
+  listEndEl,
   modal,
   form,
   screenshotInput,
@@ -26,6 +26,11 @@ let gamesListEl,
   developerPopup,
   sortSelect;
 
+let listEndObserver = null;
+
+// object URL превью выбранного, но ещё не загруженного скриншота
+let screenshotPreviewUrl = null;
+
 function createUploadPlaceholder() {
   const placeholder = document.createElement("span");
   placeholder.className = "upload-area__placeholder";
@@ -34,6 +39,12 @@ function createUploadPlaceholder() {
   return placeholder;
 }
 
+function screenshotPlaceholderKey(screenshotState) {
+  if (screenshotState === "pending") return "screenshot_processing";
+  if (screenshotState === "failed") return "screenshot_failed";
+  return "no_image";
+}
+
 function renderGameCards(games, helpers) {
   if (!games.length) {
     return `<div class="empty">${t("empty_list")}</div>`;
@@ -53,7 +64,8 @@ function renderGameCards(games, helpers) {
             ? Number(game.rating).toFixed(1)
             : "—",
         status: game.status || "planned",
-        screenshot: game.screenshot_data || "",
+        screenshot: game.screenshot_url || "",
+        screenshotPlaceholder: game.screenshot_placeholder || "",
         createdDate: formatDateTime(game.created_at, true),
         createdFull: formatDateTime(game.created_at, false),
         updatedDate: formatDateTime(game.updated_at, true),
@@ -78,9 +90,13 @@ function renderGameCards(games, helpers) {
           <div class="game-card__image">
             ${
               escapedGame.screenshot
-                ? `<img src="${escapedGame.screenshot}" alt="${escapedGame.title}" loading="lazy">`
+                ? `<img src="${escapedGame.screenshot}" alt="${escapedGame.title}" loading="lazy"${
+                    escapedGame.screenshotPlaceholder
+                      ? ` style="background-image: url('${escapedGame.screenshotPlaceholder}')"`
+                      : ""
+                  }>`
                 : `<div class="game-card__image-placeholder">${t(
-                    "no_image",
+                    screenshotPlaceholderKey(game.screenshot_state),
                   )}</div>`
             }
           </div>
@@ -167,6 +183,17 @@ function renderGameCards(games, helpers) {
     .join("");
 }
 
+function cardHelpers(state) {
+  return {
+    formatDateTime,
+    statusClassFor,
+    copyToClipboard,
+    showView,
+    openForm: (game) => openForm(state, game),
+    openConfirmModal: (id) => openConfirmModal(state, id),
+  };
+}
+
 export function renderGameList(games, state) {
   if (!gamesListEl) return;
 
@@ -175,80 +202,40 @@ export function renderGameList(games, state) {
     return;
   }
 
-  gamesListEl.innerHTML = renderGameCards(games, {
-    formatDateTime,
-    statusClassFor,
-    copyToClipboard,
-    showView,
-    openForm: (game) => openForm(state, game),
-    openConfirmModal: (id) => openConfirmModal(state, id),
-  });
+  gamesListEl.innerHTML = renderGameCards(games, cardHelpers(state));
 }
 
-export function filterGames(state) {
-  if (!state.allGames) return [];
-
-  return state.allGames.filter((game) => {
-    const matchesFilter =
-      state.currentFilter === "all" || game.status === state.currentFilter;
-    const matchesSearch =
-      !state.currentSearch ||
-      (game.title || "").toLowerCase().includes(state.currentSearch) ||
-      (game.developer || "").toLowerCase().includes(state.currentSearch);
-    return matchesFilter && matchesSearch;
-  });
+/**
+ * Дописывает карточки следующей страницы в конец списка
+ */
+export function appendGameList(games, state) {
+  if (!gamesListEl || !games.length) return;
+  gamesListEl.insertAdjacentHTML("beforeend", renderGameCards(games, cardHelpers(state)));
 }
 
-export function sortGames(games, sortType) {
-  if (!games.length) return games;
-
-  const sorted = [...games];
-
-  switch (sortType) {
-    case "rating-desc":
-      sorted.sort((a, b) => {
-        const ratingA = parseFloat(a.rating) || 0;
-        const ratingB = parseFloat(b.rating) || 0;
-
-        if (ratingA === 0 && ratingB === 0) return 0;
-        if (ratingA === 0) return 1;
-        if (ratingB === 0) return -1;
-
-        return ratingB - ratingA;
-      });
-      break;
-
-    case "title-asc":
-      sorted.sort((a, b) => {
-        const titleA = (a.title || "").toLowerCase();
-        const titleB = (b.title || "").toLowerCase();
-        return titleA.localeCompare(titleB);
-      });
-      break;
-
-    case "added-desc":
-      sorted.sort((a, b) => {
-        const dateA = new Date(a.created_at || "1970-01-01").getTime();
-        const dateB = new Date(b.created_at || "1970-01-01").getTime();
-        return dateB - dateA;
-      });
-      break;
-
-    case "added-asc":
-    default:
-      sorted.sort((a, b) => {
-        const dateA = new Date(
-          a.updated_at || a.created_at || "1970-01-01",
-        ).getTime();
-        const dateB = new Date(
-          b.updated_at || b.created_at || "1970-01-01",
-        ).getTime();
-        return dateB - dateA;
-      });
-      break;
-  }
+/**
+ * Следит за концом списка и вызывает onNearEnd, когда до него остаётся
+ * меньше экрана (подгрузка следующей страницы)
+ */
+export function watchListEnd(onNearEnd) {
+  if (!listEndEl) return;
+  listEndObserver = new IntersectionObserver(
+    (entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) onNearEnd();
+    },
+    { rootMargin: "0px 0px 100% 0px" },
+  );
+  listEndObserver.observe(listEndEl);
+}
 
-  return sorted;
+/**
+ * Повторно проверяет, виден ли конец списка: observer срабатывает только
+ * при изменении пересечения, а короткая страница могла его не сдвинуть
+ */
+export function recheckListEnd() {
+  if (!listEndObserver) return;
+  listEndObserver.unobserve(listEndEl);
+  listEndObserver.observe(listEndEl);
 }
 
 // Функцию для создания/обновления плейсхолдера
@@ -293,11 +280,12 @@ export function openForm(state, game = null) {
   updateStatusSelectStyle();
 
   state.unsavedScreenshotData = null;
+  revokeScreenshotPreview();
   screenshotInput.value = "";
 
   // ОДИН блок кода для обработки скриншота
-  if (game?.screenshot_data) {
-    screenshotPreview.innerHTML = `<img src="${game.screenshot_data}" alt="preview" loading="lazy">`;
+  if (game?.screenshot_url) {
+    screenshotPreview.innerHTML = `<img src="${game.screenshot_url}" alt="preview" loading="lazy">`;
     screenshotPreview.classList.remove("upload-area__preview--empty");
     removeScreenshotBtn.classList.remove("hidden");
   } else {
@@ -324,6 +312,7 @@ export function closeForm(state) {
   modal.setAttribute("aria-hidden", "true");
   state.editingGame = null;
   state.unsavedScreenshotData = null;
+  revokeScreenshotPreview();
 
   setTimeout(() => {
     lockForm(false, state);
@@ -361,8 +350,8 @@ export function showView(game) {
 
   document.getElementById("view-review").textContent = game.review || "—";
 
-  document.getElementById("view-image").innerHTML = game.screenshot_data
-    ? `<img src="${game.screenshot_data}" alt="" loading="lazy">`
+  document.getElementById("view-image").innerHTML = game.screenshot_url
+    ? `<img src="${screenshotFullUrl(game)}" alt="" loading="lazy">`
     : `<div class="view__image-placeholder">${t("no_image")}</div>`;
 
   const createdEl = document.getElementById("view-created-at");
@@ -428,7 +417,7 @@ export async function onConfirmDelete(state) {
 
   try {
     // Находим игру в списке, чтобы получить название
-    const gameToDelete = state.allGames?.find(
+    const gameToDelete = state.games?.find(
       (game) => game.id === state.selectedToDelete,
     );
     const gameTitle = gameToDelete?.title || state.selectedToDelete;
@@ -481,22 +470,29 @@ export function updateStats(stats) {
 }
 
 let titlePopupTimeout = null;
+let titlePopupRequest = 0;
 
-export function showTitlePopup(state, searchText, currentGameId = null) {
+export async function showTitlePopup(state, searchText, currentGameId = null) {
   if (!titlePopup || !titleInput) return;
 
   clearTimeout(titlePopupTimeout);
 
   if (!searchText || searchText.trim().length < 2) {
+    titlePopupRequest++;
     hideTitlePopup();
     return;
   }
 
-  const similarGames = findSimilarGames(
-    searchText,
-    state.allGames,
-    currentGameId,
-  );
+  // Ответ на устаревший ввод не должен перекрыть более свежий
+  const request = ++titlePopupRequest;
+  let similarGames;
+  try {
+    similarGames = await api.findSimilarTitles(searchText, currentGameId);
+  } catch (error) {
+    console.error("Error finding similar titles:", error);
+    similarGames = [];
+  }
+  if (request !== titlePopupRequest) return;
 
   if (!similarGames || similarGames.length === 0) {
     hideTitlePopup();
@@ -572,11 +568,14 @@ export function hideTitlePopup() {
 }
 
 let developerPopupTimeout = null;
+let developerPopupRequest = 0;
 
-export function showDeveloperPopup(state, searchText, currentGameId = null) {
+export async function showDeveloperPopup(state, searchText, currentGameId = null) {
   if (!developerPopup || !developerInput) return;
 
   clearTimeout(developerPopupTimeout);
+  // Ответ на устаревший ввод не должен перекрыть более свежий
+  const request = ++developerPopupRequest;
 
   if (!searchText || searchText.trim().length < 2) {
     hideDeveloperPopup();
@@ -597,11 +596,14 @@ export function showDeveloperPopup(state, searchText, currentGameId = null) {
     ? searchText.slice(0, lastCommaIndex + 1).trim() + " "
     : "";
 
-  const similarDevelopers = findSimilarDevelopers(
-    searchTerm,
-    state.allGames,
-    currentGameId,
-  );
+  let similarDevelopers;
+  try {
+    similarDevelopers = await api.suggestDevelopers(searchTerm);
+  } catch (error) {
+    console.error("Error suggesting developers:", error);
+    similarDevelopers = [];
+  }
+  if (request !== developerPopupRequest) return;
 
   if (!similarDevelopers || similarDevelopers.length === 0) {
     hideDeveloperPopup();
@@ -673,6 +675,7 @@ export function hideDeveloperPopup() {
 
 export function setupEventHandlers(state) {
   gamesListEl = document.getElementById("games-list");
+  listEndEl = document.getElementById("games-list-end");
   modal = document.getElementById("game-modal");
   form = document.getElementById("game-form");
   screenshotInput = document.getElementById("screenshot");
@@ -712,7 +715,7 @@ export function setupEventHandlers(state) {
     if (editBtn) {
       e.preventDefault();
       const gameId = parseInt(editBtn.getAttribute("data-edit-id"));
-      const game = state.allGames.find((g) => g.id === gameId);
+      const game = state.games.find((g) => g.id === gameId);
       if (game) openForm(state, game);
       return;
     }
@@ -728,7 +731,7 @@ export function setupEventHandlers(state) {
     const card = e.target.closest("[data-game-card]");
     if (card) {
       const gameId = parseInt(card.getAttribute("data-id"));
-      const game = state.allGames.find((g) => g.id === gameId);
+      const game = state.games.find((g) => g.id === gameId);
       if (game) showView(game);
     }
   });
@@ -767,9 +770,14 @@ export function setupEventHandlers(state) {
     .getElementById("update-confirm")
     .addEventListener("click", () => app.initiateAppUpdate());
 
+  let searchTimeout;
+
   searchInput.addEventListener("input", (e) => {
-    state.currentSearch = e.target.value.trim().toLowerCase();
-    filterAndDisplay(state);
+    clearTimeout(searchTimeout);
+    searchTimeout = setTimeout(() => {
+      state.currentSearch = e.target.value.trim();
+      app.reloadGames();
+    }, 150);
   });
 
   statusSelect.addEventListener("change", updateStatusSelectStyle);
@@ -779,7 +787,7 @@ export function setupEventHandlers(state) {
       const filter = btn.dataset.filter;
       state.currentFilter = filter;
       updateStatsFilterUI(state);
-      filterAndDisplay(state);
+      app.reloadGames();
     });
   });
 
@@ -868,7 +876,7 @@ export function setupEventHandlers(state) {
     sortSelect.value = state.currentSort;
     sortSelect.addEventListener("change", (e) => {
       state.currentSort = e.target.value;
-      filterAndDisplay(state);
+      app.reloadGames();
     });
   }
 
@@ -936,12 +944,15 @@ async function onSubmit(e, state) {
     }
 
     const gameId = document.getElementById("game-id").value;
-    const screenshotArg =
-      state.unsavedScreenshotData === null ? null : state.unsavedScreenshotData;
+    // null — скриншот не менялся, "" — удалить, File — загрузить по частям
+    let screenshotArg = state.unsavedScreenshotData;
+    if (screenshotArg instanceof File) {
+      screenshotArg = await api.uploadScreenshot(screenshotArg);
+    }
 
     const success = gameId
       ? await api.updateGame(parseInt(gameId), payload, screenshotArg)
-      : await api.addGame(payload, state.unsavedScreenshotData || null);
+      : await api.addGame(payload, screenshotArg || null);
 
     if (success) {
       await app.loadAndRender(state);
@@ -987,17 +998,24 @@ function onScreenshotSelected(e, state) {
     return;
   }
 
-  const reader = new FileReader();
-  reader.onload = (ev) => {
-    state.unsavedScreenshotData = ev.target.result;
-    screenshotPreview.innerHTML = `<img src="${state.unsavedScreenshotData}" alt="preview">`;
-    screenshotPreview.classList.remove("upload-area__preview--empty");
-    removeScreenshotBtn.classList.remove("hidden");
-  };
-  reader.readAsDataURL(file);
+  // Файл загружается на бэкенд только при сохранении формы
+  revokeScreenshotPreview();
+  state.unsavedScreenshotData = file;
+  screenshotPreviewUrl = URL.createObjectURL(file);
+  screenshotPreview.innerHTML = `<img src="${screenshotPreviewUrl}" alt="preview">`;
+  screenshotPreview.classList.remove("upload-area__preview--empty");
+  removeScreenshotBtn.classList.remove("hidden");
+}
+
+function revokeScreenshotPreview() {
+  if (screenshotPreviewUrl) {
+    URL.revokeObjectURL(screenshotPreviewUrl);
+    screenshotPreviewUrl = null;
+  }
 }
 
 function onRemoveScreenshot(state) {
+  revokeScreenshotPreview();
   state.unsavedScreenshotData = "";
   screenshotPreview.innerHTML = "";
   screenshotPreview.classList.add("upload-area__preview--empty");
@@ -1084,12 +1102,6 @@ export function closeUpdateModal() {
   }
 }
 
-export function filterAndDisplay(state) {
-  const filtered = filterGames(state);
-  const sorted = sortGames(filtered, state.currentSort);
-  renderGameList(sorted, state);
-}
-
 export default {
   setupEventHandlers,
   showView,
@@ -1099,7 +1111,10 @@ export default {
   updateStats,
   showTitlePopup,
   hideTitlePopup,
-  filterAndDisplay,
+  renderGameList,
+  appendGameList,
+  watchListEnd,
+  recheckListEnd,
   showToast,
   showUpdateModal,
   closeUpdateModal,